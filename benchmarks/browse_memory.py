@@ -0,0 +1,140 @@
+# browse_memory.py
+"""
+Peak memory and latency of the browse endpoints' store calls on a large
+project, comparing the old full-scan reads with paged/streamed reads:
+
+    python -m benchmarks.browse_memory --chunks 500000 --out browse.json
+
+A synthetic project is written once into a scratch Chroma store (random
+low-dimensional vectors, no model needed). Each measurement then runs in
+a fresh subprocess so its peak RSS is not hidden by an earlier one.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+PROJECT_ID = "bench"
+MODES = (
+    "legacy_get_chunks",    # col.get(all docs + metadata), slice in Python
+    "legacy_list_files",    # col.get(all metadata), group in Python
+    "paged_get_chunks",     # one page of 200 (ids paged in SQL)
+    "stream_all_chunks",    # every chunk, keyset-paged (NDJSON path)
+    "list_files",           # index_stats SQL, first page of 1000
+)
+
+
+def _use_store(store: str) -> None:
+    """Point every on-disk store at the scratch directory (before imports)."""
+    os.environ["INDEX_STATS_PATH"] = os.path.join(store, "index_stats.sqlite3")
+    os.environ["ANSWER_CACHE_PATH"] = os.path.join(store, "answer_cache.sqlite3")
+    from src.pipeline import embed_store
+    embed_store.PERSIST_DIR = os.path.join(store, "chroma")
+
+
+def build(store: str, n_chunks: int, chunks_per_file: int, dim: int) -> float:
+    _use_store(store)
+    from src.pipeline.embed_store import upsert_chunks
+
+    rng = random.Random(0)
+    t0 = time.perf_counter()
+    batch, vectors = [], []
+    for i in range(n_chunks):
+        f, idx = divmod(i, chunks_per_file)
+        rel = f"pkg{f % 50}/module_{f}.py"
+        batch.append({
+            "id": f"{PROJECT_ID}::{rel}::{idx}",
+            "text": f"def func_{i}(x):\n    return x * {i}  # " + "lorem ipsum " * 30,
+            "metadata": {"project_id": PROJECT_ID, "rel_path": rel, "chunk_idx": idx,
+                         "doc_id": f"doc-{f}", "source": f"module_{f}.py",
+                         "filetype": ".py"},
+        })
+        vectors.append([rng.random() for _ in range(dim)])
+        if len(batch) == 5000:
+            upsert_chunks(batch, embeddings=vectors)
+            batch, vectors = [], []
+    upsert_chunks(batch, embeddings=vectors)
+    return time.perf_counter() - t0
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def child(store: str, mode: str) -> Dict[str, float]:
+    _use_store(store)
+    from src.pipeline import embed_store
+
+    col = embed_store.get_collection()
+    # open index_stats and let Chroma load its segments before the baseline
+    embed_store.list_files_for_project(PROJECT_ID, limit=1)
+    col.get(ids=[embed_store.index_stats.chunk_ids(PROJECT_ID, limit=1)[0]],
+            include=["documents"])
+    base = _rss_mb()
+    t0 = time.perf_counter()
+    items = 0
+    if mode == "legacy_get_chunks":
+        res = col.get(where={"project_id": PROJECT_ID}, include=["documents", "metadatas"])
+        items = len(res["ids"][:200])
+    elif mode == "legacy_list_files":
+        res = col.get(where={"project_id": PROJECT_ID}, include=["metadatas"])
+        items = len({md.get("rel_path") for md in res["metadatas"]})
+    elif mode == "paged_get_chunks":
+        items = len(embed_store.get_chunks(PROJECT_ID, limit=200))
+    elif mode == "stream_all_chunks":
+        for page in embed_store.iter_chunks(PROJECT_ID, page_size=500):
+            items += len(page)
+    elif mode == "list_files":
+        items = len(embed_store.list_files_for_project(PROJECT_ID, limit=1000))
+    return {"seconds": round(time.perf_counter() - t0, 3), "items": items,
+            "peak_rss_delta_mb": round(_rss_mb() - base, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Browse endpoint memory benchmark.")
+    parser.add_argument("--chunks", type=int, default=500_000)
+    parser.add_argument("--chunks-per-file", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=16)
+    parser.add_argument("--store", default=None, help="Reuse/keep this scratch dir")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.store, args.child)))
+        return
+
+    store = args.store or tempfile.mkdtemp(prefix="browse_bench_")
+    report = {"chunks": args.chunks, "store": store, "modes": {}}
+    if not os.path.exists(os.path.join(store, "chroma")):
+        report["build_seconds"] = round(
+            build(store, args.chunks, args.chunks_per_file, args.dim), 1)
+    for mode in args.modes.split(","):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.browse_memory",
+             "--child", mode, "--store", store],
+            capture_output=True, text=True)
+        if out.returncode == 0:
+            report["modes"][mode] = json.loads(out.stdout.strip().splitlines()[-1])
+        else:
+            # a negative code is the signal; SIGKILL here is usually the OOM killer
+            report["modes"][mode] = {"error": f"exit code {out.returncode}",
+                                     "stderr": out.stderr.strip()[-500:]}
+        print(mode, report["modes"][mode], flush=True)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
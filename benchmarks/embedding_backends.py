@@ -0,0 +1,161 @@
+# embedding_backends.py
+"""
+Compare the embedding backends (EMBED_BACKEND = torch / onnx / onnx-int8)
+on a project's indexed chunks:
+
+    python -m benchmarks.embedding_backends --project-id proj_1234 --out backends.json
+
+Each backend runs in a fresh subprocess so import time and RSS are its
+own. Reported per backend: load time (imports + model), peak RSS,
+ingest throughput (chunks/s through embed_texts), single-query latency
+(p50/p95 of embed_text) and, against the torch backend, the mean cosine
+between the two vectors of each chunk and the overlap of each query's
+top-k chunks.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.hybrid_retrieval import percentile
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def load_corpus(project_id: str, n_chunks: int, n_queries: int) -> Dict[str, List[str]]:
+    """Chunk texts of the project plus queries built from its symbols (or first words)."""
+    from src.pipeline.embed_store import iter_chunks
+
+    texts, queries = [], []
+    for page in iter_chunks(project_id, page_size=min(1000, n_chunks)):
+        for c in page:
+            texts.append(c["text"])
+            md = c["metadata"] or {}
+            if len(queries) < n_queries:
+                name = md.get("symbol") or " ".join(c["text"].split()[:8])
+                queries.append(f"where is {name} defined?" if md.get("symbol") else name)
+        if len(texts) >= n_chunks:
+            break
+    return {"texts": texts[:n_chunks], "queries": queries}
+
+
+def child(backend: str, corpus_path: str, out_dir: str, batch_size: int) -> Dict:
+    t0 = time.perf_counter()
+    from src.pipeline import embeddings
+    embeddings.get_model()
+    load_s = time.perf_counter() - t0
+    import numpy as np
+
+    with open(corpus_path, encoding="utf-8") as f:
+        corpus = json.load(f)
+    embeddings.embed_texts(corpus["texts"][:batch_size], batch_size=batch_size)  # warm
+
+    t0 = time.perf_counter()
+    vectors = np.array(embeddings.embed_texts(corpus["texts"], batch_size=batch_size),
+                       dtype=np.float32)
+    ingest_s = time.perf_counter() - t0
+
+    latencies, queries = [], []
+    for q in corpus["queries"]:
+        t0 = time.perf_counter()
+        queries.append(embeddings.embed_text(q))
+        latencies.append(time.perf_counter() - t0)
+
+    np.save(os.path.join(out_dir, f"{backend}.chunks.npy"), vectors)
+    np.save(os.path.join(out_dir, f"{backend}.queries.npy"), np.array(queries, dtype=np.float32))
+    return {
+        "load_seconds": round(load_s, 2),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "chunks_per_second": round(len(vectors) / ingest_s, 1) if ingest_s else None,
+        "query_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "query_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "torch_imported": "torch" in sys.modules,
+    }
+
+
+def agreement(out_dir: str, backend: str, k: int) -> Dict[str, float]:
+    """Cosine to the torch vectors and top-k overlap of the query results."""
+    import numpy as np
+
+    ref_c = np.load(os.path.join(out_dir, "torch.chunks.npy"))
+    ref_q = np.load(os.path.join(out_dir, "torch.queries.npy"))
+    c = np.load(os.path.join(out_dir, f"{backend}.chunks.npy"))
+    q = np.load(os.path.join(out_dir, f"{backend}.queries.npy"))
+    k = min(k, len(c))
+    # vectors are normalized, so dot product = cosine
+    ref_top = np.argsort(-ref_q @ ref_c.T, axis=1)[:, :k]
+    top = np.argsort(-q @ c.T, axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(ref_top, top)]
+    return {
+        "mean_chunk_cosine": round(float((ref_c * c).sum(axis=1).mean()), 5),
+        f"top{k}_overlap": round(float(np.mean(overlap)), 4) if overlap else 0.0,
+        "top1_agreement": round(float(np.mean(ref_top[:, 0] == top[:, 0])), 4)
+        if len(top) else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark.")
+    parser.add_argument("--project-id", default=None)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, os.path.join(args.work_dir, "corpus.json"),
+                               args.work_dir, args.batch_size)))
+        return
+    if not args.project_id:
+        parser.error("pass --project-id")
+
+    work_dir = tempfile.mkdtemp(prefix="embed_bench_")
+    corpus = load_corpus(args.project_id, args.chunks, args.queries)
+    with open(os.path.join(work_dir, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(corpus, f)
+    report = {"project_id": args.project_id, "chunks": len(corpus["texts"]),
+              "queries": len(corpus["queries"]), "backends": {}}
+
+    backends = args.backends.split(",")
+    if "torch" not in backends:
+        backends.insert(0, "torch")  # the reference for agreement
+    for backend in backends:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.embedding_backends", "--child", backend,
+             "--work-dir", work_dir, "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True, env={**os.environ, "EMBED_BACKEND": backend})
+        if out.returncode == 0:
+            report["backends"][backend] = json.loads(out.stdout.strip().splitlines()[-1])
+        else:
+            report["backends"][backend] = {"error": f"exit code {out.returncode}",
+                                           "stderr": out.stderr.strip()[-500:]}
+        print(backend, report["backends"][backend], flush=True)
+
+    if "error" not in report["backends"]["torch"]:
+        for backend in backends:
+            if backend != "torch" and "error" not in report["backends"][backend]:
+                report["backends"][backend]["vs_torch"] = agreement(work_dir, backend, args.k)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# fake_llm.py
+"""
+Local OpenAI-compatible /chat/completions server for benchmarks and
+tests, so /ask can be load-tested without a Groq key or network.
+
+Replies with a fixed answer, streamed or not, after an optional delay
+(to stand in for model latency), and reports token usage:
+
+    python -m benchmarks.fake_llm --port 9000 --latency-ms 200
+    LLM_BASE_URL=http://127.0.0.1:9000/v1 LLM_key=x uvicorn src.services.api_server:app
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+TOKENS = ["`upsert_chunks` ", "lives in ", "embed_store.py"]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal /chat/completions: answers with `tokens` after `latency` seconds."""
+
+    tokens: List[str] = TOKENS
+    latency: float = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.latency:
+            time.sleep(self.latency)
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in body.get("messages", []))
+        if body.get("stream"):
+            self._stream(body)
+            return
+        payload = json.dumps({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": 0,
+            "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(self.tokens)}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(self.tokens),
+                      "total_tokens": prompt_tokens + len(self.tokens)},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for tok in self.tokens:
+            chunk = {
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": tok},
+                             "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port: int = 0, latency_ms: float = 0.0,
+          tokens: List[str] = TOKENS) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns (server, base_url). Stop with server.shutdown()."""
+    handler = type("Handler", (FakeOpenAIHandler,),
+                   {"latency": latency_ms / 1000.0, "tokens": list(tokens)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server.")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    server, url = start(args.port, args.latency_ms)
+    print(f"fake LLM at {url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,114 @@
+# hybrid_retrieval.py
+"""
+Recall@k and latency of vector-only vs hybrid (vector + BM25, RRF)
+retrieval on identifier-style questions.
+
+Questions are generated from the indexed project itself: for a sample of
+functions/classes (chunks with a `symbol` from the AST chunker) we ask
+"where is <name> defined?" and count a hit when a chunk of that symbol
+is in the top k. Any project works; to index a folder first into a
+scratch store:
+
+    python -m benchmarks.hybrid_retrieval --folder src --out hybrid.json
+    python -m benchmarks.hybrid_retrieval --project-id proj_1234
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+TEMPLATES = ("where is {name} defined?", "{name}", "what does {name} do")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))]
+
+
+def _use_scratch_store(store: str) -> None:
+    """Keep benchmark data out of ./data (before pipeline imports)."""
+    for var, name in (("INDEX_STATS_PATH", "index_stats.sqlite3"),
+                      ("ANSWER_CACHE_PATH", "answer_cache.sqlite3"),
+                      ("LEXICAL_INDEX_DIR", "lexical")):
+        os.environ[var] = os.path.join(store, name)
+    from src.pipeline import embed_store, manifest
+    embed_store.PERSIST_DIR = os.path.join(store, "chroma")
+    manifest.MANIFEST_DIR = os.path.join(store, "manifests")
+
+
+def make_questions(project_id: str, n: int, seed: int = 0) -> List[Dict]:
+    from src.pipeline.embed_store import iter_chunks
+
+    relevant: Dict[str, set] = {}
+    for page in iter_chunks(project_id, page_size=1000):
+        for c in page:
+            md = c["metadata"] or {}
+            if md.get("symbol") and md.get("symbol_type") != "module":
+                name = md["symbol"].rsplit(".", 1)[-1]
+                relevant.setdefault(name, set()).add(c["id"])
+    rng = random.Random(seed)
+    names = sorted(relevant)
+    rng.shuffle(names)
+    return [{"question": rng.choice(TEMPLATES).format(name=name),
+             "relevant": sorted(relevant[name])} for name in names[:n]]
+
+
+def evaluate(project_id: str, questions: List[Dict], ks=(1, 5, 10)) -> Dict[str, Dict]:
+    from src.pipeline.answer_generation import embed_text
+    from src.pipeline.retrieval import search_chunks
+
+    top = max(ks)
+    vectors = [embed_text(q["question"]) for q in questions]
+    report = {}
+    for mode, hybrid in (("vector", False), ("hybrid", True)):
+        hits = {k: 0 for k in ks}
+        latencies = []
+        for q, vec in zip(questions, vectors):
+            t0 = time.perf_counter()
+            matches = search_chunks(vec, q["question"], project_id, top_k=top, hybrid=hybrid)
+            latencies.append(time.perf_counter() - t0)
+            ids = [m["id"] for m in matches]
+            for k in ks:
+                hits[k] += any(i in q["relevant"] for i in ids[:k])
+        n = max(1, len(questions))
+        report[mode] = {
+            **{f"recall@{k}": round(hits[k] / n, 4) for k in ks},
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vector vs hybrid retrieval benchmark.")
+    parser.add_argument("--project-id", default=None)
+    parser.add_argument("--folder", default=None, help="Index this folder into a scratch store first")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    if not args.project_id and not args.folder:
+        parser.error("pass --project-id or --folder")
+
+    project_id = args.project_id
+    if args.folder:
+        _use_scratch_store(tempfile.mkdtemp(prefix="hybrid_bench_"))
+        from src.pipeline.ingest_repo import ingest_folder
+        project_id = project_id or "bench"
+        ingest_folder(args.folder, project_id=project_id, project_name="bench")
+
+    questions = make_questions(project_id, args.questions)
+    report = {"project_id": project_id, "questions": len(questions),
+              **evaluate(project_id, questions)}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# load_test.py
+"""
+Mixed-traffic load test for a running API server.
+
+Drives /ask, /search and /projects concurrently for a fixed duration and
+reports sustained RPS and latency percentiles per endpoint, so the sync
+and async serving paths can be compared under the same load:
+
+    python -m benchmarks.load_test --base http://localhost:8000 \\
+        --project-id proj_1234 --concurrency 64 --duration 30 --out load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+QUESTIONS = [
+    "Where are chunks upserted into Chroma?",
+    "How does ingest skip unchanged files?",
+    "Which function builds the LLM prompt?",
+    "How are projects stored?",
+    "Where is the embedding model loaded?",
+]
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int],
+              elapsed: float) -> Dict[str, dict]:
+    out = {}
+    for name, lat in latencies.items():
+        out[name] = {
+            "requests": len(lat),
+            "errors": errors.get(name, 0),
+            "rps": round(len(lat) / elapsed, 2),
+            "p50_ms": round(percentile(lat, 50) * 1000, 1),
+            "p95_ms": round(percentile(lat, 95) * 1000, 1),
+            "p99_ms": round(percentile(lat, 99) * 1000, 1),
+        }
+    total = sum(len(v) for v in latencies.values())
+    out["total"] = {"requests": total, "rps": round(total / elapsed, 2)}
+    return out
+
+
+async def run(base: str, project_id: str, concurrency: int, duration: float,
+              mix: Dict[str, float], use_cache: bool,
+              questions: Optional[List[str]] = None) -> Dict[str, dict]:
+    latencies: Dict[str, List[float]] = {k: [] for k in mix}
+    errors: Dict[str, int] = {}
+    names, weights = zip(*mix.items())
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits) as client:
+        async def one(name: str) -> None:
+            q = random.choice(questions or QUESTIONS)
+            if not use_cache:
+                q = f"{q} #{random.randrange(1 << 30)}"
+            if name == "ask":
+                return await client.post("/ask", json={
+                    "question": q, "project_id": project_id, "use_cache": use_cache})
+            if name == "search":
+                return await client.get("/search", params={"q": q, "project_id": project_id})
+            return await client.get("/projects")
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                name = random.choices(names, weights)[0]
+                t0 = time.perf_counter()
+                try:
+                    resp = await one(name)
+                    ok = resp.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies[name].append(time.perf_counter() - t0)
+                else:
+                    errors[name] = errors.get(name, 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    return summarize(latencies, errors, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mixed-traffic API load test.")
+    parser.add_argument("--base", default="http://localhost:8000")
+    parser.add_argument("--project-id", required=True)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--mix", default="ask=0.4,search=0.3,projects=0.3",
+                        help="endpoint weights, e.g. ask=0.5,projects=0.5")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="allow answer-cache hits (default: unique questions)")
+    parser.add_argument("--out", default=None, help="write JSON results here")
+    args = parser.parse_args()
+
+    mix = {k: float(v) for k, v in (kv.split("=") for kv in args.mix.split(","))}
+    result = asyncio.run(run(args.base, args.project_id, args.concurrency,
+                             args.duration, mix, args.use_cache))
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
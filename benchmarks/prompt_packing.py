@@ -0,0 +1,93 @@
+# prompt_packing.py
+"""
+Prompt tokens and latency with and without prompt packing
+(src/pipeline/prompt_packer.py) for several top_k:
+
+    python -m benchmarks.prompt_packing --project-id proj_1234 --top-k 5,10,20
+    python -m benchmarks.prompt_packing --project-id proj_1234 --call-llm --questions 30
+
+For each question the chunks are retrieved once, then the prompt is
+built both ways. Reported per top_k: prompt tokens (mean, p50, p95), tokens
+saved, packing time, and with --call-llm the LLM latency of both
+prompts against the configured endpoint (LLM_BASE_URL; use
+benchmarks.fake_llm for a dry run).
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+from benchmarks.hybrid_retrieval import make_questions, percentile
+
+
+def _summary(values: List[float], scale: float = 1.0, digits: int = 1) -> Dict[str, float]:
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0}
+    return {"mean": round(sum(values) / len(values) * scale, digits),
+            "p50": round(percentile(values, 50) * scale, digits),
+            "p95": round(percentile(values, 95) * scale, digits)}
+
+
+def evaluate(project_id: str, questions: List[str], top_k: int, call_llm: bool) -> Dict:
+    from src.pipeline import answer_generation, prompt_packer
+    from src.pipeline.retrieval import retrieve
+
+    before, after, pack_s = [], [], []
+    llm = {"unpacked": [], "packed": []}
+    packing = prompt_packer.PROMPT_PACKING
+    for q in questions:
+        _, matches = retrieve(q, project_id, top_k)
+        if not matches:
+            continue
+        plain = answer_generation._build_prompt(q, matches)
+        t0 = time.perf_counter()
+        blocks, _ = prompt_packer.pack(matches, render=answer_generation._context_entry)
+        packed = answer_generation._build_prompt(q, blocks)
+        pack_s.append(time.perf_counter() - t0)
+        before.append(prompt_packer.count_tokens(plain))
+        after.append(prompt_packer.count_tokens(packed))
+        if call_llm:
+            for mode, enabled in (("unpacked", False), ("packed", True)):
+                prompt_packer.PROMPT_PACKING = enabled
+                t0 = time.perf_counter()
+                answer_generation.llm_answer(q, matches)
+                llm[mode].append(time.perf_counter() - t0)
+            prompt_packer.PROMPT_PACKING = packing
+    saved = sum(before) - sum(after)
+    report = {
+        "questions": len(before),
+        "prompt_tokens_unpacked": _summary(before),
+        "prompt_tokens_packed": _summary(after),
+        "tokens_saved_pct": round(100.0 * saved / sum(before), 1) if before else 0.0,
+        "pack_ms": _summary(pack_s, 1000, 2),
+    }
+    if call_llm:
+        report["llm_ms"] = {mode: _summary(v, 1000) for mode, v in llm.items()}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prompt packing benchmark.")
+    parser.add_argument("--project-id", required=True)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--top-k", default="5,10,20")
+    parser.add_argument("--call-llm", action="store_true", help="also time LLM calls")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    from src.pipeline import prompt_packer
+    questions = [q["question"] for q in make_questions(args.project_id, args.questions)]
+    report = {"project_id": args.project_id,
+              "token_budget": prompt_packer.PROMPT_TOKEN_BUDGET, "top_k": {}}
+    for k in (int(x) for x in args.top_k.split(",")):
+        report["top_k"][k] = evaluate(args.project_id, questions, k, args.call_llm)
+        print(k, report["top_k"][k], flush=True)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# suite.py
+"""
+End-to-end benchmark run on a synthetic codebase, written as JSON so
+runs can be compared for regressions:
+
+    python -m benchmarks.suite --files 1000 --out run.json
+    python -m benchmarks.suite --files 1000 --out new.json --baseline run.json
+
+Steps, all in a scratch directory (the real ./data is never touched):
+  1. generate a repo (benchmarks.synthetic_repo);
+  2. ingest it with ingest_folder in a child process: files/s, chunks/s,
+     model load time and peak RSS;
+  3. start the API (uvicorn) against that store, with the LLM pointed at
+     benchmarks.fake_llm (fixed latency), and load /search, then /ask,
+     with concurrent clients: RPS and p50/p95/p99 per endpoint;
+  4. record the server's peak RSS and per-stage means from /metrics.
+
+The embedding model follows the usual env (EMBED_MODEL_NAME,
+EMBED_BACKEND, ...), so backends can be compared run against run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from benchmarks import fake_llm, load_test, synthetic_repo
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ID = "bench"
+
+
+def _child_env(**extra: str) -> Dict[str, str]:
+    path = os.environ.get("PYTHONPATH")
+    return {**os.environ, "PYTHONPATH": REPO_ROOT + (os.pathsep + path if path else ""),
+            **extra}
+
+
+def _peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak RSS (VmHWM) of a running process; Linux only."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    return None
+
+
+def child_ingest(repo: str, parallel: bool) -> Dict[str, Any]:
+    """Runs in the scratch store (cwd); prints the ingest numbers."""
+    t0 = time.perf_counter()
+    from src.pipeline.embeddings import get_model
+    from src.pipeline.ingest_repo import ingest_folder
+    get_model()
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    res = ingest_folder(repo, project_id=PROJECT_ID, project_name=PROJECT_ID,
+                        parallel=parallel)
+    elapsed = time.perf_counter() - t0
+    return {
+        "model_load_seconds": round(load_s, 2),
+        "seconds": round(elapsed, 2),
+        "files": res["files_updated"],
+        "chunks": res["chunks_upserted"],
+        "files_per_second": round(res["files_updated"] / elapsed, 1),
+        "chunks_per_second": round(res["chunks_upserted"] / elapsed, 1),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base: str, proc: subprocess.Popen, timeout: float = 180.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{base}/projects", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("API server did not start in time")
+
+
+def stage_means(metrics_text: str) -> Dict[str, float]:
+    """Mean ms per pipeline stage from rag_stage_seconds in /metrics."""
+    sums, counts = {}, {}
+    for name, stage, value in re.findall(
+            r'^rag_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$', metrics_text, re.M):
+        (sums if name == "sum" else counts)[stage] = float(value)
+    return {s: round(sums[s] / counts[s] * 1000, 2) for s in sorted(sums) if counts.get(s)}
+
+
+def serve_and_load(store: str, questions, args) -> Dict[str, Any]:
+    llm, llm_url = fake_llm.start(latency_ms=args.llm_latency_ms)
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.services.api_server:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=store, env=_child_env(LLM_BASE_URL=llm_url, LLM_key="bench"))
+    out: Dict[str, Any] = {}
+    try:
+        _wait_ready(base, proc)
+        warm = httpx.post(f"{base}/warmup", timeout=300)
+        out["warmup_seconds"] = warm.json()["load_seconds"] if warm.status_code == 200 \
+            else {"error": f"HTTP {warm.status_code}"}
+        out["idle_rss_mb"] = _peak_rss_mb(proc.pid)
+        for endpoint in ("search", "ask"):
+            res = asyncio.run(load_test.run(
+                base, PROJECT_ID, args.concurrency, args.duration, {endpoint: 1.0},
+                use_cache=False, questions=questions))
+            out[endpoint] = res[endpoint]
+            print(endpoint, out[endpoint], flush=True)
+        out["peak_rss_mb"] = _peak_rss_mb(proc.pid)
+        out["stage_ms"] = stage_means(httpx.get(f"{base}/metrics", timeout=10).text)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        llm.shutdown()
+    return out
+
+
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            flat.update(_flatten(v, f"{prefix}{k}."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            flat[f"{prefix}{k}"] = v
+    return flat
+
+
+def compare(baseline: Dict[str, Any], report: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Relative change of every shared numeric result (config excluded)."""
+    old = _flatten({k: v for k, v in baseline.items() if k != "config"})
+    new = _flatten({k: v for k, v in report.items() if k != "config"})
+    return {k: {"baseline": old[k], "current": new[k],
+                "change_pct": round((new[k] - old[k]) / old[k] * 100, 1) if old[k] else None}
+            for k in sorted(old.keys() & new.keys())}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synthetic-repo ingest + API benchmark.")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--symbols-per-file", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parallel", action="store_true", help="use the parallel ingest pipeline")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per endpoint")
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--work-dir", default=None, help="scratch dir (default: a new temp dir)")
+    parser.add_argument("--skip-load", action="store_true", help="only measure ingestion")
+    parser.add_argument("--baseline", default=None, help="earlier JSON report to compare with")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--child-ingest", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_ingest:
+        print(json.dumps(child_ingest(args.child_ingest, args.parallel)))
+        return
+
+    work = args.work_dir or tempfile.mkdtemp(prefix="rag_bench_")
+    repo, store = os.path.join(work, "repo"), os.path.join(work, "store")
+    os.makedirs(store, exist_ok=True)
+    report: Dict[str, Any] = {
+        "config": {**{k: v for k, v in vars(args).items()
+                      if k not in ("child_ingest", "out", "baseline")},
+                   "embed_model": os.getenv("EMBED_MODEL_NAME", "all-MiniLM-L6-v2"),
+                   "embed_backend": os.getenv("EMBED_BACKEND", "torch"),
+                   "git_commit": _git_commit(),
+                   "started_at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "repo": synthetic_repo.generate_repo(repo, args.files, args.symbols_per_file,
+                                             seed=args.seed),
+    }
+
+    cmd = [sys.executable, "-m", "benchmarks.suite", "--child-ingest", repo]
+    if args.parallel:
+        cmd.append("--parallel")
+    out = subprocess.run(cmd, cwd=store, env=_child_env(), capture_output=True, text=True)
+    if out.returncode != 0:
+        report["ingest"] = {"error": f"exit code {out.returncode}",
+                            "stderr": out.stderr.strip()[-1000:]}
+    else:
+        report["ingest"] = json.loads(out.stdout.strip().splitlines()[-1])
+    print("ingest", report["ingest"], flush=True)
+
+    if not args.skip_load and "error" not in report["ingest"]:
+        questions = synthetic_repo.questions(repo, args.questions, seed=args.seed)
+        report["api"] = serve_and_load(store, questions, args)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["vs_baseline"] = compare(json.load(f), report)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# synthetic_repo.py
+"""
+Generate a synthetic codebase of a given size for ingest and query
+benchmarks: Python packages of modules with classes, methods and
+functions (distinct identifiers, realistic line lengths) plus Markdown
+docs. Output is deterministic for a given seed.
+
+    python -m benchmarks.synthetic_repo /tmp/synth --files 1000
+"""
+import argparse
+import json
+import os
+import random
+from typing import Dict, List
+
+WORDS = ("chunk", "index", "store", "query", "embed", "vector", "cache", "token",
+         "parse", "batch", "project", "manifest", "stream", "score", "window",
+         "record", "route", "session", "client", "buffer", "config", "report")
+
+
+def _name(rng: random.Random, parts: int = 2) -> str:
+    return "_".join(rng.choice(WORDS) for _ in range(parts))
+
+
+def _function(rng: random.Random, name: str, indent: str = "") -> str:
+    args = ", ".join(_name(rng, 1) + str(i) for i in range(rng.randint(1, 4)))
+    body = [f'{indent}def {name}({args}):',
+            f'{indent}    """{name.replace("_", " ").capitalize()} for the given inputs."""']
+    for i in range(rng.randint(3, 15)):
+        var = _name(rng)
+        body.append(f"{indent}    {var}_{i} = {rng.choice(WORDS)}_{rng.randint(0, 99)}"
+                    f"({rng.choice(WORDS)}, limit={rng.randint(1, 500)})")
+    body.append(f"{indent}    return {var}_{i}")
+    return "\n".join(body)
+
+
+def python_module(rng: random.Random, n_symbols: int) -> str:
+    out = ["import os", "from typing import Dict, List", ""]
+    for s in range(n_symbols):
+        if rng.random() < 0.3:
+            cls = "".join(w.capitalize() for w in _name(rng).split("_")) + str(s)
+            out.append(f"\nclass {cls}:")
+            out.append(f'    """{cls} keeps {rng.choice(WORDS)} state."""')
+            for m in range(rng.randint(1, 4)):
+                out.append("\n" + _function(rng, f"{_name(rng)}_{s}_{m}", "    "))
+        else:
+            out.append("\n\n" + _function(rng, f"{_name(rng)}_{s}"))
+    return "\n".join(out) + "\n"
+
+
+def markdown_doc(rng: random.Random, n_sections: int) -> str:
+    out = [f"# {_name(rng).replace('_', ' ').title()}\n"]
+    for s in range(n_sections):
+        out.append(f"## {_name(rng).replace('_', ' ').title()} {s}\n")
+        sentences = [f"The {_name(rng, 1)} {rng.choice(WORDS)}s each {rng.choice(WORDS)} "
+                     f"before the {_name(rng, 1)} is {rng.choice(WORDS)}ed."
+                     for _ in range(rng.randint(3, 12))]
+        out.append(" ".join(sentences) + "\n")
+    return "\n".join(out)
+
+
+def generate_repo(root: str, files: int = 200, symbols_per_file: int = 8,
+                  doc_ratio: float = 0.1, seed: int = 0) -> Dict[str, int]:
+    """Write `files` files under `root` (about doc_ratio of them Markdown)."""
+    rng = random.Random(seed)
+    counts = {"files": 0, "py_files": 0, "md_files": 0, "bytes": 0}
+    per_pkg = 25
+    for i in range(files):
+        pkg = os.path.join(root, f"pkg_{i // per_pkg}")
+        os.makedirs(pkg, exist_ok=True)
+        if rng.random() < doc_ratio:
+            path, text = os.path.join(pkg, f"notes_{i}.md"), markdown_doc(rng, symbols_per_file)
+            counts["md_files"] += 1
+        else:
+            path, text = (os.path.join(pkg, f"{_name(rng)}_{i}.py"),
+                          python_module(rng, symbols_per_file))
+            counts["py_files"] += 1
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        counts["files"] += 1
+        counts["bytes"] += len(text.encode("utf-8"))
+    return counts
+
+
+def questions(root: str, n: int, seed: int = 0) -> List[str]:
+    """Questions about identifiers that exist in the generated repo."""
+    import re
+    rng = random.Random(seed)
+    names: List[str] = []
+    for dirpath, _, filenames in os.walk(root):
+        for fn in sorted(filenames):
+            if fn.endswith(".py"):
+                with open(os.path.join(dirpath, fn), encoding="utf-8") as f:
+                    names.extend(re.findall(r"def (\w+)\(", f.read()))
+        if len(names) > 20 * n:
+            break
+    rng.shuffle(names)
+    templates = ("Where is {} defined?", "What does {} return?", "How is {} used?")
+    return [rng.choice(templates).format(name) for name in names[:n]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic codebase.")
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--symbols-per-file", type=int, default=8)
+    parser.add_argument("--doc-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(generate_repo(args.root, args.files, args.symbols_per_file,
+                                   args.doc_ratio, args.seed), indent=2))
@@ -0,0 +1,142 @@
+# answer_cache.py
+"""
+Persistent cache of /ask responses, invalidated by index generation.
+
+Every project has a generation counter that embed_store bumps on any
+write (upsert, delete, re-embed). Cached answers remember the generation
+they were produced at, so an entry is only served while the project's
+index is exactly as it was. The "*" key tracks writes to any project and
+covers questions asked without a project filter.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from src.pipeline.embeddings import normalize_query
+
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "data/answer_cache.sqlite3")
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1").lower() in {"1", "true", "yes"}
+ALL_PROJECTS = "*"
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0}
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        d = os.path.dirname(ANSWER_CACHE_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(ANSWER_CACHE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS generations (
+                project_key TEXT PRIMARY KEY,
+                generation  INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                project_key TEXT NOT NULL,
+                question    TEXT NOT NULL,
+                top_k       INTEGER NOT NULL,
+                generation  INTEGER NOT NULL,
+                chunk_ids   TEXT NOT NULL,
+                response    TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                PRIMARY KEY (project_key, question, top_k)
+            );
+        """)
+        _conn = conn
+    return _conn
+
+
+def _key(project_id: Optional[str]) -> str:
+    return project_id or ALL_PROJECTS
+
+
+def get_generation(project_id: Optional[str]) -> int:
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT generation FROM generations WHERE project_key = ?",
+            (_key(project_id),)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_generation(project_ids: Iterable[str]) -> None:
+    """Invalidate cached answers for these projects (and for "*")."""
+    keys = {_key(p) for p in project_ids if p}
+    if not keys:
+        return
+    keys.add(ALL_PROJECTS)
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            for k in keys:
+                conn.execute(
+                    "INSERT INTO generations (project_key, generation) VALUES (?, 1) "
+                    "ON CONFLICT(project_key) DO UPDATE SET generation = generation + 1",
+                    (k,))
+                # entries of older generations can never be served again
+                conn.execute(
+                    "DELETE FROM answers WHERE project_key = ? AND generation < "
+                    "(SELECT generation FROM generations WHERE project_key = ?)",
+                    (k, k))
+
+
+def lookup(project_id: Optional[str], question: str,
+           top_k: int) -> Optional[Dict[str, Any]]:
+    """Return the cached response if it was built at the current generation."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    key = _key(project_id)
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT a.response FROM answers a "
+            "LEFT JOIN generations g ON g.project_key = a.project_key "
+            "WHERE a.project_key = ? AND a.question = ? AND a.top_k = ? "
+            "AND a.generation = COALESCE(g.generation, 0)",
+            (key, normalize_query(question), int(top_k))).fetchone()
+        _counters["hits" if row else "misses"] += 1
+    return json.loads(row[0]) if row else None
+
+
+def store(project_id: Optional[str], question: str, top_k: int,
+          response: Dict[str, Any], generation: Optional[int] = None) -> None:
+    """
+    Cache `response`. Pass the `generation` read before retrieval so an
+    ingest that lands mid-request doesn't get a stale answer cached.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return
+    if generation is None:
+        generation = get_generation(project_id)
+    chunk_ids = [m.get("id") for m in response.get("matches", [])]
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (_key(project_id), normalize_query(question), int(top_k),
+                 int(generation), json.dumps(chunk_ids), json.dumps(response),
+                 time.time()))
+
+
+def clear(project_id: Optional[str] = None) -> None:
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            if project_id is None:
+                conn.execute("DELETE FROM answers")
+            else:
+                conn.execute("DELETE FROM answers WHERE project_key = ?",
+                             (_key(project_id),))
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        n = _get_conn().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {"enabled": ANSWER_CACHE_ENABLED, "entries": n, **_counters}
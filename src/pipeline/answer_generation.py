@@ -1,41 +1,75 @@
-from sentence_transformers import SentenceTransformer
-from chromadb.errors import NotFoundError
 import os
 import textwrap
-from chromadb import PersistentClient
-from nomic.embed import text as nomic_text
-from openai import OpenAI
+import time
+from typing import AsyncIterator, Iterator
 from dotenv import load_dotenv
 
+from src.pipeline import embeddings, metrics, prompt_packer, resources
+from src.pipeline.embed_store import get_collection
+
 load_dotenv()
 
 # --- Global clients ---
-CHROMA_PATH = "data/chroma_store"
-COLLECTION_NAME = "projects_codebase"
+# Created lazily through src.pipeline.resources; importing this module
+# must stay cheap (no model load, no Chroma/LLM client at import time).
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
+
+
+def _create_llm_client():
+    from openai import OpenAI
+    return OpenAI(
+        base_url=LLM_BASE_URL,
+        api_key=os.getenv("LLM_key"),
+    )
+
+
+resources.register("llm_client", _create_llm_client)
+
+
+def get_llm_client():
+    """Return the shared OpenAI-compatible (Groq) client."""
+    return resources.get("llm_client")
+
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+
+def _create_async_llm_client():
+    import httpx
+    from openai import AsyncOpenAI
+    # One pooled HTTP/1.1 connection pool shared by all async requests
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                            max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        timeout=LLM_TIMEOUT,
+    )
+    return AsyncOpenAI(
+        base_url=LLM_BASE_URL,
+        api_key=os.getenv("LLM_key"),
+        http_client=http_client,
+    )
+
 
+resources.register("llm_async_client", _create_async_llm_client)
 
-client = PersistentClient(path="data/chroma_store")
-try:
-    collection = client.get_collection("projects_codebase")
-except NotFoundError:
-    collection = client.create_collection("projects_codebase")
 
-groq_client = OpenAI(
-    base_url="https://api.groq.com/openai/v1",
-    api_key=os.getenv("LLM_key"),
-)
+def get_async_llm_client():
+    """Return the shared async OpenAI-compatible client (pooled connections)."""
+    return resources.get("llm_async_client")
+
 
 # -----------------------------------------------------
 # 🔹 1. Generate embedding
 # -----------------------------------------------------
 
 
-# 384-dimensional model (fast, small, consistent)
-_model = SentenceTransformer("all-MiniLM-L6-v2")
-
-
+# 384-dimensional model (fast, small, consistent). Shared with ingest via
+# src.pipeline.embeddings so queries and stored chunks use the same model.
+# Repeated queries are served from embeddings.query_cache.
 def embed_text(text: str) -> list[float]:
-    return _model.encode(text, normalize_embeddings=True).tolist()
+    return embeddings.embed_query(text)
 
 # -----------------------------------------------------
 # 🔹 2. Retrieve context chunks (standalone helper)
@@ -46,7 +80,8 @@ def retrieve_context(query_emb, top_k: int = 3) -> str:
     """
     Retrieve top chunks from the Chroma collection and build a formatted context string.
     """
-    results = collection.query(query_embeddings=[query_emb], n_results=top_k)
+    results = get_collection().query(
+        query_embeddings=[query_emb], n_results=top_k)
 
     context = ""
     for i in range(len(results["documents"][0])):
@@ -63,20 +98,42 @@ def retrieve_context(query_emb, top_k: int = 3) -> str:
 # -----------------------------------------------------
 # 🔹 3. Generate answer with Groq (LLaMA 3 / Mixtral)
 # -----------------------------------------------------
-def llm_answer(question: str, matches: list[dict]) -> str:
+def build_prompt(question: str, matches: list[dict]) -> str:
     """
-    Builds an LLM prompt from retrieved chunks and returns the model's concise answer.
+    Builds the LLM prompt from the question and retrieved chunks. With
+    PROMPT_PACKING the chunks are merged, deduplicated and cut to the
+    token budget first (see prompt_packer).
     """
+    with metrics.stage("prompt"):
+        blocks = matches
+        if prompt_packer.PROMPT_PACKING:
+            blocks, _ = prompt_packer.pack(matches, render=_context_entry)
+        prompt = _build_prompt(question, blocks)
+    metrics.inc("rag_prompt_chunks_total", len(matches))
+    metrics.inc("rag_prompt_blocks_total", len(blocks))
+    metrics.inc("rag_prompt_chars_total", len(prompt))
+    return prompt
+
+
+def _context_entry(m: dict) -> str:
+    md = m.get("metadata", {})
+    rel_path = md.get("rel_path", md.get("file", "unknown"))
+    idx = md.get("chunk_idx", 0)
+    text = m.get("text", "")
+    where = f"chunk {idx}"
+    if md.get("start_line"):
+        ranges = md.get("line_ranges") or [(md["start_line"], md.get("end_line"))]
+        where = "lines " + ", ".join(f"{s}-{e}" for s, e in ranges)
+        if md.get("symbol"):
+            where = f"{md['symbol']}, {where}"
+    return f"\nFile: {rel_path} ({where})\n{text}\n---\n"
+
+
+def _build_prompt(question: str, matches: list[dict]) -> str:
     # Build code context from matches
-    context = ""
-    for m in matches:
-        md = m.get("metadata", {})
-        rel_path = md.get("rel_path", md.get("file", "unknown"))
-        idx = md.get("chunk_idx", 0)
-        text = m.get("text", "")
-        context += f"\nFile: {rel_path} (chunk {idx})\n{text}\n---\n"
-
-    prompt = f"""
+    context = "".join(_context_entry(m) for m in matches)
+
+    return f"""
 You are an AI assistant helping developers understand their private codebase.
 Answer the question below using only the provided code context.
 Be concise and cite file names and function names when relevant.
@@ -88,15 +145,105 @@ Relevant Code:
 {context}
 """
 
-    response = groq_client.chat.completions.create(
-        model="llama-3.1-8b-instant",  # or "llama3-70b"
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-        max_tokens=600,
-    )
 
-    answer = response.choices[0].message.content.strip()
-    return textwrap.fill(answer, width=90)
+def _count_usage(response) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.inc("rag_llm_tokens_total", usage.prompt_tokens or 0, kind="prompt")
+        metrics.inc("rag_llm_tokens_total", usage.completion_tokens or 0, kind="completion")
+
+
+def format_answer(text: str) -> str:
+    """The shape /ask returns and caches: stripped and wrapped at 90 columns."""
+    return textwrap.fill(text.strip(), width=90)
+
+
+def llm_answer(question: str, matches: list[dict]) -> str:
+    """
+    Builds an LLM prompt from retrieved chunks and returns the model's concise answer.
+    """
+    prompt = build_prompt(question, matches)
+
+    with metrics.stage("llm"):
+        response = get_llm_client().chat.completions.create(
+            model=LLM_MODEL,  # or "llama3-70b"
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=600,
+        )
+    _count_usage(response)
+
+    return format_answer(response.choices[0].message.content)
+
+
+def llm_answer_stream(question: str, matches: list[dict]) -> Iterator[str]:
+    """
+    Same prompt as llm_answer, but yields content deltas as the model
+    produces them (no wrapping; callers render incrementally).
+    """
+    prompt = build_prompt(question, matches)
+
+    t0 = time.perf_counter()
+    first = True
+    with metrics.stage("llm"):
+        stream = get_llm_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=600,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first:
+                    metrics.observe("rag_llm_ttft_seconds", time.perf_counter() - t0)
+                    first = False
+                yield delta
+
+
+async def llm_answer_async(question: str, matches: list[dict]) -> str:
+    """Async variant of llm_answer using the pooled async client."""
+    prompt = build_prompt(question, matches)
+
+    with metrics.stage("llm"):
+        response = await get_async_llm_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=600,
+        )
+    _count_usage(response)
+
+    return format_answer(response.choices[0].message.content)
+
+
+async def llm_answer_stream_async(
+        question: str, matches: list[dict]) -> AsyncIterator[str]:
+    """Async variant of llm_answer_stream."""
+    prompt = build_prompt(question, matches)
+
+    t0 = time.perf_counter()
+    first = True
+    with metrics.stage("llm"):
+        stream = await get_async_llm_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=600,
+            stream=True,
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first:
+                    metrics.observe("rag_llm_ttft_seconds", time.perf_counter() - t0)
+                    first = False
+                yield delta
 
 
 # -----------------------------------------------------
@@ -108,8 +255,8 @@ if __name__ == "__main__":
     context = retrieve_context(query_emb, top_k=3)
 
     print("\n⏳ Generating answer with Groq ...\n")
-    response = groq_client.chat.completions.create(
-        model="llama-3.1-8b-instant",
+    response = get_llm_client().chat.completions.create(
+        model=LLM_MODEL,
         messages=[
             {
                 "role": "user",
@@ -0,0 +1,86 @@
+# concurrency.py
+"""
+Bounded executors and per-stage concurrency limits for the async API.
+
+Blocking work (embedding on CPU, Chroma reads/writes, SQLite caches) runs
+on small dedicated thread pools instead of Starlette's shared threadpool,
+so a burst of /ask calls cannot starve cheap endpoints like /projects.
+Each stage also has an asyncio semaphore; requests beyond the limit wait
+in the event loop instead of piling up threads.
+
+    vec = await run_blocking("embed", embed_text, question)
+    async with stage_limit("llm"):
+        ...
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+# Threads per blocking stage
+STAGE_WORKERS = {
+    "embed": int(os.getenv("EMBED_EXECUTOR_WORKERS", "2")),
+    "store": int(os.getenv("STORE_EXECUTOR_WORKERS", "8")),
+}
+# Max in-flight requests per stage (queued + running)
+STAGE_LIMITS = {
+    "embed": int(os.getenv("EMBED_CONCURRENCY", "16")),
+    "store": int(os.getenv("STORE_CONCURRENCY", "32")),
+    "llm": int(os.getenv("LLM_CONCURRENCY", "32")),
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+# loop -> stage -> semaphore; entries go away with their event loop
+_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_executor(stage: str) -> ThreadPoolExecutor:
+    with _lock:
+        ex = _executors.get(stage)
+        if ex is None:
+            ex = ThreadPoolExecutor(max_workers=max(1, STAGE_WORKERS[stage]),
+                                    thread_name_prefix=f"rag-{stage}")
+            _executors[stage] = ex
+        return ex
+
+
+def _semaphore(stage: str) -> asyncio.Semaphore:
+    # Semaphores belong to an event loop; key them by the running loop.
+    loop = asyncio.get_running_loop()
+    with _lock:
+        stages = _semaphores.get(loop)
+        if stages is None:
+            stages = _semaphores[loop] = {}
+        sem = stages.get(stage)
+        if sem is None:
+            sem = stages[stage] = asyncio.Semaphore(max(1, STAGE_LIMITS[stage]))
+    return sem
+
+
+@asynccontextmanager
+async def stage_limit(stage: str):
+    async with _semaphore(stage):
+        yield
+
+
+async def run_blocking(stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run `fn` on the `stage` executor, respecting the stage's limit."""
+    loop = asyncio.get_running_loop()
+    # run_in_executor doesn't carry context vars (e.g. the request's timings)
+    ctx = contextvars.copy_context()
+    async with stage_limit(stage):
+        return await loop.run_in_executor(
+            get_executor(stage), functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+def shutdown() -> None:
+    with _lock:
+        for ex in _executors.values():
+            ex.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
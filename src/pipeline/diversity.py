@@ -0,0 +1,90 @@
+# diversity.py
+"""
+Optional maximal-marginal-relevance (MMR) selection of retrieved chunks.
+
+Retrieval over-fetches MMR_CANDIDATES chunks together with their stored
+vectors; MMR then picks top_k of them one at a time, each maximising
+
+    MMR_LAMBDA * sim(query, chunk) - (1 - MMR_LAMBDA) * max sim(chunk, picked)
+
+so a large file that matches well cannot fill the whole context with
+near-identical chunks. MMR_MAX_PER_FILE additionally caps how many
+chunks of one rel_path are kept. Similarities are cosine, computed once
+as NumPy matrix products over the candidate pool.
+"""
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.pipeline import metrics
+from src.pipeline.embed_store import get_embeddings
+
+MMR_ENABLED = os.getenv("MMR_ENABLED", "0").lower() in {"1", "true", "yes"}
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1: relevance only, 0: diversity only
+MMR_CANDIDATES = int(os.getenv("MMR_CANDIDATES", "30"))
+MMR_MAX_PER_FILE = int(os.getenv("MMR_MAX_PER_FILE", "0"))  # 0: no cap
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def mmr_select(query_emb: Sequence[float], cand_embs: Sequence[Sequence[float]],
+               top_k: int, lambda_mult: float = MMR_LAMBDA,
+               groups: Optional[Sequence[Any]] = None, max_per_group: int = 0) -> List[int]:
+    """
+    Indices of the MMR selection from `cand_embs`, in pick order. With
+    `groups` and `max_per_group` > 0, at most that many indices share a
+    group; fewer than top_k come back if the cap leaves nothing to pick.
+    """
+    emb = _unit(np.asarray(cand_embs, dtype=np.float32))
+    n = len(emb)
+    if n == 0 or top_k <= 0:
+        return []
+    relevance = emb @ _unit(np.asarray(query_emb, dtype=np.float32))
+    pairwise = emb @ emb.T
+
+    available = np.ones(n, dtype=bool)
+    redundancy = np.zeros(n, dtype=np.float32)  # max similarity to the picked set
+    capped = groups is not None and max_per_group > 0
+    if capped:
+        _, group_ids = np.unique(np.asarray([str(g) for g in groups]), return_inverse=True)
+        counts = np.zeros(group_ids.max() + 1, dtype=int)
+
+    picked: List[int] = []
+    while len(picked) < top_k and available.any():
+        score = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        j = int(np.argmax(np.where(available, score, -np.inf)))
+        picked.append(j)
+        available[j] = False
+        redundancy = pairwise[j] if len(picked) == 1 else np.maximum(redundancy, pairwise[j])
+        if capped:
+            counts[group_ids[j]] += 1
+            if counts[group_ids[j]] >= max_per_group:
+                available &= group_ids != group_ids[j]
+    return picked
+
+
+def mmr(query_emb: Sequence[float], matches: List[Dict[str, Any]], top_k: int,
+        lambda_mult: Optional[float] = None,
+        max_per_file: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Diverse top_k of `matches` (see mmr_select), grouped by rel_path.
+    Vectors come from each match's "embedding" (query_many with
+    include=["embeddings"]) or are fetched from the store; the returned
+    matches don't carry them.
+    """
+    lambda_mult = MMR_LAMBDA if lambda_mult is None else lambda_mult
+    max_per_file = MMR_MAX_PER_FILE if max_per_file is None else max_per_file
+    with metrics.stage("mmr"):
+        missing = [m["id"] for m in matches if m.get("embedding") is None]
+        stored = get_embeddings(missing) if missing else {}
+        pool = [m for m in matches if m.get("embedding") is not None or m["id"] in stored]
+        embs = [m["embedding"] if m.get("embedding") is not None else stored[m["id"]]
+                for m in pool]
+        order = mmr_select(query_emb, embs, top_k, lambda_mult,
+                           groups=[(m.get("metadata") or {}).get("rel_path") for m in pool],
+                           max_per_group=max_per_file)
+    return [{k: v for k, v in pool[i].items() if k != "embedding"} for i in order]
@@ -1,51 +1,149 @@
 # embed_store.py
 import os
-from typing import List, Dict, Any, Optional, Iterable, Tuple
-import chromadb
-from chromadb import Client
-from chromadb.config import Settings
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+from src.pipeline import answer_cache, index_stats, lexical_index, metrics, resources
+from src.pipeline.embeddings import EMBED_MODEL_NAME, EMBED_BATCH_SIZE, embed_texts
 
 PERSIST_DIR = "data/chroma_store"
 COLLECTION_NAME = "projects_codebase"
+# Chroma rejects very large single writes; keep each upsert call below this.
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "2000"))
+
+
+def _create_client():
+    import chromadb
+    os.makedirs(PERSIST_DIR, exist_ok=True)
+    return chromadb.PersistentClient(path=PERSIST_DIR)
+
 
-_client = None
-_collection = None
+def _create_collection():
+    client = get_client()
+    # embedding_function=None: vectors always come from
+    # src.pipeline.embeddings, never from Chroma's default function.
+    try:
+        col = client.get_collection(
+            COLLECTION_NAME, embedding_function=None)
+    except Exception:
+        col = client.create_collection(
+            COLLECTION_NAME,
+            embedding_function=None,
+            metadata={"embed_model": EMBED_MODEL_NAME},
+        )
+    _check_embed_model(col)
+    return col
+
+
+resources.register("chroma_client", _create_client)
+resources.register("chroma_collection", _create_collection)
 
 
 def get_client():
-    """Create or return a single global Chroma client."""
-    global _client
-    if _client is None:
-        os.makedirs(PERSIST_DIR, exist_ok=True)
-        _client = chromadb.PersistentClient(path=PERSIST_DIR)
-    return _client
+    """Return the process-wide Chroma client (created on first use)."""
+    return resources.get("chroma_client")
 
 
 def get_collection():
-    """Create or return a single global Chroma collection."""
-    global _collection
-    if _collection is None:
-        client = get_client()
-        try:
-            _collection = client.get_collection(COLLECTION_NAME)
-        except Exception:
-            _collection = client.create_collection(COLLECTION_NAME)
-    return _collection
+    """Return the process-wide Chroma collection (created on first use)."""
+    return resources.get("chroma_collection")
+
 
+def _check_embed_model(col) -> None:
+    """
+    Make sure the collection was built with the model we query with.
+    Legacy collections without the marker are adopted.
+    """
+    meta = dict(col.metadata or {})
+    stored = meta.get("embed_model")
+    if stored is None:
+        meta["embed_model"] = EMBED_MODEL_NAME
+        col.modify(metadata=meta)
+    elif stored != EMBED_MODEL_NAME:
+        raise RuntimeError(
+            f"Collection '{COLLECTION_NAME}' was embedded with '{stored}' "
+            f"but EMBED_MODEL_NAME is '{EMBED_MODEL_NAME}'. "
+            "Re-embed the projects or switch the model back.")
 
-def upsert_chunks(chunks: List[Dict[str, Any]]) -> Tuple[int, int]:
+
+def upsert_chunks(chunks: List[Dict[str, Any]],
+                  embeddings: Optional[List[List[float]]] = None) -> Tuple[int, int]:
     """
     Upsert a list of chunks: [{"id": str, "text": str, "metadata": {...}}, ...]
+    Embeddings are computed with the shared model unless passed in.
     Returns (n_ids, n_metadatas)
     """
+    if not chunks:
+        return (0, 0)
     col = get_collection()
     ids = [c["id"] for c in chunks]
     texts = [c["text"] for c in chunks]
     metadatas = [c.get("metadata", {}) for c in chunks]
-    col.upsert(ids=ids, documents=texts, metadatas=metadatas)
+    if embeddings is None:
+        embeddings = embed_texts(texts)
+    with metrics.stage("upsert"):
+        for i in range(0, len(ids), UPSERT_BATCH_SIZE):
+            j = i + UPSERT_BATCH_SIZE
+            col.upsert(ids=ids[i:j], documents=texts[i:j],
+                       metadatas=metadatas[i:j], embeddings=embeddings[i:j])
+        index_stats.record_upsert(ids, metadatas)
+        lexical_index.record_upsert(ids, texts, metadatas)
+    _index_changed(md.get("project_id") for md in metadatas)
     return (len(ids), len(metadatas))
 
 
+def project_of(chunk_id: str) -> str:
+    """Chunk ids are '<project_id>::<rel_path>::<idx>' (see parse_file)."""
+    return chunk_id.split("::", 1)[0]
+
+
+def _index_changed(project_ids: Iterable[Optional[str]]) -> None:
+    """Called after every write so caches keyed on index state expire."""
+    answer_cache.bump_generation({p for p in project_ids if p})
+
+
+class ChunkBatcher:
+    """
+    Collects chunks across many files and embeds/upserts them in large
+    batches instead of one small round trip per file.
+
+        with ChunkBatcher() as batcher:
+            for fp in files:
+                batcher.add(parse_file(fp, ...))
+        batcher.written  # total chunks upserted
+    """
+
+    def __init__(self, batch_size: int = EMBED_BATCH_SIZE):
+        self.batch_size = max(1, int(batch_size))
+        self.written = 0
+        self._pending: List[Dict[str, Any]] = []
+
+    def add(self, chunks: Iterable[Dict[str, Any]]) -> int:
+        """Queue chunks; flushes full batches. Returns chunks written now."""
+        self._pending.extend(chunks)
+        n = 0
+        while len(self._pending) >= self.batch_size:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            n += upsert_chunks(batch)[0]
+        self.written += n
+        return n
+
+    def flush(self) -> int:
+        """Write whatever is pending. Returns chunks written."""
+        batch, self._pending = self._pending, []
+        n = upsert_chunks(batch)[0]
+        self.written += n
+        return n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+
 def delete_where(where: Dict[str, Any]) -> int:
     """
     Delete documents by where-filter. Returns number of deleted items (best-effort).
@@ -56,66 +154,127 @@ def delete_where(where: Dict[str, Any]) -> int:
     ids = existing.get("ids", [])
     if ids:
         col.delete(ids=ids)
+        index_stats.record_delete(ids)
+        lexical_index.record_delete(ids)
+        _index_changed(project_of(i) for i in ids)
     return len(ids or [])
 
 
-def get_stats_for_project(project_id: str) -> Dict[str, Any]:
+def delete_ids(ids: List[str]) -> int:
+    """Delete chunks by id. Returns number of ids requested for deletion."""
+    ids = list(ids)
+    if not ids:
+        return 0
     col = get_collection()
-    res = col.get(where={"project_id": project_id}, include=[])
-    return {
-        "project_id": project_id,
-        "chunk_count": len(res.get("ids", []))
-    }
+    for i in range(0, len(ids), UPSERT_BATCH_SIZE):
+        col.delete(ids=ids[i:i + UPSERT_BATCH_SIZE])
+    index_stats.record_delete(ids)
+    lexical_index.record_delete(ids)
+    _index_changed(project_of(i) for i in ids)
+    return len(ids)
+
+
+def get_stats_for_project(project_id: str) -> Dict[str, Any]:
+    """Chunk/file/document counts, read from the materialized index_stats."""
+    return index_stats.get_project_stats(project_id)
 
 
 def list_files_for_project(
-        project_id: str, pattern: Optional[str] = None) -> List[Dict[str, Any]]:
-    from fnmatch import fnmatch
-    col = get_collection()
-    res = col.get(where={"project_id": project_id}, include=["metadatas"])
-    files = {}
-    for md in res.get("metadatas", []):
-        rel = md.get("rel_path")
-        if not rel:
-            continue
-        if pattern and not fnmatch(rel, pattern):
-            continue
-        files.setdefault(
-            rel, {
-                "rel_path": rel, "filetype": md.get("filetype"), "chunks": 0})
-        files[rel]["chunks"] += 1
-    return sorted(files.values(), key=lambda x: x["rel_path"])
-
-
-def list_documents_for_project(project_id: str) -> List[Dict[str, Any]]:
-    col = get_collection()
-    res = col.get(where={"project_id": project_id}, include=["metadatas"])
-    docs = {}
-    for md in res.get("metadatas", []):
-        doc_id = md.get("doc_id")
-        if not doc_id:
-            continue
-        entry = docs.setdefault(
-            doc_id, {
-                "doc_id": doc_id, "source": md.get("source"), "chunk_count": 0})
-        entry["chunk_count"] += 1
-    return list(docs.values())
-
-
-def get_chunks(project_id: str,
-               rel_path: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
-    col = get_collection()
-    where = {"project_id": project_id}
-    if rel_path:
-        where["rel_path"] = rel_path
-    res = col.get(where=where, include=["documents", "metadatas"])
-    items = []
-    ids = res.get("ids", [])
-    docs = res.get("documents", [])
-    mds = res.get("metadatas", [])
-    for i in range(min(len(ids), limit)):
-        items.append({"id": ids[i], "text": docs[i], "metadata": mds[i]})
-    return items
+        project_id: str, pattern: Optional[str] = None,
+        limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    """Files of a project (sorted by rel_path), paged in SQL via index_stats."""
+    return index_stats.list_files(project_id, pattern=pattern, limit=limit, offset=offset)
+
+
+def list_documents_for_project(
+        project_id: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    """Documents of a project (sorted by doc_id), paged in SQL via index_stats."""
+    return index_stats.list_documents(project_id, limit=limit, offset=offset)
+
+
+def get_chunks(project_id: str, rel_path: Optional[str] = None,
+               limit: int = 1000, offset: int = 0,
+               after: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    One page of chunks in chunk_id order. The page of ids is selected in
+    SQL (index_stats) and only those ids are fetched from Chroma.
+    """
+    if limit <= 0:
+        return []
+    ids = index_stats.chunk_ids(project_id, rel_path=rel_path, limit=int(limit),
+                                offset=offset, after=after)
+    if not ids:
+        return []
+    res = get_collection().get(ids=ids, include=["documents", "metadatas"])
+    by_id = {i: (d, md) for i, d, md in zip(
+        res.get("ids") or [], res.get("documents") or [], res.get("metadatas") or [])}
+    return [{"id": i, "text": by_id[i][0], "metadata": by_id[i][1]}
+            for i in ids if i in by_id]
+
+
+def iter_chunks(project_id: str, rel_path: Optional[str] = None,
+                limit: Optional[int] = None, offset: int = 0,
+                page_size: int = 500,
+                after: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Walk a project's chunks page by page with a keyset cursor, starting
+    `offset` chunks past `after` (like get_chunks).
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        n = page_size if remaining is None else min(page_size, remaining)
+        page = get_chunks(project_id, rel_path=rel_path, limit=n,
+                          offset=offset, after=after)
+        if not page:
+            return
+        yield page
+        after, offset = page[-1]["id"], 0
+        if remaining is not None:
+            remaining -= len(page)
+        if len(page) < n:
+            return
+
+
+def iter_pages(fetch, limit: Optional[int] = None, offset: int = 0,
+               page_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Call `fetch(limit=..., offset=...)` page by page until `limit` items
+    (or everything) have been returned, so at most one page is in memory.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        n = page_size if remaining is None else min(page_size, remaining)
+        page = fetch(limit=n, offset=offset)
+        if not page:
+            return
+        yield page
+        offset += len(page)
+        if remaining is not None:
+            remaining -= len(page)
+        if len(page) < n:
+            return
+
+
+def get_matches(ids: List[str]) -> List[Dict[str, Any]]:
+    """Fetch chunks by id in the same shape as query() (distance None)."""
+    if not ids:
+        return []
+    res = get_collection().get(ids=list(ids), include=["documents", "metadatas"])
+    by_id = {i: (d, md) for i, d, md in zip(
+        res.get("ids") or [], res.get("documents") or [], res.get("metadatas") or [])}
+    return [{"id": i, "text": by_id[i][0], "metadata": by_id[i][1] or {}, "distance": None}
+            for i in ids if i in by_id]
+
+
+def get_embeddings(ids: List[str]) -> Dict[str, Any]:
+    """Stored vectors by chunk id (missing ids are left out)."""
+    if not ids:
+        return {}
+    res = get_collection().get(ids=list(ids), include=["embeddings"])
+    embs = res.get("embeddings")
+    if embs is None:
+        return {}
+    return dict(zip(res.get("ids") or [], embs))
 
 
 def query(query_embedding, top_k: int = 5, where: dict |
@@ -125,34 +284,53 @@ def query(query_embedding, top_k: int = 5, where: dict |
     Valid include items for query(): 'documents', 'embeddings', 'metadatas', 'distances', 'uris', 'data'
     ('ids' is NOT valid for query()).
     """
+    return query_many([query_embedding], top_k=top_k, where=where, include=include)[0]
+
+
+def query_many(query_embeddings, top_k: int = 5, where: dict |
+               None = None, include: list[str] | None = None) -> List[List[Dict[str, Any]]]:
+    """
+    Nearest chunks for several query vectors in one Collection.query call.
+    Returns one list of matches per vector, in order.
+    """
+    if not len(query_embeddings):
+        return []
     col = get_collection()
 
     # Default include set for query (NO 'ids')
     if include is None:
         include = ["documents", "metadatas", "distances"]
 
-    # Chroma expects a list for query_embeddings, even for a single vector
-    q = col.query(
-        query_embeddings=[query_embedding],
-        n_results=max(1, int(top_k)),
-        where=where or {},
-        include=include,
-    )
-
-    # Normalize result to a simple list of matches
-    matches = []
-    if q and q.get("documents"):
-        docs = q["documents"][0]
-        metas = q.get("metadatas", [[]])[0]
-        dists = q.get("distances", [[]])[0]
-        for i, doc in enumerate(docs):
-            meta = metas[i] if i < len(metas) else {}
-            dist = dists[i] if i < len(dists) else None
-            matches.append(
-                {
+    with metrics.stage("vector_query"):
+        q = col.query(
+            query_embeddings=list(query_embeddings),
+            n_results=max(1, int(top_k)),
+            where=where or {},
+            include=include,
+        )
+
+    # Normalize result to a simple list of matches per query
+    results = []
+    for n in range(len(query_embeddings)):
+        matches = []
+        if q and q.get("documents"):
+            docs = q["documents"][n]
+            ids = (q.get("ids") or [[]] * (n + 1))[n]
+            metas = (q.get("metadatas") or [[]] * (n + 1))[n]
+            dists = (q.get("distances") or [[]] * (n + 1))[n]
+            # arrays, so no `or` default
+            embs = q["embeddings"][n] if q.get("embeddings") is not None else []
+            for i, doc in enumerate(docs):
+                meta = metas[i] if i < len(metas) else {}
+                dist = dists[i] if i < len(dists) else None
+                match = {
+                    "id": ids[i] if i < len(ids) else None,
                     "text": doc,
                     "metadata": meta or {},
                     "distance": dist,
                 }
-            )
-    return matches
+                if i < len(embs):
+                    match["embedding"] = embs[i]
+                matches.append(match)
+        results.append(matches)
+    return results
@@ -0,0 +1,292 @@
+# embeddings.py
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.pipeline import metrics, resources
+
+logger = logging.getLogger(__name__)
+
+# Single source of truth for the embedding model. Both ingest
+# (embed_store.upsert_chunks) and query (answer_generation.embed_text)
+# encode through this module, and the collection records the model name
+# so a mismatch is caught instead of silently returning garbage matches.
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+# How the model runs: "torch" (SentenceTransformer), "onnx" (ONNX Runtime,
+# fp32) or "onnx-int8" (ONNX Runtime, dynamically quantized weights). All
+# three produce vectors in the same space, so switching needs no re-embed.
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+# ONNX file inside the model's hub repo, or a local file (EMBED_ONNX_PATH).
+# The sentence-transformers repos ship pre-quantized variants, e.g.
+# onnx/model_qint8_arm64.onnx or onnx/model_qint8_avx512_vnni.onnx.
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "")
+EMBED_ONNX_PATH = os.getenv("EMBED_ONNX_PATH", "")
+EMBED_ONNX_THREADS = int(os.getenv("EMBED_ONNX_THREADS", "0"))  # 0: ORT default
+
+_ONNX_DEFAULT_FILES = {"onnx": "onnx/model.onnx", "onnx-int8": "onnx/model_quint8_avx2.onnx"}
+
+
+def _hub_name(model_name: str) -> str:
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def _create_model():
+    if EMBED_BACKEND not in EMBED_BACKENDS:
+        raise ValueError(f"EMBED_BACKEND must be one of {EMBED_BACKENDS}, got '{EMBED_BACKEND}'")
+    if EMBED_BACKEND != "torch":
+        return OnnxEmbedder.load(EMBED_MODEL_NAME, EMBED_BACKEND)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL_NAME)
+
+
+resources.register("embed_model", _create_model)
+
+
+def get_model():
+    """Return the shared embedding model of EMBED_BACKEND (loaded on first use)."""
+    return resources.get("embed_model")
+
+
+# ---- Tokenizer ----
+
+# Input limit of the embedding model in wordpieces (incl. [CLS]/[SEP]);
+# anything longer is silently truncated by the model.
+EMBED_MAX_TOKENS = int(os.getenv("EMBED_MAX_TOKENS", "256"))
+
+
+def _create_tokenizer():
+    """
+    The embedding model's fast tokenizer, without loading the model.
+    Returns None if it can't be loaded, so callers fall back instead of
+    retrying the download for every file.
+    """
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(_hub_name(EMBED_MODEL_NAME), use_fast=True)
+    except Exception as e:
+        logger.warning("Tokenizer for %s unavailable (%s); using character chunks",
+                       EMBED_MODEL_NAME, e)
+        return None
+
+
+resources.register("tokenizer", _create_tokenizer)
+
+
+def get_tokenizer():
+    """Return the shared tokenizer of the embedding model, or None."""
+    return resources.get("tokenizer")
+
+
+# ---- ONNX Runtime backend ----
+
+
+class OnnxEmbedder:
+    """
+    Sentence embeddings from an ONNX export of the transformer: the
+    model's tokenizer.json (`tokenizers`, not transformers, which pulls in
+    torch), one ONNX Runtime session and mean pooling, i.e. what
+    SentenceTransformer does for MiniLM-style models. Exposes the subset
+    of SentenceTransformer.encode() that embed_texts() uses.
+    """
+
+    def __init__(self, session, tokenizer, max_tokens: int = EMBED_MAX_TOKENS):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.input_names = [i.name for i in session.get_inputs()]
+        tokenizer.enable_truncation(max_length=max_tokens)
+        pad = next((t for t in ("[PAD]", "<pad>") if tokenizer.token_to_id(t) is not None),
+                   "[PAD]")
+        tokenizer.enable_padding(pad_id=tokenizer.token_to_id(pad) or 0, pad_token=pad)
+
+    @staticmethod
+    def _model_file(model_name: str, filename: str) -> str:
+        if os.path.isdir(model_name):
+            return os.path.join(model_name, filename)
+        from huggingface_hub import hf_hub_download
+        return hf_hub_download(_hub_name(model_name), filename)
+
+    @classmethod
+    def load(cls, model_name: str, backend: str = "onnx") -> "OnnxEmbedder":
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = EMBED_ONNX_PATH or cls._model_file(
+            model_name, EMBED_ONNX_FILE or _ONNX_DEFAULT_FILES[backend])
+        tokenizer = Tokenizer.from_file(cls._model_file(model_name, "tokenizer.json"))
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if EMBED_ONNX_THREADS > 0:
+            opts.intra_op_num_threads = EMBED_ONNX_THREADS
+        session = ort.InferenceSession(path, sess_options=opts,
+                                       providers=["CPUExecutionProvider"])
+        logger.info("Loaded ONNX embedding model %s (%s)", path, backend)
+        return cls(session, tokenizer)
+
+    def _forward(self, texts: List[str]):
+        import numpy as np
+
+        encodings = self.tokenizer.encode_batch(texts)
+        enc = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        mask = enc["attention_mask"]
+        feed = {name: enc[name] for name in self.input_names if name in enc}
+        hidden = self.session.run(None, feed)[0]  # (batch, seq, dim)
+        weights = mask[..., None].astype(hidden.dtype)
+        return (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32,
+               normalize_embeddings: bool = True, show_progress_bar: bool = False):
+        import numpy as np
+
+        texts = list(texts)
+        # batch texts of similar length together so little padding is computed
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        out = None
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            pooled = self._forward([texts[i] for i in idx])
+            if out is None:
+                out = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            out[idx] = pooled
+        if out is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+
+def embed_texts(texts: Sequence[str],
+                batch_size: int = EMBED_BATCH_SIZE) -> List[List[float]]:
+    """
+    Encode many texts in one call. The model splits them into
+    `batch_size` forward passes internally.
+    """
+    if not texts:
+        return []
+    model = get_model()
+    with metrics.stage("embed"):
+        vectors = model.encode(
+            list(texts),
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+    metrics.observe("rag_embed_batch_size", len(texts))
+    metrics.inc("rag_embedded_texts_total", len(texts))
+    return vectors.tolist()
+
+
+def embed_text(text: str) -> List[float]:
+    """Encode a single text (e.g. a query) with the shared model."""
+    return embed_texts([text])[0]
+
+
+# ---- Query embedding cache ----
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))  # seconds
+
+
+class QueryCache:
+    """
+    Bounded LRU + TTL cache of query embeddings keyed on
+    (model id, normalized text). Thread-safe.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = float(ttl)
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            stored_at, vector = item
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: Tuple[str, str], vector: List[float]) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), vector)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+query_cache = QueryCache()
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace so trivially different spellings share an entry."""
+    return " ".join(text.split())
+
+
+def _query_key(norm: str) -> Tuple[str, str]:
+    # quantized backends give slightly different vectors; don't mix them
+    return (f"{EMBED_MODEL_NAME}@{EMBED_BACKEND}", norm)
+
+
+def embed_query(text: str) -> List[float]:
+    """Embed a search/ask query, served from `query_cache` when possible."""
+    norm = normalize_query(text)
+    key = _query_key(norm)
+    vector = query_cache.get(key)
+    if vector is None:
+        vector = embed_text(norm)
+        query_cache.put(key, vector)
+    return list(vector)
+
+
+def embed_queries(texts: Sequence[str]) -> List[List[float]]:
+    """embed_query() for many queries: cache misses are encoded in one model call."""
+    norms = [normalize_query(t) for t in texts]
+    vectors: List[Optional[List[float]]] = [query_cache.get(_query_key(n)) for n in norms]
+    missing = sorted({n for n, v in zip(norms, vectors) if v is None})
+    fresh = dict(zip(missing, embed_texts(missing)))
+    for n, v in fresh.items():
+        query_cache.put(_query_key(n), v)
+    return [list(v if v is not None else fresh[n]) for n, v in zip(norms, vectors)]
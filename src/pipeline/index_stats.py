@@ -0,0 +1,287 @@
+# index_stats.py
+"""
+Materialized per-project index statistics.
+
+A SQLite side table mirrors the (chunk_id -> project, file, document)
+mapping of the Chroma collection. Triggers keep per-file, per-document
+and per-project counters up to date as rows are inserted or deleted, so
+chunk/file/document counts are a single-row read instead of a scan over
+every matching id in Chroma. embed_store records every upsert and delete
+here; `reconcile` rebuilds the table from Chroma if the two drift apart:
+
+    python -m src.pipeline.index_stats reconcile [--project-id ID]
+"""
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+INDEX_STATS_PATH = os.getenv("INDEX_STATS_PATH", "data/index_stats.sqlite3")
+# Page size used when scanning Chroma during reconcile
+RECONCILE_PAGE_SIZE = 5000
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.RLock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id   TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    rel_path   TEXT,
+    filetype   TEXT,
+    doc_id     TEXT,
+    source     TEXT
+);
+CREATE INDEX IF NOT EXISTS chunks_project ON chunks (project_id, rel_path);
+CREATE INDEX IF NOT EXISTS chunks_project_id ON chunks (project_id, chunk_id);
+CREATE TABLE IF NOT EXISTS files (
+    project_id TEXT NOT NULL,
+    rel_path   TEXT NOT NULL,
+    filetype   TEXT,
+    chunks     INTEGER NOT NULL,
+    PRIMARY KEY (project_id, rel_path)
+);
+CREATE TABLE IF NOT EXISTS docs (
+    project_id TEXT NOT NULL,
+    doc_id     TEXT NOT NULL,
+    source     TEXT,
+    chunks     INTEGER NOT NULL,
+    PRIMARY KEY (project_id, doc_id)
+);
+CREATE TABLE IF NOT EXISTS project_stats (
+    project_id  TEXT PRIMARY KEY,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    file_count  INTEGER NOT NULL DEFAULT 0,
+    doc_count   INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS chunk_added AFTER INSERT ON chunks BEGIN
+    INSERT INTO project_stats (project_id, chunk_count) VALUES (NEW.project_id, 1)
+        ON CONFLICT(project_id) DO UPDATE SET chunk_count = chunk_count + 1;
+    INSERT INTO files (project_id, rel_path, filetype, chunks)
+        SELECT NEW.project_id, NEW.rel_path, NEW.filetype, 1 WHERE NEW.rel_path IS NOT NULL
+        ON CONFLICT(project_id, rel_path) DO UPDATE SET chunks = chunks + 1;
+    INSERT INTO docs (project_id, doc_id, source, chunks)
+        SELECT NEW.project_id, NEW.doc_id, NEW.source, 1 WHERE NEW.doc_id IS NOT NULL
+        ON CONFLICT(project_id, doc_id) DO UPDATE SET chunks = chunks + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS chunk_removed AFTER DELETE ON chunks BEGIN
+    UPDATE project_stats SET chunk_count = chunk_count - 1 WHERE project_id = OLD.project_id;
+    UPDATE files SET chunks = chunks - 1
+        WHERE project_id = OLD.project_id AND rel_path = OLD.rel_path;
+    DELETE FROM files
+        WHERE project_id = OLD.project_id AND rel_path = OLD.rel_path AND chunks <= 0;
+    UPDATE docs SET chunks = chunks - 1
+        WHERE project_id = OLD.project_id AND doc_id = OLD.doc_id;
+    DELETE FROM docs
+        WHERE project_id = OLD.project_id AND doc_id = OLD.doc_id AND chunks <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS file_added AFTER INSERT ON files BEGIN
+    UPDATE project_stats SET file_count = file_count + 1 WHERE project_id = NEW.project_id;
+END;
+CREATE TRIGGER IF NOT EXISTS file_removed AFTER DELETE ON files BEGIN
+    UPDATE project_stats SET file_count = file_count - 1 WHERE project_id = OLD.project_id;
+END;
+CREATE TRIGGER IF NOT EXISTS doc_added AFTER INSERT ON docs BEGIN
+    UPDATE project_stats SET doc_count = doc_count + 1 WHERE project_id = NEW.project_id;
+END;
+CREATE TRIGGER IF NOT EXISTS doc_removed AFTER DELETE ON docs BEGIN
+    UPDATE project_stats SET doc_count = doc_count - 1 WHERE project_id = OLD.project_id;
+END;
+"""
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        d = os.path.dirname(INDEX_STATS_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(INDEX_STATS_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def _row(chunk_id: str, md: Dict[str, Any]) -> tuple:
+    # chunk ids are '<project_id>::<rel_path>::<idx>' (see embed_store.project_of)
+    return (chunk_id, md.get("project_id") or chunk_id.split("::", 1)[0],
+            md.get("rel_path"), md.get("filetype"), md.get("doc_id"), md.get("source"))
+
+
+def _write(conn: sqlite3.Connection, ids: Sequence[str],
+           metadatas: Sequence[Dict[str, Any]]) -> None:
+    rows = {i: _row(i, md or {}) for i, md in zip(ids, metadatas)}
+    # delete + insert (not INSERT OR REPLACE) so the delete triggers fire
+    # for chunks that moved between files or documents
+    conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(i,) for i in rows])
+    conn.executemany(
+        "INSERT INTO chunks (chunk_id, project_id, rel_path, filetype, doc_id, source) "
+        "VALUES (?, ?, ?, ?, ?, ?)", list(rows.values()))
+
+
+def record_upsert(ids: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+    """Mirror a Chroma upsert."""
+    if not ids:
+        return
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            _write(conn, ids, metadatas)
+
+
+def record_delete(ids: Iterable[str]) -> None:
+    """Mirror a Chroma delete."""
+    rows = [(i,) for i in ids]
+    if not rows:
+        return
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", rows)
+
+
+def _is_built(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM meta WHERE key = 'built'").fetchone() is not None
+
+
+def _ensure_built() -> None:
+    """First use against an existing Chroma store: build the table once."""
+    with _lock:
+        if not _is_built(_get_conn()):
+            reconcile()
+
+
+def get_project_stats(project_id: str) -> Dict[str, Any]:
+    _ensure_built()
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT chunk_count, file_count, doc_count FROM project_stats "
+            "WHERE project_id = ?", (project_id,)).fetchone()
+    chunks, files, docs = row or (0, 0, 0)
+    return {"project_id": project_id, "chunk_count": chunks,
+            "file_count": files, "doc_count": docs}
+
+
+def all_project_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every project with indexed chunks, in one query."""
+    _ensure_built()
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT project_id, chunk_count, file_count, doc_count FROM project_stats "
+            "WHERE chunk_count > 0").fetchall()
+    return {r[0]: {"project_id": r[0], "chunk_count": r[1],
+                   "file_count": r[2], "doc_count": r[3]} for r in rows}
+
+
+def _glob(pattern: str) -> str:
+    """fnmatch pattern -> SQLite GLOB (only negated classes differ)."""
+    return pattern.replace("[!", "[^")
+
+
+def list_files(project_id: str, pattern: Optional[str] = None,
+               limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    """One page of a project's files, ordered by rel_path."""
+    _ensure_built()
+    sql = "SELECT rel_path, filetype, chunks FROM files WHERE project_id = ?"
+    args: List[Any] = [project_id]
+    if pattern:
+        sql += " AND rel_path GLOB ?"
+        args.append(_glob(pattern))
+    sql += " ORDER BY rel_path LIMIT ? OFFSET ?"
+    args += [-1 if limit is None else int(limit), max(0, int(offset))]
+    with _lock:
+        rows = _get_conn().execute(sql, args).fetchall()
+    return [{"rel_path": r[0], "filetype": r[1], "chunks": r[2]} for r in rows]
+
+
+def list_documents(project_id: str, limit: Optional[int] = None,
+                   offset: int = 0) -> List[Dict[str, Any]]:
+    """One page of a project's documents, ordered by doc_id."""
+    _ensure_built()
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT doc_id, source, chunks FROM docs WHERE project_id = ? "
+            "ORDER BY doc_id LIMIT ? OFFSET ?",
+            (project_id, -1 if limit is None else int(limit), max(0, int(offset)))).fetchall()
+    return [{"doc_id": r[0], "source": r[1], "chunk_count": r[2]} for r in rows]
+
+
+def chunk_ids(project_id: str, rel_path: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0,
+              after: Optional[str] = None) -> List[str]:
+    """
+    One page of a project's chunk ids in chunk_id order. `after` is a
+    keyset cursor (the last id of the previous page); prefer it over a
+    growing `offset` when walking a whole project.
+    """
+    _ensure_built()
+    sql = "SELECT chunk_id FROM chunks WHERE project_id = ?"
+    args: List[Any] = [project_id]
+    if rel_path:
+        sql += " AND rel_path = ?"
+        args.append(rel_path)
+    if after:
+        sql += " AND chunk_id > ?"
+        args.append(after)
+    sql += " ORDER BY chunk_id LIMIT ? OFFSET ?"
+    args += [-1 if limit is None else int(limit), max(0, int(offset))]
+    with _lock:
+        return [r[0] for r in _get_conn().execute(sql, args).fetchall()]
+
+
+def reconcile(project_id: Optional[str] = None) -> Dict[str, int]:
+    """
+    Rebuild the table from the Chroma collection (for one project or all).
+    Returns the number of chunks recorded per project.
+    """
+    from src.pipeline.embed_store import get_collection
+
+    col = get_collection()
+    where = {"project_id": project_id} if project_id else None
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            if project_id:
+                conn.execute("DELETE FROM chunks WHERE project_id = ?", (project_id,))
+                conn.execute("DELETE FROM project_stats WHERE project_id = ?", (project_id,))
+            else:
+                for table in ("chunks", "files", "docs", "project_stats"):
+                    conn.execute(f"DELETE FROM {table}")
+            offset = 0
+            while True:
+                page = col.get(where=where, include=["metadatas"],
+                               limit=RECONCILE_PAGE_SIZE, offset=offset)
+                ids: List[str] = page.get("ids") or []
+                if not ids:
+                    break
+                _write(conn, ids, page.get("metadatas") or [{}] * len(ids))
+                offset += len(ids)
+            if project_id is None:
+                # one project says nothing about the others
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+        rows = conn.execute(
+            "SELECT project_id, chunk_count FROM project_stats WHERE chunk_count > 0"
+        ).fetchall()
+    return {r[0]: r[1] for r in rows if not project_id or r[0] == project_id}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Index statistics maintenance.")
+    parser.add_argument("command", choices=["reconcile", "show"])
+    parser.add_argument("--project-id", default=None)
+    args = parser.parse_args()
+    if args.command == "reconcile":
+        print(json.dumps(reconcile(args.project_id), indent=2))
+    elif args.project_id:
+        print(json.dumps(get_project_stats(args.project_id), indent=2))
+    else:
+        print(json.dumps(all_project_stats(), indent=2))
@@ -0,0 +1,177 @@
+# ingest_pipeline.py
+"""
+Pipelined ingest: walker -> parse workers -> batched embedder -> writer.
+
+Stages run concurrently and talk through bounded queues, so a slow stage
+applies backpressure instead of letting memory grow. Parsing runs in a
+process pool (one worker per core by default), embedding runs on one
+thread (the model is already multi-threaded), and a single thread owns
+all Chroma writes. Parse workers are spawned, not forked.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.pipeline.embed_store import upsert_chunks
+from src.pipeline.embeddings import EMBED_BATCH_SIZE, embed_texts
+from src.pipeline.parse_chunk import parse_file
+
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "0")) or (os.cpu_count() or 2)
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+
+_DONE = object()
+
+
+class IngestCancelled(Exception):
+    """Raised when an ingest is cancelled through its `cancel` event."""
+
+
+class _Stop(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+def _put(q: "queue.Queue", item, stop: threading.Event) -> None:
+    while True:
+        if stop.is_set():
+            raise _Stop()
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(q: "queue.Queue", stop: threading.Event):
+    while True:
+        if stop.is_set():
+            raise _Stop()
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+
+def run_pipeline(
+    paths: Iterable[str],
+    parse_kwargs: Dict[str, Any],
+    workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    use_processes: bool = True,
+    on_file: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+    on_written: Optional[Callable[[int], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, int]:
+    """
+    Parse, embed and upsert every file in `paths`.
+
+    `paths` may be a lazy iterator (e.g. a directory walk); it is consumed
+    by the walker stage. `on_file(path, chunks)` is called from the
+    embedder stage once a file has been parsed (also for empty files),
+    `on_written(n)` from the writer after each upsert. Setting `cancel`
+    stops the walk and raises IngestCancelled.
+    Returns {"files": files_with_chunks, "chunks": chunks_upserted}.
+    """
+    workers = max(1, int(workers or INGEST_PARSE_WORKERS))
+    queue_size = max(1, int(queue_size or INGEST_QUEUE_SIZE))
+    batch_size = max(1, int(batch_size))
+
+    parsed_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    write_q: "queue.Queue" = queue.Queue(maxsize=max(2, queue_size // 16))
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    counts = {"files": 0, "chunks": 0}
+
+    if use_processes:
+        # spawn, not fork: forking a threaded server can copy a lock
+        # (resources, logging) held by another thread into the worker
+        pool = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+    def fail(exc: BaseException) -> None:
+        errors.append(exc)
+        stop.set()
+
+    def walker():
+        # Futures go into a bounded queue: at most `queue_size` files are
+        # being parsed or waiting to be embedded at any time.
+        try:
+            for fp in paths:
+                if cancel is not None and cancel.is_set():
+                    raise IngestCancelled()
+                fut = pool.submit(parse_file, fp, **parse_kwargs)
+                _put(parsed_q, (fp, fut), stop)
+            _put(parsed_q, _DONE, stop)
+        except _Stop:
+            pass
+        except BaseException as e:
+            fail(e)
+
+    def embedder():
+        pending: List[Dict[str, Any]] = []
+
+        def emit(batch):
+            vectors = embed_texts([c["text"] for c in batch], batch_size=batch_size)
+            _put(write_q, (batch, vectors), stop)
+
+        try:
+            while True:
+                item = _get(parsed_q, stop)
+                if item is _DONE:
+                    break
+                fp, fut = item
+                chunks = fut.result()
+                if on_file is not None:
+                    on_file(fp, chunks)
+                if not chunks:
+                    continue
+                counts["files"] += 1
+                pending.extend(chunks)
+                while len(pending) >= batch_size:
+                    emit(pending[:batch_size])
+                    del pending[:batch_size]
+            if pending:
+                emit(pending)
+            _put(write_q, _DONE, stop)
+        except _Stop:
+            pass
+        except BaseException as e:
+            fail(e)
+
+    def writer():
+        try:
+            while True:
+                item = _get(write_q, stop)
+                if item is _DONE:
+                    break
+                batch, vectors = item
+                n = upsert_chunks(batch, embeddings=vectors)[0]
+                counts["chunks"] += n
+                if on_written is not None:
+                    on_written(n)
+        except _Stop:
+            pass
+        except BaseException as e:
+            fail(e)
+
+    threads = [
+        threading.Thread(target=walker, name="ingest-walker", daemon=True),
+        threading.Thread(target=embedder, name="ingest-embedder", daemon=True),
+        threading.Thread(target=writer, name="ingest-writer", daemon=True),
+    ]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    if errors:
+        raise errors[0]
+    return counts
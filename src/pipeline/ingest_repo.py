@@ -3,10 +3,22 @@ import os
 import uuid
 import json
 import subprocess
-from typing import Dict, Any, List, Optional, Iterable, Tuple
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Iterable, Tuple
 
-from src.pipeline.embed_store import upsert_chunks
-from src.pipeline.parse_chunk import parse_file, parse_folder
+from src.pipeline import index_stats, metrics
+from src.pipeline.embed_store import ChunkBatcher, delete_ids, delete_where
+from src.pipeline.embeddings import EMBED_BATCH_SIZE
+from src.pipeline.ingest_pipeline import IngestCancelled, run_pipeline
+from src.pipeline.manifest import (
+    file_hash,
+    is_unchanged,
+    load_manifest,
+    make_entry,
+    save_manifest,
+)
+from src.pipeline.parse_chunk import CHUNKER_VERSION, parse_file, parse_folder
 
 IGNORE_DIRS = {
     ".git",
@@ -24,6 +36,28 @@ def _should_skip_dir(dirname: str) -> bool:
     return base in IGNORE_DIRS
 
 
+def _iter_files(folder_path: str,
+                exts: Optional[List[str]] = None) -> Iterable[str]:
+    """Yield files under `folder_path`, pruning IGNORE_DIRS."""
+    for root, dirs, filenames in os.walk(folder_path):
+        # prune ignored dirs
+        dirs[:] = [
+            d for d in dirs if not _should_skip_dir(
+                os.path.join(
+                    root, d))]
+        for f in filenames:
+            if exts:
+                if any(f.endswith(e) for e in exts):
+                    yield os.path.join(root, f)
+            else:
+                yield os.path.join(root, f)
+
+
+def _check_cancel(cancel: Optional[threading.Event]) -> None:
+    if cancel is not None and cancel.is_set():
+        raise IngestCancelled()
+
+
 def ingest_folder(
     folder_path: str,
     project_id: str,
@@ -31,45 +65,232 @@ def ingest_folder(
     repo_url: Optional[str] = None,
     branch: Optional[str] = None,
     exts: Optional[List[str]] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    parallel: bool = False,
+    workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    incremental: bool = True,
+    prune: bool = True,
+    progress: Optional[Callable[..., None]] = None,
+    cancel: Optional[threading.Event] = None,
 ) -> Dict[str, Any]:
     """
     Walk `folder_path`, parse supported files, upsert chunks.
+    Chunks from many files are embedded together in `batch_size` batches.
+    With `parallel=True` the walk, parse, embed and write stages run
+    concurrently (see ingest_pipeline.run_pipeline).
+
+    The project manifest is used to skip files whose content is unchanged
+    (`incremental`), to delete chunks a modified file no longer produces,
+    and (`prune`) to delete chunks of files that disappeared from the folder.
+
+    `progress(**fields)` receives running counters (files_scanned,
+    files_total, files_done, chunks_upserted); setting `cancel` aborts
+    with IngestCancelled before the manifest is saved.
     """
     if not os.path.isdir(folder_path):
         raise ValueError(f"Folder not found: {folder_path}")
 
-    files = []
-    for root, dirs, filenames in os.walk(folder_path):
-        # prune ignored dirs
-        dirs[:] = [
-            d for d in dirs if not _should_skip_dir(
-                os.path.join(
-                    root, d))]
-        for f in filenames:
-            if exts:
-                if any(f.endswith(e) for e in exts):
-                    files.append(os.path.join(root, f))
-            else:
-                files.append(os.path.join(root, f))
-
-    total_chunks = 0
-    file_count = 0
-
-    for fp in files:
-        chunks = parse_file(
-            fp,
-            project_id=project_id,
-            project_name=project_name,
-            repo_url=repo_url,
-            branch=branch,
+    parse_kwargs = {
+        "project_id": project_id,
+        "project_name": project_name,
+        "repo_url": repo_url,
+        "branch": branch,
+    }
+
+    manifest = load_manifest(project_id)
+    entries = manifest["files"]
+    # chunks from another chunker version must be rebuilt even if unchanged
+    incremental = incremental and manifest.get("chunker") == CHUNKER_VERSION
+
+    # ---- Plan: which files need (re-)parsing ----
+    seen = set()
+    to_parse: List[str] = []
+    hashes: Dict[str, str] = {}
+    skipped = 0
+    for fp in _iter_files(folder_path, exts):
+        _check_cancel(cancel)
+        ap = os.path.abspath(fp)
+        seen.add(ap)
+        if progress is not None and len(seen) % 500 == 0:
+            progress(files_scanned=len(seen))
+        old = entries.get(ap)
+        if incremental and old and is_unchanged(fp, old):
+            skipped += 1
+            continue
+        h = file_hash(fp)
+        if incremental and old and old.get("hash") == h:
+            # touched but identical: refresh stat info only
+            entries[ap] = make_entry(fp, h, old.get("chunk_ids", []))
+            skipped += 1
+            continue
+        hashes[ap] = h
+        to_parse.append(fp)
+
+    # ---- Files that disappeared from the folder ----
+    removed: List[str] = []
+    if prune:
+        root = os.path.join(os.path.abspath(folder_path), "")
+        for ap in entries:
+            if ap in seen or not ap.startswith(root):
+                continue
+            if exts and not any(ap.endswith(e) for e in exts):
+                continue
+            removed.append(ap)
+
+    if progress is not None:
+        progress(files_scanned=len(seen), files_skipped=skipped,
+                 files_total=len(to_parse), files_done=0, chunks_upserted=0)
+    res = _apply_changes(
+        manifest, to_parse, hashes, removed, parse_kwargs,
+        batch_size=batch_size, parallel=parallel,
+        workers=workers, queue_size=queue_size,
+        progress=progress, cancel=cancel)
+    manifest["chunker"] = CHUNKER_VERSION
+    save_manifest(project_id, manifest)
+
+    return {"project_id": project_id, **res, "files_skipped": skipped}
+
+
+def _apply_changes(
+    manifest: Dict[str, Any],
+    to_parse: List[str],
+    hashes: Dict[str, str],
+    removed: List[str],
+    parse_kwargs: Dict[str, Any],
+    batch_size: int = EMBED_BATCH_SIZE,
+    parallel: bool = False,
+    workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    progress: Optional[Callable[..., None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Re-embed `to_parse`, drop the chunks of `removed` (abs paths) and of
+    lines a re-parsed file no longer has, and update `manifest` in place.
+    `hashes` maps abs path -> content hash for every file in `to_parse`.
+    """
+    entries = manifest["files"]
+    stale_ids: List[str] = []
+    done = {"files": 0, "chunks": 0}
+    t0 = time.perf_counter()
+
+    def on_written(n: int) -> None:
+        done["chunks"] += n
+        if progress is not None:
+            progress(chunks_upserted=done["chunks"])
+
+    def on_file(fp: str, chunks: List[Dict[str, Any]]) -> None:
+        done["files"] += 1
+        if progress is not None:
+            progress(files_done=done["files"])
+        ap = os.path.abspath(fp)
+        new_ids = [c["id"] for c in chunks]
+        old = entries.get(ap)
+        if old:
+            keep = set(new_ids)
+            stale_ids.extend(i for i in old.get("chunk_ids", []) if i not in keep)
+        entries[ap] = make_entry(fp, hashes[ap], new_ids)
+
+    if parallel:
+        counts = run_pipeline(
+            to_parse,
+            parse_kwargs,
+            workers=workers,
+            queue_size=queue_size,
+            batch_size=batch_size,
+            on_file=on_file,
+            on_written=on_written,
+            cancel=cancel,
         )
-        if chunks:
-            n_ids, _ = upsert_chunks(chunks)
-            total_chunks += n_ids
-            file_count += 1
+        file_count, chunk_count = counts["files"], counts["chunks"]
+    else:
+        file_count = 0
+        with ChunkBatcher(batch_size) as batcher:
+            for fp in to_parse:
+                _check_cancel(cancel)
+                with metrics.stage("parse"):
+                    chunks = parse_file(fp, **parse_kwargs)
+                on_file(fp, chunks)
+                if chunks:
+                    on_written(batcher.add(chunks))
+                    file_count += 1
+            on_written(batcher.flush())
+        chunk_count = batcher.written
+
+    chunks_deleted = 0
+    for ap in removed:
+        entry = entries.pop(ap, None)
+        if entry is not None:
+            stale_ids.extend(entry.get("chunk_ids", []))
+        else:
+            # not in the manifest (ingested before it existed)
+            chunks_deleted += delete_where({
+                "$and": [{"project_id": parse_kwargs["project_id"]},
+                         {"abs_path": ap}]})
+    chunks_deleted += delete_ids(stale_ids)
 
-    return {"project_id": project_id, "files_ingested": file_count,
-            "chunks_upserted": total_chunks}
+    elapsed = time.perf_counter() - t0
+    metrics.inc("rag_ingest_files_total", file_count)
+    metrics.inc("rag_ingest_chunks_total", chunk_count)
+    metrics.inc("rag_ingest_chunks_deleted_total", chunks_deleted)
+    if to_parse and elapsed > 0:
+        metrics.set_gauge("rag_ingest_files_per_second", len(to_parse) / elapsed)
+        metrics.set_gauge("rag_ingest_chunks_per_second", chunk_count / elapsed)
+
+    return {"files_ingested": file_count,
+            "chunks_upserted": chunk_count,
+            "files_updated": len(to_parse),
+            "files_deleted": len(removed),
+            "chunks_deleted": chunks_deleted}
+
+
+def _git(repo_dir: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", "-C", repo_dir, *args],
+                          capture_output=True, text=True, check=False)
+
+
+def _head_commit(repo_dir: str) -> Optional[str]:
+    res = _git(repo_dir, "rev-parse", "HEAD")
+    return res.stdout.strip() if res.returncode == 0 else None
+
+
+def _is_ignored_path(rel_path: str) -> bool:
+    parts = rel_path.replace("\\", "/").split("/")
+    return any(p in IGNORE_DIRS for p in parts[:-1])
+
+
+def git_changed_paths(
+        repo_dir: str, old: str, new: str) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    Paths (relative to the repo root) changed between two commits, as
+    (upserted, deleted). Renames count as delete old + add new.
+    Returns None if the diff cannot be computed (e.g. history rewritten).
+    """
+    res = _git(repo_dir, "diff", "--name-status", "-z", "-M", f"{old}..{new}")
+    if res.returncode != 0:
+        return None
+    fields = res.stdout.split("\0")
+    upserted: List[str] = []
+    deleted: List[str] = []
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i][0]
+        if status in ("R", "C"):
+            src, dst = fields[i + 1], fields[i + 2]
+            if status == "R":
+                deleted.append(src)
+            upserted.append(dst)
+            i += 3
+            continue
+        path = fields[i + 1]
+        if status == "D":
+            deleted.append(path)
+        else:  # A, M, T
+            upserted.append(path)
+        i += 2
+    return ([p for p in upserted if not _is_ignored_path(p)],
+            [p for p in deleted if not _is_ignored_path(p)])
 
 
 def ingest_repo(
@@ -77,12 +298,22 @@ def ingest_repo(
     dest_dir: str,
     branch: Optional[str],
     project_id: str,
-    project_name: str
+    project_name: str,
+    parallel: bool = False,
+    workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    progress: Optional[Callable[..., None]] = None,
+    cancel: Optional[threading.Event] = None,
 ) -> Dict[str, Any]:
     """
-    Clone (or pull) the repo into dest_dir and then call ingest_folder on it.
+    Clone (or pull) the repo into dest_dir and then ingest it.
+
+    The last indexed commit is kept in the project manifest. If it is
+    still reachable, only the paths in `git diff old..new` are re-embedded
+    or deleted; otherwise the whole checkout goes through ingest_folder.
     """
-    os.makedirs(os.path.dirname(dest_dir), exist_ok=True)
+    if os.path.dirname(dest_dir):
+        os.makedirs(os.path.dirname(dest_dir), exist_ok=True)
     if not os.path.exists(dest_dir):
         cmd = ["git", "clone", repo_url, dest_dir]
         subprocess.run(cmd, check=True)
@@ -92,8 +323,60 @@ def ingest_repo(
             ["git", "-C", dest_dir, "checkout", branch], check=False)
     subprocess.run(["git", "-C", dest_dir, "pull"], check=False)
 
-    return ingest_folder(dest_dir, project_id=project_id,
-                         project_name=project_name, repo_url=repo_url, branch=branch)
+    repo_dir = os.path.abspath(dest_dir)
+    new_commit = _head_commit(repo_dir)
+    manifest = load_manifest(project_id)
+    old_commit = manifest.get("commit")
+    same_checkout = manifest.get("repo_dir") == repo_dir
+
+    diff = None
+    same_chunker = manifest.get("chunker") == CHUNKER_VERSION
+    if old_commit and new_commit and same_checkout and same_chunker:
+        if old_commit == new_commit:
+            diff = ([], [])
+        else:
+            diff = git_changed_paths(repo_dir, old_commit, new_commit)
+
+    if diff is None:
+        res = ingest_folder(dest_dir, project_id=project_id,
+                            project_name=project_name, repo_url=repo_url, branch=branch,
+                            parallel=parallel, workers=workers, queue_size=queue_size,
+                            progress=progress, cancel=cancel)
+        res["mode"] = "full"
+        manifest = load_manifest(project_id)
+    else:
+        upserted, deleted = diff
+        to_parse: List[str] = []
+        hashes: Dict[str, str] = {}
+        removed = [os.path.normpath(os.path.join(repo_dir, p)) for p in deleted]
+        for rel in upserted:
+            fp = os.path.normpath(os.path.join(repo_dir, rel))
+            if not os.path.isfile(fp):
+                removed.append(fp)
+                continue
+            hashes[fp] = file_hash(fp)
+            to_parse.append(fp)
+        parse_kwargs = {
+            "project_id": project_id,
+            "project_name": project_name,
+            "repo_url": repo_url,
+            "branch": branch,
+        }
+        if progress is not None:
+            progress(files_scanned=len(upserted) + len(deleted),
+                     files_total=len(to_parse), files_done=0, chunks_upserted=0)
+        res = {"project_id": project_id, **_apply_changes(
+            manifest, to_parse, hashes, removed, parse_kwargs,
+            parallel=parallel, workers=workers, queue_size=queue_size,
+            progress=progress, cancel=cancel)}
+        res["mode"] = "git-diff"
+
+    manifest["commit"] = new_commit
+    manifest["repo_dir"] = repo_dir
+    save_manifest(project_id, manifest)
+    res["previous_commit"] = old_commit
+    res["commit"] = new_commit
+    return res
 
 
 def upsert_files(
@@ -101,21 +384,57 @@ def upsert_files(
     project_id: str,
     project_name: str,
     repo_url: Optional[str] = None,
-    branch: Optional[str] = None
+    branch: Optional[str] = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    rel_root: Optional[str] = None,
+    parallel: bool = False,
+    workers: Optional[int] = None,
 ) -> Dict[str, Any]:
-    total_chunks = 0
-    file_count = 0
-    for fp in files:
-        chunks = parse_file(
-            fp,
-            project_id=project_id,
-            project_name=project_name,
-            repo_url=repo_url,
-            branch=branch,
-        )
-        if chunks:
-            n_ids, _ = upsert_chunks(chunks)
-            total_chunks += n_ids
-            file_count += 1
+    """
+    Parse and upsert `files` (chunks embedded together in `batch_size`
+    batches; with `parallel`, through ingest_pipeline.run_pipeline).
+    With `rel_root`, rel_paths are relative to it and chunks left over
+    from a longer earlier version of a file are deleted.
+    """
+    parse_kwargs = {
+        "project_id": project_id,
+        "project_name": project_name,
+        "repo_url": repo_url,
+        "branch": branch,
+    }
+    if rel_root:
+        parse_kwargs["rel_root"] = rel_root
+    stale: List[Tuple[str, int]] = []
+
+    def on_file(fp: str, chunks: List[Dict[str, Any]]) -> None:
+        if rel_root:
+            stale.append((os.path.relpath(fp, rel_root).replace(os.sep, "/"), len(chunks)))
+
+    if parallel and len(files) > 1:
+        counts = run_pipeline(files, parse_kwargs, workers=workers,
+                              batch_size=batch_size, on_file=on_file)
+        file_count, chunk_count = counts["files"], counts["chunks"]
+    else:
+        file_count = 0
+        with ChunkBatcher(batch_size) as batcher:
+            for fp in files:
+                with metrics.stage("parse"):
+                    chunks = parse_file(fp, **parse_kwargs)
+                on_file(fp, chunks)
+                if chunks:
+                    batcher.add(chunks)
+                    file_count += 1
+        chunk_count = batcher.written
+
+    # ids of chunks past each file's new length, from index_stats (SQL)
+    # instead of one Chroma scan per file, then one batched delete
+    stale_ids = [
+        cid for rel, n in stale
+        for cid in index_stats.chunk_ids(project_id, rel_path=rel)
+        if int(cid.rsplit("::", 1)[1]) >= n]
+    chunks_deleted = delete_ids(stale_ids)
+    metrics.inc("rag_ingest_files_total", file_count)
+    metrics.inc("rag_ingest_chunks_total", chunk_count)
+    metrics.inc("rag_ingest_chunks_deleted_total", chunks_deleted)
     return {"project_id": project_id, "files_upserted": file_count,
-            "chunks_upserted": total_chunks}
+            "chunks_upserted": chunk_count, "chunks_deleted": chunks_deleted}
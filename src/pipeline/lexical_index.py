@@ -0,0 +1,208 @@
+# lexical_index.py
+"""
+Per-project BM25 inverted index over chunk text (SQLite FTS5).
+
+Embeddings are weak at exact identifiers ("where is upsert_chunks
+called?"), so every chunk is also indexed lexically. Text is tokenized
+code-aware before it reaches FTS5: identifiers are kept whole and also
+split on snake_case and camelCase, so `upsertChunks`, `upsert_chunks`
+and "upsert chunks" all meet. embed_store records every upsert and
+delete here; each project lives in data/lexical/<project_id>.sqlite3.
+
+    python -m src.pipeline.lexical_index rebuild [--project-id ID]
+    python -m src.pipeline.lexical_index search "query" --project-id ID
+"""
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src.pipeline import metrics
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "data/lexical")
+
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+_conns: Dict[str, sqlite3.Connection] = {}
+_lock = threading.Lock()
+
+
+def code_tokens(text: str) -> Iterator[str]:
+    """
+    Lowercased identifiers plus their snake_case/camelCase parts:
+    'getHTTPResponse_v2' -> gethttpresponse_v2, get, http, response, v2.
+    """
+    for ident in _IDENT.findall(text):
+        yield ident.lower()
+        parts = [p for piece in ident.split("_") for p in _CAMEL.findall(piece)]
+        if len(parts) > 1:
+            for p in parts:
+                if len(p) > 1:
+                    yield p.lower()
+
+
+def _path(project_id: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", project_id)
+    return os.path.join(LEXICAL_INDEX_DIR, f"{safe}.sqlite3")
+
+
+def _get_conn(project_id: str, create: bool = True) -> Optional[sqlite3.Connection]:
+    """Connection for one project's index. Caller holds _lock."""
+    conn = _conns.get(project_id)
+    if conn is not None:
+        return conn
+    path = _path(project_id)
+    if not create and not os.path.exists(path):
+        return None
+    os.makedirs(LEXICAL_INDEX_DIR, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS ids (
+            rowid    INTEGER PRIMARY KEY,
+            chunk_id TEXT NOT NULL UNIQUE
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(
+            body, tokenize = "unicode61 tokenchars '_'"
+        );
+    """)
+    _conns[project_id] = conn
+    return conn
+
+
+def _project_of(chunk_id: str) -> str:
+    # chunk ids are '<project_id>::<rel_path>::<idx>' (see embed_store.project_of)
+    return chunk_id.split("::", 1)[0]
+
+
+def _document(text: str, md: Dict) -> str:
+    head = " ".join(str(md.get(k) or "") for k in ("rel_path", "symbol"))
+    return " ".join(code_tokens(f"{head} {text}"))
+
+
+def _delete(conn: sqlite3.Connection, ids: Sequence[str]) -> None:
+    rows = []
+    for chunk_id in ids:
+        row = conn.execute("SELECT rowid FROM ids WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        if row:
+            rows.append(row)
+    conn.executemany("DELETE FROM terms WHERE rowid = ?", rows)
+    conn.executemany("DELETE FROM ids WHERE rowid = ?", rows)
+
+
+def _by_project(ids: Iterable[str], *cols) -> Dict[str, list]:
+    grouped: Dict[str, list] = {}
+    rows = zip(ids, *cols) if cols else ((i,) for i in ids)
+    for row in rows:
+        grouped.setdefault(_project_of(row[0]), []).append(row)
+    return grouped
+
+
+def record_upsert(ids: Sequence[str], texts: Sequence[str],
+                  metadatas: Sequence[Dict]) -> None:
+    """Mirror a Chroma upsert into the projects' lexical indexes."""
+    for project_id, rows in _by_project(ids, texts, metadatas).items():
+        docs = [(i, _document(t or "", md or {})) for i, t, md in rows]
+        with _lock:
+            conn = _get_conn(project_id)
+            with conn:
+                _delete(conn, [i for i, _ in docs])
+                for chunk_id, body in docs:
+                    rowid = conn.execute("INSERT INTO ids (chunk_id) VALUES (?)",
+                                         (chunk_id,)).lastrowid
+                    conn.execute("INSERT INTO terms (rowid, body) VALUES (?, ?)",
+                                 (rowid, body))
+
+
+def record_delete(ids: Iterable[str]) -> None:
+    """Mirror a Chroma delete."""
+    for project_id, rows in _by_project(ids).items():
+        with _lock:
+            conn = _get_conn(project_id, create=False)
+            if conn is None:
+                continue
+            with conn:
+                _delete(conn, [r[0] for r in rows])
+
+
+def drop_project(project_id: str) -> None:
+    """Remove a project's index file (project deleted)."""
+    with _lock:
+        conn = _conns.pop(project_id, None)
+        if conn is not None:
+            conn.close()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(_path(project_id) + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def _projects() -> List[str]:
+    if not os.path.isdir(LEXICAL_INDEX_DIR):
+        return []
+    return [f[:-len(".sqlite3")] for f in os.listdir(LEXICAL_INDEX_DIR)
+            if f.endswith(".sqlite3")]
+
+
+def search(query: str, project_id: Optional[str] = None,
+           limit: int = 20) -> List[Tuple[str, float]]:
+    """
+    BM25 search. Returns [(chunk_id, score)] best first (higher is better).
+    Without a project, every project's index is searched and merged.
+    """
+    terms = sorted(set(code_tokens(query)))
+    if not terms:
+        return []
+    expr = " OR ".join(f'"{t}"' for t in terms)
+    hits: List[Tuple[str, float]] = []
+    for pid in ([project_id] if project_id else _projects()):
+        with _lock, metrics.stage("lexical"):
+            conn = _get_conn(pid, create=False)
+            if conn is None:
+                continue
+            rows = conn.execute(
+                "SELECT ids.chunk_id, bm25(terms) FROM terms "
+                "JOIN ids ON ids.rowid = terms.rowid "
+                "WHERE terms MATCH ? ORDER BY bm25(terms) LIMIT ?",
+                (expr, int(limit))).fetchall()
+        # FTS5's bm25() is negative, lower = better
+        hits.extend((cid, -score) for cid, score in rows)
+    hits.sort(key=lambda h: h[1], reverse=True)
+    return hits[:limit]
+
+
+def rebuild(project_id: Optional[str] = None, page_size: int = 1000) -> Dict[str, int]:
+    """Re-index chunks from the Chroma collection (one project or all)."""
+    from src.pipeline import index_stats
+    from src.pipeline.embed_store import iter_chunks
+
+    projects = [project_id] if project_id else sorted(index_stats.all_project_stats())
+    counts = {}
+    for pid in projects:
+        drop_project(pid)
+        n = 0
+        for page in iter_chunks(pid, page_size=page_size):
+            record_upsert([c["id"] for c in page], [c["text"] for c in page],
+                          [c["metadata"] or {} for c in page])
+            n += len(page)
+        counts[pid] = n
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Lexical (BM25) index maintenance.")
+    parser.add_argument("command", choices=["rebuild", "search"])
+    parser.add_argument("query", nargs="?", default="")
+    parser.add_argument("--project-id", default=None)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        print(json.dumps(rebuild(args.project_id), indent=2))
+    else:
+        print(json.dumps(search(args.query, args.project_id, args.limit), indent=2))
@@ -0,0 +1,73 @@
+# manifest.py
+"""
+Per-project ingest manifest: abs file path -> content hash, mtime, size
+and the chunk ids that file produced. Lets ingest skip unchanged files
+and delete chunks of files that were removed or got shorter.
+
+Stored as data/manifests/<project_id>.json and written atomically.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict
+
+MANIFEST_DIR = "data/manifests"
+
+
+def manifest_path(project_id: str) -> str:
+    return os.path.join(MANIFEST_DIR, f"{project_id}.json")
+
+
+def load_manifest(project_id: str) -> Dict[str, Any]:
+    """Return {"files": {abs_path: entry}, ...}; empty if none on disk."""
+    path = manifest_path(project_id)
+    if not os.path.exists(path):
+        return {"files": {}}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError:
+        # A corrupt manifest only costs a full re-ingest
+        return {"files": {}}
+    data.setdefault("files", {})
+    return data
+
+
+def save_manifest(project_id: str, manifest: Dict[str, Any]) -> None:
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = manifest_path(project_id)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def delete_manifest(project_id: str) -> None:
+    try:
+        os.remove(manifest_path(project_id))
+    except FileNotFoundError:
+        pass
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def make_entry(path: str, content_hash: str, chunk_ids) -> Dict[str, Any]:
+    st = os.stat(path)
+    return {
+        "hash": content_hash,
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "chunk_ids": list(chunk_ids),
+    }
+
+
+def is_unchanged(path: str, entry: Dict[str, Any]) -> bool:
+    """Cheap stat check: same size and mtime as when last ingested."""
+    st = os.stat(path)
+    return entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime
@@ -0,0 +1,174 @@
+# metrics.py
+"""
+In-process pipeline metrics, rendered in the Prometheus text format for
+GET /metrics (no client library needed).
+
+Counters, gauges and histograms are declared below and keyed by label
+values on first use. `stage(name)` times one pipeline step into the
+rag_stage_seconds histogram and, while a request is traced (`trace()`,
+done by the API middleware), into that request's breakdown, which the
+API returns as a Server-Timing header.
+
+    with metrics.stage("embed"):
+        vectors = model.encode(texts)
+    metrics.inc("rag_chunks_retrieved_total", len(matches))
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in {"1", "true", "yes"}
+
+# seconds; from a cache hit to a slow LLM call
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+# name -> (type, help, buckets)
+METRICS: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = {
+    "rag_stage_seconds": ("histogram", "Time spent per pipeline stage", TIME_BUCKETS),
+    "rag_http_request_seconds": ("histogram", "HTTP request latency by route", TIME_BUCKETS),
+    "rag_llm_ttft_seconds": ("histogram", "Time to the first streamed LLM token", TIME_BUCKETS),
+    "rag_embed_batch_size": ("histogram", "Texts per embedding model call", SIZE_BUCKETS),
+    "rag_embedded_texts_total": ("counter", "Texts encoded by the embedding model", None),
+    "rag_chunks_retrieved_total": ("counter", "Chunks returned by retrieval", None),
+    "rag_prompt_chunks_total": ("counter", "Retrieved chunks passed to LLM prompt assembly", None),
+    "rag_prompt_blocks_total": ("counter", "Context blocks in LLM prompts (after packing)", None),
+    "rag_prompt_chars_total": ("counter", "Characters of LLM prompts", None),
+    "rag_prompt_context_tokens_total": ("counter", "Context tokens sent after packing", None),
+    "rag_prompt_tokens_saved_total": ("counter", "Context tokens saved by prompt packing", None),
+    "rag_llm_tokens_total": ("counter", "LLM tokens reported by the API, by kind", None),
+    "rag_ingest_files_total": ("counter", "Files parsed and embedded by ingestion", None),
+    "rag_ingest_chunks_total": ("counter", "Chunks upserted by ingestion", None),
+    "rag_ingest_chunks_deleted_total": ("counter", "Stale chunks deleted by ingestion", None),
+    "rag_ingest_files_per_second": ("gauge", "Files/s of the last ingestion run", None),
+    "rag_ingest_chunks_per_second": ("gauge", "Chunks/s of the last ingestion run", None),
+}
+
+_lock = threading.Lock()
+# name -> labels -> value (counter/gauge) or [bucket counts..., sum, count]
+_values: Dict[str, Dict[Tuple[Tuple[str, str], ...], object]] = {}
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = \
+    contextvars.ContextVar("request_timings", default=None)
+
+
+def _key(labels: Dict[str, object]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    if not METRICS_ENABLED:
+        return
+    key = _key(labels)
+    with _lock:
+        series = _values.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _values.setdefault(name, {})[_key(labels)] = float(value)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if not METRICS_ENABLED:
+        return
+    buckets = METRICS[name][2]
+    key = _key(labels)
+    with _lock:
+        series = _values.setdefault(name, {})
+        h = series.get(key)
+        if h is None:
+            h = series[key] = [0] * len(buckets) + [0.0, 0]
+        # counts are per bucket here and made cumulative in render()
+        i = bisect.bisect_left(buckets, value)
+        if i < len(buckets):
+            h[i] += 1
+        h[-2] += value
+        h[-1] += 1
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage (histogram + the current request's breakdown)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        observe("rag_stage_seconds", elapsed, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def trace() -> Iterator[Dict[str, float]]:
+    """Collect stage timings of the enclosed work (stage -> seconds)."""
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing(timings: Dict[str, float], total: Optional[float] = None) -> str:
+    """Server-Timing header value, durations in ms."""
+    parts = [f"{name};dur={sec * 1000:.1f}" for name, sec in timings.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: Tuple[Tuple[str, str], ...], le: Optional[str] = None) -> str:
+    items = [f'{k}="{_escape(v)}"' for k, v in key]
+    if le is not None:
+        items.append(f'le="{le}"')
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) and not float(v).is_integer() else str(int(v))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    with _lock:
+        snapshot = {name: {k: list(v) if isinstance(v, list) else v
+                           for k, v in series.items()}
+                    for name, series in _values.items()}
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = snapshot.get(name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(series.items()):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(key)} {_num(value)}")
+                continue
+            cumulative = 0
+            for bound, n in zip(buckets, value[:-2]):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(key, str(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(key, '+Inf')} {value[-1]}")
+            lines.append(f"{name}_sum{_labels(key)} {_num(value[-2])}")
+            lines.append(f"{name}_count{_labels(key)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _values.clear()
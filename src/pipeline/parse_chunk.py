@@ -5,52 +5,233 @@ from datetime import datetime
 from pathlib import Path
 
 
+CODE_CHUNK_MAX_CHARS = int(os.getenv("CODE_CHUNK_MAX_CHARS", "2000"))
+# Token windows for prose/text files: size in model tokens leaves room for
+# [CLS]/[SEP] under EMBED_MAX_TOKENS; consecutive windows share OVERLAP tokens.
+TEXT_CHUNK_TOKENS = int(os.getenv("TEXT_CHUNK_TOKENS", "240"))
+TEXT_CHUNK_OVERLAP = int(os.getenv("TEXT_CHUNK_OVERLAP", "32"))
+# Files chunked as code (Python goes through the AST chunker); every other
+# extension (.md, .txt, .rst, ...) is chunked in token windows.
+CODE_EXTS = {".py", ".js", ".jsx", ".ts", ".tsx", ".css", ".json", ".java",
+             ".go", ".rs", ".c", ".h", ".cpp", ".hpp", ".cs", ".rb", ".php",
+             ".sh", ".sql", ".yaml", ".yml", ".toml"}
+# Bump when chunk boundaries change; ingest re-parses files whose manifest
+# was written by another version even if their content is unchanged.
+CHUNKER_VERSION = "ast-1+tok-1"
+
+
 def chunk_text(text, max_length=1000):
     """
     Splits text into chunks of approximately `max_length` characters.
-    Keeps your current sentence-splitting logic.
+    Keeps your current sentence-splitting logic; pieces are collected in
+    a list and joined once per chunk so this stays linear in len(text).
     """
     sentences = text.split(". ")
-    chunks, current_chunk = [], ""
+    chunks, current, size = [], [], 0
 
     for sentence in sentences:
-        if len(current_chunk) + len(sentence) + 2 <= max_length:
-            current_chunk += sentence + ". "
+        piece = sentence + ". "
+        if current and size + len(piece) > max_length:
+            chunks.append("".join(current).strip())
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece)
+    if current:
+        chunks.append("".join(current).strip())
+
+    return [c for c in chunks if c]
+
+
+def _token_spans(text, tokenizer, segment_chars=4000):
+    """
+    (start, end) character offsets of every token in `text`. The text is
+    cut at line breaks into ~segment_chars pieces that are tokenized in a
+    single batched call, then offsets are shifted back into place.
+    """
+    segments, starts, pos = [], [], 0
+    while pos < len(text):
+        end = len(text) if pos + segment_chars >= len(text) \
+            else (text.rfind("\n", pos, pos + segment_chars) + 1 or pos + segment_chars)
+        segments.append(text[pos:end])
+        starts.append(pos)
+        pos = end
+    if not segments:
+        return []
+    enc = tokenizer(segments, add_special_tokens=False,
+                    return_offsets_mapping=True, return_attention_mask=False)
+    spans = []
+    for base, offsets in zip(starts, enc["offset_mapping"]):
+        spans.extend((base + a, base + b) for a, b in offsets if b > a)
+    return spans
+
+
+def chunk_tokens(text, max_tokens=TEXT_CHUNK_TOKENS, overlap=TEXT_CHUNK_OVERLAP,
+                 tokenizer=None):
+    """
+    Split text into windows of at most `max_tokens` tokens of the
+    embedding model, each sharing `overlap` tokens with the previous one,
+    so no part of a chunk is truncated by the model. Returns dicts with
+    text and token_count, or None if no tokenizer is available.
+    """
+    if tokenizer is None:
+        from src.pipeline.embeddings import get_tokenizer
+        tokenizer = get_tokenizer()
+        if tokenizer is None:
+            return None
+    spans = _token_spans(text, tokenizer)
+    step = max(1, max_tokens - max(0, overlap))
+    out = []
+    for start in range(0, len(spans), step):
+        end = min(start + max_tokens, len(spans))
+        out.append({"text": text[spans[start][0]:spans[end - 1][1]],
+                    "token_count": end - start})
+        if end == len(spans):
+            break
+    return out
+
+
+def window_lines(lines, max_length=CODE_CHUNK_MAX_CHARS, first_line=1):
+    """
+    Split a list of source lines into windows of at most `max_length`
+    characters without breaking lines (over-long lines are sliced).
+    Yields (text, start_line, end_line); a single linear pass.
+    """
+    current, size, start = [], 0, first_line
+    for offset, line in enumerate(lines):
+        lineno = first_line + offset
+        pieces = [line[i:i + max_length] for i in range(0, len(line), max_length)] or [""]
+        for k, piece in enumerate(pieces):
+            if current and size + len(piece) + 1 > max_length:
+                yield "\n".join(current), start, lineno - (1 if k == 0 else 0)
+                current, size, start = [], 0, lineno
+            current.append(piece)
+            size += len(piece) + 1
+    if current and any(l.strip() for l in current):
+        yield "\n".join(current), start, first_line + len(lines) - 1
+
+
+def _node_start(node):
+    # include decorators in the symbol's range
+    return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+
+
+def _symbol_chunks(lines, start, end, symbol, symbol_type, parent_class, max_length):
+    """Chunk(s) for lines[start-1:end]; oversized symbols are windowed."""
+    while start < end and not lines[start - 1].strip():
+        start += 1
+    while end > start and not lines[end - 1].strip():
+        end -= 1
+    body = lines[start - 1:end]
+    text = "\n".join(body)
+    meta = {"symbol": symbol, "symbol_type": symbol_type, "parent_class": parent_class}
+    if len(text) <= max_length:
+        return [{"text": text, "start_line": start, "end_line": end, **meta}]
+    return [{"text": t, "start_line": s, "end_line": e, **meta}
+            for t, s, e in window_lines(body, max_length, first_line=start)]
+
+
+def _chunk_body(lines, body, first, last, parent, max_length, out):
+    """
+    Emit chunks for the statements in `body`, which spans lines first..last.
+    Functions/methods get their own chunk; classes get a chunk for their
+    header and non-method lines, then recurse into their body. Loose
+    statements between definitions are grouped into "module"/"class" chunks.
+    """
+    import ast
+
+    defs = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    gap_start = first
+
+    def flush_gap(until):
+        if gap_start <= until:
+            segment = lines[gap_start - 1:until]
+            if any(l.strip() for l in segment):
+                out.extend(_symbol_chunks(
+                    lines, gap_start, until, parent or None,
+                    "class" if parent else "module", None, max_length))
+
+    for node in body:
+        if not isinstance(node, defs):
+            continue
+        start, end = _node_start(node), node.end_lineno
+        flush_gap(start - 1)
+        gap_start = end + 1
+        qualname = f"{parent}.{node.name}" if parent else node.name
+        if isinstance(node, ast.ClassDef):
+            inner = [n for n in node.body if isinstance(n, defs)]
+            header_end = (_node_start(inner[0]) - 1) if inner else end
+            out.extend(_symbol_chunks(lines, start, header_end, qualname,
+                                      "ClassDef", parent, max_length))
+            if inner:
+                _chunk_body(lines, node.body, _node_start(inner[0]), end,
+                            qualname, max_length, out)
         else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence + ". "
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+            out.extend(_symbol_chunks(lines, start, end, qualname,
+                                      type(node).__name__, parent, max_length))
+    flush_gap(last)
 
-    return chunks
+
+def chunk_python(source, max_length=CODE_CHUNK_MAX_CHARS):
+    """
+    Split Python source along its AST: one chunk per function, method and
+    class (header, docstring and attributes), plus chunks for module-level
+    code in between. Each chunk carries symbol, symbol_type, start_line,
+    end_line and parent_class. Falls back to line windows when the source
+    does not parse.
+    """
+    import ast
+
+    lines = source.splitlines()
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return [{"text": t, "start_line": s, "end_line": e, "symbol": None,
+                 "symbol_type": "window", "parent_class": None}
+                for t, s, e in window_lines(lines, max_length)]
+    out = []
+    _chunk_body(lines, tree.body, 1, len(lines), None, max_length, out)
+    return out
 
 
 def parse_file(file_path, project_id=None, project_name=None,
-               repo_url=None, branch=None):
+               repo_url=None, branch=None, rel_root=None):
     """
     Reads a file, splits it into chunks, and attaches extended metadata.
+    rel_path (and so the chunk ids) is relative to `rel_root` if given,
+    else to the working directory.
     """
     # ----- Core info -----
     abs_path = os.path.abspath(file_path)
     try:
-        rel_path = os.path.relpath(file_path, start=os.getcwd())
+        rel_path = os.path.relpath(file_path, start=rel_root or os.getcwd())
     except ValueError:
         # Happens when file is on a different drive (e.g., D: vs C:)
         rel_path = abs_path
+    if rel_root:
+        rel_path = rel_path.replace(os.sep, "/")
     filetype = Path(file_path).suffix
     size_bytes = os.path.getsize(file_path)
     mtime = datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
 
-    # doc_id stays per-file (consistent with old logic)
-    doc_id = str(uuid.uuid5(uuid.NAMESPACE_URL, abs_path))
+    # doc_id stays per-file (consistent with old logic); files under a
+    # rel_root (e.g. uploads) keep theirs when re-uploaded elsewhere
+    doc_id = str(uuid.uuid5(uuid.NAMESPACE_URL,
+                            f"{project_id}/{rel_path}" if rel_root else abs_path))
 
     with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
         text = f.read()
 
-    chunks = chunk_text(text)
+    pieces = None
+    if filetype == ".py":
+        pieces = chunk_python(text)
+    elif filetype.lower() not in CODE_EXTS:
+        pieces = chunk_tokens(text)
+    if pieces is None:
+        pieces = [{"text": c} for c in chunk_text(text)]
     results = []
 
-    for idx, chunk in enumerate(chunks):
+    for idx, piece in enumerate(pieces):
+        chunk = piece.pop("text")
         chunk_id = f"{project_id or 'default'}::{rel_path}::{idx}"
 
         metadata = {
@@ -69,6 +250,9 @@ def parse_file(file_path, project_id=None, project_name=None,
             "filetype": filetype,
             "size_bytes": size_bytes,
             "mtime": mtime,
+            # ---- Code structure (symbol, symbol_type, start/end line,
+            # parent_class) or token_count for token windows ----
+            **piece,
         }
 
         results.append({
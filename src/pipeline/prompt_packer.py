@@ -0,0 +1,244 @@
+# prompt_packer.py
+"""
+Prompt assembly under a token budget.
+
+Retrieved chunks are not pasted verbatim: consecutive chunks of the same
+file (chunk_idx n, n+1, ...) are merged into one block with the overlap
+between token windows removed, blocks that are near-duplicates of a more
+relevant block are dropped, and the rest are added best-first until
+PROMPT_TOKEN_BUDGET context tokens are used (the last block that does not
+fit is cut at a line boundary if enough budget is left). Relevance is
+the retrieval order. `pack()` also reports how many tokens this saved
+compared with concatenating every match.
+
+Tokens are counted with tiktoken's cl100k_base (close to the Llama 3
+vocabulary) or, if it cannot be loaded, estimated as chars / 4.
+"""
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.pipeline import metrics, resources
+
+logger = logging.getLogger(__name__)
+
+PROMPT_PACKING = os.getenv("PROMPT_PACKING", "1").lower() in {"1", "true", "yes"}
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# Jaccard similarity of word shingles above which a block is a duplicate
+PROMPT_DEDUP_THRESHOLD = float(os.getenv("PROMPT_DEDUP_THRESHOLD", "0.85"))
+# A block that doesn't fit is cut to the remaining budget if at least this much is left
+PROMPT_MIN_PARTIAL_TOKENS = int(os.getenv("PROMPT_MIN_PARTIAL_TOKENS", "120"))
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "cl100k_base")
+
+_WORD = re.compile(r"\w+")
+
+
+def _create_prompt_tokenizer():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(PROMPT_TOKENIZER)
+    except Exception as e:
+        logger.warning("Prompt tokenizer %s unavailable (%s); estimating chars / 4",
+                       PROMPT_TOKENIZER, e)
+        return None
+
+
+resources.register("prompt_tokenizer", _create_prompt_tokenizer, eager=PROMPT_PACKING)
+
+
+def count_tokens(text: str) -> int:
+    enc = resources.get("prompt_tokenizer")
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+# ---- Merging ----
+
+
+def _overlap(a: str, b: str, probe: int = 8, window: int = 4000) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b` (token-window overlap)."""
+    head = b[:probe]
+    if not head:
+        return 0
+    base = max(0, len(a) - window)
+    pos = a.find(head, base)
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(head, pos + 1)
+    return 0
+
+
+def _join(a: Dict[str, Any], b: Dict[str, Any]) -> str:
+    amd, bmd = a["metadata"], b["metadata"]
+    text_b = b["text"]
+    if amd.get("end_line") and bmd.get("start_line") and bmd["start_line"] <= amd["end_line"]:
+        # overlapping line ranges: keep only b's new lines
+        text_b = "\n".join(text_b.splitlines()[amd["end_line"] - bmd["start_line"] + 1:])
+    else:
+        shared = _overlap(a["text"], text_b)
+        if shared:
+            # token windows of one text: the rest continues it verbatim
+            return a["text"] + text_b[shared:]
+    return a["text"] + ("\n" if text_b else "") + text_b
+
+
+def _merge(first: Dict[str, Any], run: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    One block from consecutive chunks. Their line ranges are kept in
+    "line_ranges" when they are not contiguous (e.g. AST symbols with
+    code in between that was not retrieved).
+    """
+    block = {**first, "metadata": dict(first["metadata"])}
+    symbols = [first["metadata"].get("symbol")]
+    fmd = first["metadata"]
+    ranges = [[fmd["start_line"], fmd.get("end_line")]] if fmd.get("start_line") else []
+    for m in run:
+        block["text"] = _join(block, m)
+        md = m["metadata"]
+        if md.get("start_line"):
+            if ranges and ranges[-1][1] and md["start_line"] <= ranges[-1][1] + 1:
+                ranges[-1][1] = max(ranges[-1][1], md.get("end_line") or 0)
+            else:
+                ranges.append([md["start_line"], md.get("end_line")])
+        if md.get("end_line"):
+            block["metadata"]["end_line"] = md["end_line"]
+        symbols.append(md.get("symbol"))
+    if len(ranges) > 1:
+        block["metadata"]["line_ranges"] = ranges
+    if run:
+        block["metadata"]["chunk_idx"] = f"{first['metadata'].get('chunk_idx')}-" \
+                                         f"{run[-1]['metadata'].get('chunk_idx')}"
+        names = list(dict.fromkeys(s for s in symbols if s))
+        if names:
+            block["metadata"]["symbol"] = ", ".join(names[:4]) + (" ..." if len(names) > 4 else "")
+    return block
+
+
+def merge_adjacent(matches: List[Dict[str, Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Merge runs of consecutive chunk_idx from the same rel_path. Returns
+    (rank, block) pairs; a block's rank is that of its best member.
+    """
+    by_file: Dict[str, List[Tuple[int, int, Dict[str, Any]]]] = {}
+    loose: List[Tuple[int, Dict[str, Any]]] = []
+    seen = set()
+    for rank, m in enumerate(matches):
+        if m.get("id") is not None:
+            if m["id"] in seen:
+                continue
+            seen.add(m["id"])
+        md = m.get("metadata") or {}
+        idx = md.get("chunk_idx")
+        if md.get("rel_path") is None or not isinstance(idx, int):
+            loose.append((rank, {**m, "metadata": md}))
+            continue
+        by_file.setdefault(md["rel_path"], []).append((idx, rank, {**m, "metadata": md}))
+
+    blocks = loose
+    for parts in by_file.values():
+        parts.sort(key=lambda p: p[0])
+        start = 0
+        for i in range(1, len(parts) + 1):
+            if i == len(parts) or parts[i][0] != parts[i - 1][0] + 1:
+                run = parts[start:i]
+                blocks.append((min(r for _, r, _ in run),
+                               _merge(run[0][2], [m for _, _, m in run[1:]])))
+                start = i
+    blocks.sort(key=lambda b: b[0])
+    return blocks
+
+
+# ---- Near-duplicates ----
+
+
+def _shingles(text: str, n: int = 5) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def drop_near_duplicates(blocks: List[Dict[str, Any]],
+                         threshold: float = PROMPT_DEDUP_THRESHOLD) -> List[Dict[str, Any]]:
+    """Keep the first (most relevant) of any set of near-identical blocks."""
+    kept, kept_shingles = [], []
+    for block in blocks:
+        sh = _shingles(block["text"])
+        if any(_similarity(sh, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(block)
+        kept_shingles.append(sh)
+    return kept
+
+
+# ---- Budget ----
+
+
+def _truncate(text: str, budget: int) -> str:
+    """Longest prefix of whole lines within `budget` tokens."""
+    lines = text.splitlines()
+    lo, hi = 0, len(lines)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens("\n".join(lines[:mid])) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return "\n".join(lines[:lo])
+
+
+def pack(matches: List[Dict[str, Any]], budget: Optional[int] = None,
+         render=None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Blocks for the prompt, most relevant first, within `budget` tokens,
+    plus stats. `render(block)` is the text a block occupies in the
+    prompt (header included); by default just its text.
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    render = render or (lambda b: b["text"])
+    tokens_in = sum(count_tokens(render(m)) for m in matches)
+
+    merged = [b for _, b in merge_adjacent(matches)]
+    unique = drop_near_duplicates(merged)
+
+    out, used, cut, dropped = [], 0, 0, 0
+    for block in unique:
+        n = count_tokens(render(block))
+        if used + n <= budget:
+            out.append(block)
+            used += n
+            continue
+        left = budget - used - (n - count_tokens(block["text"]))  # minus the header
+        if left >= PROMPT_MIN_PARTIAL_TOKENS:
+            text = _truncate(block["text"], left)
+            if text:
+                block = {**block, "text": text}
+                out.append(block)
+                used += count_tokens(render(block))
+                cut += 1
+                continue
+        dropped += 1
+
+    stats = {
+        "chunks": len(matches),
+        "blocks": len(out),
+        "merged": len(matches) - len(merged),
+        "duplicates_dropped": len(merged) - len(unique),
+        "blocks_truncated": cut,
+        "blocks_over_budget": dropped,
+        "tokens_unpacked": tokens_in,
+        "tokens_packed": used,
+        "tokens_saved": max(0, tokens_in - used),
+    }
+    metrics.inc("rag_prompt_tokens_saved_total", stats["tokens_saved"])
+    metrics.inc("rag_prompt_context_tokens_total", used)
+    return out, stats
@@ -0,0 +1,102 @@
+# reranker.py
+"""
+Optional cross-encoder reranking between retrieval and the LLM.
+
+Retrieval over-fetches RERANK_CANDIDATES chunks; a small local
+cross-encoder scores every (question, chunk) pair in one CPU batch and
+only the best top_k go into the prompt. The pool is capped at
+RERANK_BATCH_SIZE pairs. To protect latency, the cost of a call is
+estimated from recent calls (moving average per pair) and reranking is
+skipped, keeping the retrieval order, when the estimate exceeds
+RERANK_BUDGET_MS.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.pipeline import metrics, resources
+
+logger = logging.getLogger(__name__)
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0").lower() in {"1", "true", "yes"}
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "200"))
+RERANK_MAX_TOKENS = int(os.getenv("RERANK_MAX_TOKENS", "256"))
+
+_lock = threading.Lock()
+_stats = {"calls": 0, "reranked": 0, "skipped_budget": 0, "pairs": 0, "seconds": 0.0}
+_ms_per_pair: Optional[float] = None  # moving average; None until measured
+_EMA_WEIGHT = 0.2
+_SKIP_DECAY = 0.95
+
+
+def _create_reranker():
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(RERANK_MODEL_NAME, max_length=RERANK_MAX_TOKENS, device="cpu")
+
+
+# only preloaded when reranking is on by default; per-request use loads it lazily
+resources.register("reranker", _create_reranker, eager=RERANK_ENABLED)
+
+
+def estimate_ms(pairs: int) -> Optional[float]:
+    """Expected scoring time for `pairs` pairs, once a call has been timed."""
+    return None if _ms_per_pair is None else _ms_per_pair * pairs
+
+
+def rerank(question: str, candidates: List[Dict[str, Any]], top_k: int,
+           budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Return the top_k candidates by cross-encoder score (as "rerank_score"),
+    or the first top_k unchanged if scoring would blow the latency budget.
+    """
+    global _ms_per_pair
+    budget_ms = RERANK_BUDGET_MS if budget_ms is None else budget_ms
+    pool = candidates[:max(top_k, RERANK_BATCH_SIZE)]
+    with _lock:
+        _stats["calls"] += 1
+    if len(pool) <= 1:
+        return pool[:top_k]
+    expected = estimate_ms(len(pool))
+    if budget_ms > 0 and expected is not None and expected > budget_ms:
+        with _lock:
+            _stats["skipped_budget"] += 1
+            # decay the estimate so a transient slowdown doesn't disable
+            # reranking for good; a later call re-measures
+            _ms_per_pair *= _SKIP_DECAY
+        logger.info("rerank skipped: ~%.0f ms for %d pairs > budget %.0f ms",
+                    expected, len(pool), budget_ms)
+        return pool[:top_k]
+
+    model = resources.get("reranker")
+    t0 = time.perf_counter()
+    with metrics.stage("rerank"):
+        scores = model.predict([(question, m.get("text", "")) for m in pool],
+                               batch_size=len(pool), show_progress_bar=False)
+    elapsed = time.perf_counter() - t0
+    with _lock:
+        per_pair = elapsed * 1000 / len(pool)
+        _ms_per_pair = per_pair if _ms_per_pair is None else \
+            (1 - _EMA_WEIGHT) * _ms_per_pair + _EMA_WEIGHT * per_pair
+        _stats["reranked"] += 1
+        _stats["pairs"] += len(pool)
+        _stats["seconds"] += elapsed
+    ranked = sorted(zip(pool, scores), key=lambda ms: float(ms[1]), reverse=True)
+    return [{**m, "rerank_score": round(float(s), 4)} for m, s in ranked[:top_k]]
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "enabled": RERANK_ENABLED,
+            "model": RERANK_MODEL_NAME,
+            "candidates": RERANK_CANDIDATES,
+            "batch_size": RERANK_BATCH_SIZE,
+            "budget_ms": RERANK_BUDGET_MS,
+            "ms_per_pair": round(_ms_per_pair, 3) if _ms_per_pair is not None else None,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in _stats.items()},
+        }
@@ -0,0 +1,102 @@
+# resources.py
+"""
+Process-wide registry of heavy, lazily created resources (embedding model,
+Chroma client/collection, LLM client).
+
+Modules register a factory at import time (cheap) and call `get(name)`
+when they need the object. The first caller builds it under a per-name
+lock; everyone else gets the cached instance. `warmup()` builds them
+eagerly and reports how long each took.
+
+    python -m src.pipeline.resources   # measure cold-start time
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+_factories: Dict[str, Callable[[], Any]] = {}
+_instances: Dict[str, Any] = {}
+_load_seconds: Dict[str, float] = {}
+_lazy_only: set = set()
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def register(name: str, factory: Callable[[], Any], eager: bool = True) -> None:
+    """
+    Register (or replace) the factory for `name`. Resources registered
+    with eager=False (optional features) are skipped by warmup().
+    """
+    with _registry_lock:
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+        if eager:
+            _lazy_only.discard(name)
+        else:
+            _lazy_only.add(name)
+
+
+def get(name: str) -> Any:
+    """Return the shared instance for `name`, creating it on first use."""
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    try:
+        lock = _locks[name]
+    except KeyError:
+        raise KeyError(f"No resource registered as '{name}'") from None
+    with lock:
+        if name not in _instances:
+            t0 = time.perf_counter()
+            _instances[name] = _factories[name]()
+            _load_seconds[name] = time.perf_counter() - t0
+    return _instances[name]
+
+
+def is_loaded(name: str) -> bool:
+    return name in _instances
+
+
+def reset(name: Optional[str] = None) -> None:
+    """Drop cached instances (all, or one) so they are rebuilt on next use."""
+    with _registry_lock:
+        names = [name] if name else list(_instances)
+        for n in names:
+            _instances.pop(n, None)
+            _load_seconds.pop(n, None)
+
+
+def status() -> Dict[str, Any]:
+    """Registered resources, whether they are loaded and their load time."""
+    return {
+        n: {"loaded": n in _instances, "load_seconds": _load_seconds.get(n)}
+        for n in sorted(_factories)
+    }
+
+
+def warmup(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    Build the given resources (default: all registered eagerly) now.
+    Returns {name: seconds spent creating it} (0.0 if already loaded).
+    """
+    timings = {}
+    for n in (list(names) if names else sorted(set(_factories) - _lazy_only)):
+        was_loaded = is_loaded(n)
+        get(n)
+        timings[n] = 0.0 if was_loaded else round(_load_seconds[n], 4)
+    return timings
+
+
+if __name__ == "__main__":
+    import json
+
+    t0 = time.perf_counter()
+    import src.services.api_server  # noqa: F401  (registers everything)
+    import_seconds = time.perf_counter() - t0
+    timings = warmup()
+    print(json.dumps({
+        "import_api_server_seconds": round(import_seconds, 4),
+        "warmup_seconds": timings,
+        "total_seconds": round(time.perf_counter() - t0, 4),
+    }, indent=2))
@@ -1,26 +1,369 @@
 # retrieval.py
-from src.pipeline.embed_store import query
-from src.pipeline.answer_generation import embed_text, llm_answer
+import asyncio
+import os
+from typing import Optional
 
+from src.pipeline import (
+    answer_cache, diversity, lexical_index, metrics, reranker, semantic_cache,
+)
+from src.pipeline.concurrency import run_blocking, stage_limit
+from src.pipeline.embed_store import get_matches, query_many
+from src.pipeline.embeddings import embed_queries
+from src.pipeline.answer_generation import embed_text, llm_answer, llm_answer_async
 
-def ask_question(question: str, project_id: str |
-                 None, top_k: int = 5) -> dict:
-    q_emb = embed_text(question)
+NO_MATCHES_ANSWER = "I couldn’t find relevant chunks for that question in the selected project."
+
+# Hybrid retrieval: fuse vector and BM25 rankings with reciprocal rank fusion
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1").lower() in {"1", "true", "yes"}
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "30"))  # per ranking
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Batch endpoints: max questions per request, concurrent LLM calls per batch
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "256"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+
+def _where(project_id: str | None) -> dict:
     where = {}
     if project_id:
         # ensure upserts set 'project_id' in metadata
         where["project_id"] = project_id
+    return where
+
+
+def rrf_fuse(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """Reciprocal rank fusion: score(id) = sum over rankings of 1 / (k + rank)."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def _fuse(vector: list[dict], question: str, project_id: str | None,
+          top_k: int) -> list[dict]:
+    """RRF fusion of a vector ranking with the question's BM25 ranking."""
+    lexical = lexical_index.search(question, project_id, limit=max(top_k, HYBRID_CANDIDATES))
+    fused = rrf_fuse([[m["id"] for m in vector], [cid for cid, _ in lexical]])[:top_k]
+    by_id = {m["id"]: m for m in vector}
+    by_id.update({m["id"]: m for m in get_matches(
+        [cid for cid, _ in fused if cid not in by_id])})
+    return [{**by_id[cid], "score": round(score, 6)}
+            for cid, score in fused if cid in by_id]
+
+
+def _candidates_batch(q_embs: list[list[float]], questions: list[str],
+                      project_id: str | None, top_k: int,
+                      hybrid: Optional[bool],
+                      embeddings: bool = False) -> list[list[dict]]:
+    """
+    Top_k chunks per question: vector-only, or (hybrid) the RRF fusion
+    of the vector and BM25 rankings. Fused matches carry a "score". All
+    vectors go to Chroma in one query; with `embeddings`, vector matches
+    also carry their stored "embedding" (for MMR).
+    """
+    hybrid = HYBRID_RETRIEVAL if hybrid is None else hybrid
+    n = max(top_k, HYBRID_CANDIDATES) if hybrid else top_k
+    include = ["documents", "metadatas", "distances"] + (["embeddings"] if embeddings else [])
+    vectors = query_many(q_embs, top_k=n, where=_where(project_id), include=include)
+    if hybrid:
+        vectors = [_fuse(v, q, project_id, top_k) for v, q in zip(vectors, questions)]
+    metrics.inc("rag_chunks_retrieved_total", sum(len(v) for v in vectors))
+    return vectors
+
+
+def _candidates(q_emb: list[float], question: str, project_id: str | None,
+                top_k: int, hybrid: Optional[bool], embeddings: bool = False) -> list[dict]:
+    return _candidates_batch([q_emb], [question], project_id, top_k, hybrid, embeddings)[0]
+
+
+def _pool_size(top_k: int, rerank: bool, mmr: bool = False) -> int:
+    n = top_k
+    if rerank:
+        n = max(n, reranker.RERANK_CANDIDATES)
+    if mmr:
+        n = max(n, diversity.MMR_CANDIDATES)
+    return n
+
 
-    matches = query(q_emb, top_k=top_k, where=where)
+def search_chunks(q_emb: list[float], question: str, project_id: str | None,
+                  top_k: int = 5, hybrid: Optional[bool] = None,
+                  rerank: Optional[bool] = None,
+                  mmr: Optional[bool] = None) -> list[dict]:
+    """
+    Retrieve chunks for a question (see _candidates). With reranking
+    and/or MMR a larger pool is fetched; the cross-encoder reorders it
+    and MMR picks a diverse top_k from it.
+    """
+    rerank = reranker.RERANK_ENABLED if rerank is None else rerank
+    mmr = diversity.MMR_ENABLED if mmr is None else mmr
+    pool = _pool_size(top_k, rerank, mmr)
+    matches = _candidates(q_emb, question, project_id, pool, hybrid, embeddings=mmr)
+    if rerank:
+        matches = reranker.rerank(question, matches, pool if mmr else top_k)
+    return diversity.mmr(q_emb, matches, top_k) if mmr else matches
+
+
+def retrieve(question: str, project_id: str | None, top_k: int = 5,
+             hybrid: Optional[bool] = None, rerank: Optional[bool] = None,
+             mmr: Optional[bool] = None) -> tuple[list[float], list[dict]]:
+    """Embed the question and fetch the top_k chunks. Returns (q_emb, matches)."""
+    q_emb = embed_text(question)
+    return q_emb, search_chunks(q_emb, question, project_id, top_k, hybrid, rerank, mmr)
+
+
+def default_mode(hybrid: Optional[bool], rerank: Optional[bool] = None,
+                 mmr: Optional[bool] = None) -> bool:
+    """Answer caches only hold results of the server's default retrieval mode."""
+    return (hybrid is None or hybrid == HYBRID_RETRIEVAL) and \
+        (rerank is None or rerank == reranker.RERANK_ENABLED) and \
+        (mmr is None or mmr == diversity.MMR_ENABLED)
+
+
+def _cached_answer(question: str, project_id: str | None, top_k: int,
+                   use_cache: bool) -> tuple[int, Optional[dict]]:
+    """Current index generation and the exact-cache hit (if any)."""
+    generation = answer_cache.get_generation(project_id)
+    if not use_cache:
+        return generation, None
+    cached = answer_cache.lookup(project_id, question, top_k)
+    if cached is None:
+        return generation, None
+    return generation, {**cached, "cached": True, "cache": "exact"}
+
+
+def _no_matches() -> dict:
+    return {
+        "answer": NO_MATCHES_ANSWER,
+        "matches": [],
+        "cached": False,
+    }
+
+
+def _semantic_hit(project_id: str | None, q_emb: list[float], matches: list[dict],
+                  threshold: Optional[float]) -> Optional[dict]:
+    hit = semantic_cache.lookup(
+        project_id, q_emb, [m.get("id") for m in matches], threshold=threshold)
+    if hit is None:
+        return None
+    response, similarity = hit
+    return {**response, "cached": True, "cache": "semantic",
+            "similarity": round(similarity, 4)}
+
+
+def _remember(question: str, project_id: str | None, top_k: int, q_emb: list[float],
+              result: dict, generation: int, use_cache: bool, semantic: bool) -> None:
+    if use_cache:
+        answer_cache.store(project_id, question, top_k, result,
+                           generation=generation)
+    if semantic:
+        semantic_cache.store(project_id, question, q_emb, result,
+                             generation=generation)
+
+
+def ask_question(question: str, project_id: str |
+                 None, top_k: int = 5, use_cache: bool = True,
+                 semantic: bool = False,
+                 semantic_threshold: Optional[float] = None,
+                 hybrid: Optional[bool] = None,
+                 rerank: Optional[bool] = None,
+                 mmr: Optional[bool] = None) -> dict:
+    use_cache = use_cache and default_mode(hybrid, rerank, mmr)
+    semantic = semantic and default_mode(hybrid, rerank, mmr)
+    generation, cached = _cached_answer(question, project_id, top_k, use_cache)
+    if cached is not None:
+        return cached
+
+    q_emb, matches = retrieve(question, project_id, top_k, hybrid, rerank, mmr)
 
     if not matches:
-        return {
-            "answer": "I couldn’t find relevant chunks for that question in the selected project.",
-            "matches": [],
-        }
+        return _no_matches()
+
+    if semantic:
+        hit = _semantic_hit(project_id, q_emb, matches, semantic_threshold)
+        if hit is not None:
+            return hit
 
     answer = llm_answer(question, matches)
-    return {
+    result = {
         "answer": answer,
         "matches": matches,
     }
+    _remember(question, project_id, top_k, q_emb, result, generation,
+              use_cache, semantic)
+    return {**result, "cached": False}
+
+
+async def ask_question_async(question: str, project_id: str | None,
+                             top_k: int = 5, use_cache: bool = True,
+                             semantic: bool = False,
+                             semantic_threshold: Optional[float] = None,
+                             hybrid: Optional[bool] = None,
+                             rerank: Optional[bool] = None,
+                             mmr: Optional[bool] = None) -> dict:
+    """
+    Same as ask_question, for the async API: blocking steps run on the
+    bounded "embed"/"store" executors and the LLM call uses the pooled
+    async client under the "llm" concurrency limit.
+    """
+    use_cache = use_cache and default_mode(hybrid, rerank, mmr)
+    semantic = semantic and default_mode(hybrid, rerank, mmr)
+    generation, cached = await run_blocking(
+        "store", _cached_answer, question, project_id, top_k, use_cache)
+    if cached is not None:
+        return cached
+
+    q_emb, matches = await retrieve_async(question, project_id, top_k, hybrid, rerank, mmr)
+
+    if not matches:
+        return _no_matches()
+
+    if semantic:
+        hit = await run_blocking(
+            "store", _semantic_hit, project_id, q_emb, matches, semantic_threshold)
+        if hit is not None:
+            return hit
+
+    async with stage_limit("llm"):
+        answer = await llm_answer_async(question, matches)
+    result = {
+        "answer": answer,
+        "matches": matches,
+    }
+    await run_blocking("store", _remember, question, project_id, top_k, q_emb,
+                       result, generation, use_cache, semantic)
+    return {**result, "cached": False}
+
+
+async def retrieve_async(question: str, project_id: str | None, top_k: int = 5,
+                         hybrid: Optional[bool] = None, rerank: Optional[bool] = None,
+                         mmr: Optional[bool] = None) -> tuple[list[float], list[dict]]:
+    """Async variant of retrieve()."""
+    q_emb = await run_blocking("embed", embed_text, question)
+    return q_emb, await search_chunks_async(
+        q_emb, question, project_id, top_k, hybrid, rerank, mmr)
+
+
+async def _refine_async(q_emb: list[float], question: str, matches: list[dict],
+                        top_k: int, pool: int, rerank: bool, mmr: bool) -> list[dict]:
+    """Rerank (on the "embed" executor) and/or MMR-select a candidate pool."""
+    if rerank:
+        matches = await run_blocking(
+            "embed", reranker.rerank, question, matches, pool if mmr else top_k)
+    if mmr:
+        matches = await run_blocking("store", diversity.mmr, q_emb, matches, top_k)
+    return matches
+
+
+async def search_chunks_async(q_emb: list[float], question: str, project_id: str | None,
+                              top_k: int = 5, hybrid: Optional[bool] = None,
+                              rerank: Optional[bool] = None,
+                              mmr: Optional[bool] = None) -> list[dict]:
+    """Async variant of search_chunks(); the cross-encoder runs on the "embed" executor."""
+    rerank = reranker.RERANK_ENABLED if rerank is None else rerank
+    mmr = diversity.MMR_ENABLED if mmr is None else mmr
+    pool = _pool_size(top_k, rerank, mmr)
+    matches = await run_blocking(
+        "store", _candidates, q_emb, question, project_id, pool, hybrid, mmr)
+    return await _refine_async(q_emb, question, matches, top_k, pool, rerank, mmr)
+
+
+# ---- Batches ----
+
+
+def _error(e: Exception) -> dict:
+    return {"error": f"{type(e).__name__}: {e}"}
+
+
+async def search_batch_async(questions: list[str], project_id: str | None,
+                             top_k: int = 10, hybrid: Optional[bool] = None,
+                             rerank: Optional[bool] = None,
+                             mmr: Optional[bool] = None) -> list[dict]:
+    """
+    Retrieval for many questions: one embedding call and one Chroma query.
+    Returns {"matches": [...]} or {"error": ...} per question, in order.
+    """
+    rerank = reranker.RERANK_ENABLED if rerank is None else rerank
+    mmr = diversity.MMR_ENABLED if mmr is None else mmr
+    pool = _pool_size(top_k, rerank, mmr)
+    results: list[dict] = [{}] * len(questions)
+    todo = [i for i, q in enumerate(questions) if q.strip()]
+    for i in set(range(len(questions))) - set(todo):
+        results[i] = {"error": "empty question"}
+    if not todo:
+        return results
+    asked = [questions[i] for i in todo]
+    try:
+        q_embs = await run_blocking("embed", embed_queries, asked)
+        pools = await run_blocking(
+            "store", _candidates_batch, q_embs, asked, project_id, pool, hybrid, mmr)
+    except Exception as e:
+        for i in todo:
+            results[i] = _error(e)
+        return results
+    for i, q_emb, matches in zip(todo, q_embs, pools):
+        if rerank or mmr:
+            try:
+                matches = await _refine_async(
+                    q_emb, questions[i], matches, top_k, pool, rerank, mmr)
+            except Exception as e:
+                results[i] = _error(e)
+                continue
+        results[i] = {"q_emb": q_emb, "matches": matches}
+    return results
+
+
+async def ask_batch_async(questions: list[str], project_id: str | None,
+                          top_k: int = 5, use_cache: bool = True,
+                          semantic: bool = False,
+                          semantic_threshold: Optional[float] = None,
+                          hybrid: Optional[bool] = None,
+                          rerank: Optional[bool] = None,
+                          mmr: Optional[bool] = None,
+                          concurrency: Optional[int] = None) -> list[dict]:
+    """
+    ask_question_async for a list of questions. Cache misses are embedded
+    and retrieved together (search_batch_async); the LLM calls then run
+    concurrently, at most `concurrency` (BATCH_LLM_CONCURRENCY) at a time
+    and within the global "llm" limit. One result per question, in order;
+    a failing question gets {"question", "error"} instead of an answer.
+    """
+    use_cache = use_cache and default_mode(hybrid, rerank, mmr)
+    semantic = semantic and default_mode(hybrid, rerank, mmr)
+
+    def lookups():
+        return [_cached_answer(q, project_id, top_k, use_cache) for q in questions]
+
+    cached = await run_blocking("store", lookups)
+    results: list[Optional[dict]] = [hit for _, hit in cached]
+    todo = [i for i, hit in enumerate(results) if hit is None]
+    retrieved = await search_batch_async(
+        [questions[i] for i in todo], project_id, top_k, hybrid, rerank, mmr)
+
+    limit = asyncio.Semaphore(max(1, concurrency or BATCH_LLM_CONCURRENCY))
+
+    async def answer(i: int, found: dict) -> dict:
+        if "error" in found:
+            return found
+        q_emb, matches = found["q_emb"], found["matches"]
+        if not matches:
+            return _no_matches()
+        try:
+            if semantic:
+                hit = await run_blocking(
+                    "store", _semantic_hit, project_id, q_emb, matches, semantic_threshold)
+                if hit is not None:
+                    return hit
+            async with limit, stage_limit("llm"):
+                text = await llm_answer_async(questions[i], matches)
+            result = {"answer": text, "matches": matches}
+            await run_blocking("store", _remember, questions[i], project_id, top_k,
+                               q_emb, result, cached[i][0], use_cache, semantic)
+            return {**result, "cached": False}
+        except Exception as e:
+            return _error(e)
+
+    answers = await asyncio.gather(*(answer(i, f) for i, f in zip(todo, retrieved)))
+    for i, result in zip(todo, answers):
+        results[i] = result
+    return [{"question": q, **r} for q, r in zip(questions, results)]
@@ -0,0 +1,197 @@
+# semantic_cache.py
+"""
+Opt-in semantic answer cache for near-duplicate questions.
+
+Past question embeddings are kept per project in a small in-memory matrix
+(persisted in SQLite). A new question reuses a prior answer when its
+cosine similarity to a cached question is above the threshold AND the
+chunks retrieved for the new question overlap enough with the chunks the
+cached answer was built from. Entries are tied to the project's index
+generation (see answer_cache) and are dropped once the index changes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.pipeline import answer_cache
+
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "data/semantic_cache.sqlite3")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Jaccard overlap between cached and freshly retrieved chunk ids
+SEMANTIC_CACHE_MIN_OVERLAP = float(os.getenv("SEMANTIC_CACHE_MIN_OVERLAP", "0.5"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+# Upper bounds of the similarity histogram buckets
+_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 1.0)
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+# project_key -> {"generation", "matrix", "rows": [(question, chunk_ids, response)]}
+_indexes: Dict[str, Dict[str, Any]] = {}
+_stats = {
+    "lookups": 0,
+    "hits": 0,
+    "rejected_overlap": 0,
+    "similarity_histogram": {str(b): 0 for b in _BUCKETS},
+    "hit_similarity_sum": 0.0,
+}
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        d = os.path.dirname(SEMANTIC_CACHE_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(SEMANTIC_CACHE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_key TEXT NOT NULL,
+                generation  INTEGER NOT NULL,
+                question    TEXT NOT NULL,
+                embedding   BLOB NOT NULL,
+                chunk_ids   TEXT NOT NULL,
+                response    TEXT NOT NULL,
+                created_at  REAL NOT NULL
+            )""")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_project ON entries (project_key, generation)")
+        _conn = conn
+    return _conn
+
+
+def _key(project_id: Optional[str]) -> str:
+    return project_id or answer_cache.ALL_PROJECTS
+
+
+def _index_for(key: str, generation: int) -> Dict[str, Any]:
+    """In-memory index for `key` at `generation`, loading it if needed. Caller holds _lock."""
+    import numpy as np
+
+    idx = _indexes.get(key)
+    if idx is not None and idx["generation"] == generation:
+        return idx
+    conn = _get_conn()
+    with conn:
+        conn.execute(
+            "DELETE FROM entries WHERE project_key = ? AND generation <> ?",
+            (key, generation))
+    rows = conn.execute(
+        "SELECT question, embedding, chunk_ids, response FROM entries "
+        "WHERE project_key = ? ORDER BY id", (key,)).fetchall()
+    vectors = [np.frombuffer(r[1], dtype=np.float32) for r in rows]
+    idx = {
+        "generation": generation,
+        "matrix": np.vstack(vectors) if vectors else None,
+        "rows": [(r[0], json.loads(r[2]), r[3]) for r in rows],
+    }
+    _indexes[key] = idx
+    return idx
+
+
+def _record_similarity(sim: float) -> None:
+    for b in _BUCKETS:
+        if sim <= b:
+            _stats["similarity_histogram"][str(b)] += 1
+            return
+    _stats["similarity_histogram"][str(_BUCKETS[-1])] += 1
+
+
+def _overlap(a: Sequence[str], b: Sequence[str]) -> float:
+    sa, sb = set(a), set(b)
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def lookup(
+    project_id: Optional[str],
+    query_embedding: Sequence[float],
+    retrieved_ids: Sequence[str],
+    threshold: Optional[float] = None,
+    min_overlap: float = SEMANTIC_CACHE_MIN_OVERLAP,
+) -> Optional[Tuple[Dict[str, Any], float]]:
+    """
+    Return (cached_response, similarity) for the most similar cached
+    question if it clears `threshold` and its chunk set is still valid.
+    """
+    import numpy as np
+
+    threshold = SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+    key = _key(project_id)
+    generation = answer_cache.get_generation(project_id)
+    with _lock:
+        _stats["lookups"] += 1
+        idx = _index_for(key, generation)
+        if idx["matrix"] is None:
+            return None
+        q = np.asarray(query_embedding, dtype=np.float32)
+        # embeddings are L2-normalized, so the dot product is the cosine
+        sims = idx["matrix"] @ q
+        best = int(np.argmax(sims))
+        sim = float(sims[best])
+        _record_similarity(sim)
+        if sim < threshold:
+            return None
+        _, chunk_ids, response = idx["rows"][best]
+        if _overlap(chunk_ids, retrieved_ids) < min_overlap:
+            _stats["rejected_overlap"] += 1
+            return None
+        _stats["hits"] += 1
+        _stats["hit_similarity_sum"] += sim
+    return json.loads(response), sim
+
+
+def store(project_id: Optional[str], question: str,
+          query_embedding: Sequence[float], response: Dict[str, Any],
+          generation: int) -> None:
+    """Remember `response` for `question` at index `generation`."""
+    import numpy as np
+
+    key = _key(project_id)
+    vec = np.asarray(query_embedding, dtype=np.float32)
+    chunk_ids = [m.get("id") for m in response.get("matches", [])]
+    payload = json.dumps(response)
+    with _lock:
+        idx = _index_for(key, answer_cache.get_generation(project_id))
+        if idx["generation"] != generation:
+            return  # index changed while we were answering
+        conn = _get_conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO entries (project_key, generation, question, embedding, "
+                "chunk_ids, response, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, generation, question, vec.tobytes(), json.dumps(chunk_ids),
+                 payload, time.time()))
+            overflow = len(idx["rows"]) + 1 - SEMANTIC_CACHE_MAX_ENTRIES
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM entries WHERE id IN (SELECT id FROM entries "
+                    "WHERE project_key = ? ORDER BY id LIMIT ?)", (key, overflow))
+        rows: List = idx["rows"] + [(question, chunk_ids, payload)]
+        matrix = vec[None, :] if idx["matrix"] is None else np.vstack([idx["matrix"], vec])
+        if overflow > 0:
+            rows, matrix = rows[overflow:], matrix[overflow:]
+        idx["rows"], idx["matrix"] = rows, matrix
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        lookups, hits = _stats["lookups"], _stats["hits"]
+        return {
+            "threshold": SEMANTIC_CACHE_THRESHOLD,
+            "min_overlap": SEMANTIC_CACHE_MIN_OVERLAP,
+            "entries": {k: len(v["rows"]) for k, v in _indexes.items()},
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "rejected_overlap": _stats["rejected_overlap"],
+            "mean_hit_similarity": round(_stats["hit_similarity_sum"] / hits, 4) if hits else None,
+            # best-match similarity per lookup, bucketed by upper bound
+            "similarity_histogram": dict(_stats["similarity_histogram"]),
+        }
@@ -0,0 +1,77 @@
+# truncation_report.py
+"""
+How many indexed chunks are longer than the embedding model's input
+limit (EMBED_MAX_TOKENS, special tokens included)? The model silently
+drops everything past the limit, so that tail is never searchable.
+
+    python -m src.pipeline.truncation_report [--project-id ID] [--out report.json]
+
+Chunks are read page by page and tokenized in batches; results are
+grouped per project and file type.
+"""
+from typing import Any, Dict, Optional
+
+from src.pipeline import index_stats
+from src.pipeline.embed_store import iter_chunks
+from src.pipeline.embeddings import EMBED_MAX_TOKENS, get_tokenizer
+
+
+def _summary(counts: Dict[str, Any]) -> Dict[str, Any]:
+    n = counts["chunks"]
+    return {
+        "chunks": n,
+        "truncated": counts["truncated"],
+        "truncated_pct": round(100.0 * counts["truncated"] / n, 2) if n else 0.0,
+        "mean_tokens": round(counts["tokens"] / n, 1) if n else 0.0,
+        "max_tokens": counts["max"],
+        # tokens past the limit, i.e. text the model never sees
+        "tokens_lost": counts["lost"],
+    }
+
+
+def truncation_report(project_id: Optional[str] = None,
+                      max_tokens: int = EMBED_MAX_TOKENS,
+                      page_size: int = 1000) -> Dict[str, Any]:
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        raise RuntimeError("Tokenizer for the embedding model could not be loaded")
+    projects = [project_id] if project_id else sorted(index_stats.all_project_stats())
+    report: Dict[str, Any] = {"max_tokens": max_tokens, "projects": {}}
+    total = {"chunks": 0, "truncated": 0, "tokens": 0, "max": 0, "lost": 0}
+    for pid in projects:
+        by_type: Dict[str, Dict[str, int]] = {}
+        for page in iter_chunks(pid, page_size=page_size):
+            lengths = [len(ids) for ids in tokenizer(
+                [c["text"] for c in page], add_special_tokens=True,
+                return_attention_mask=False)["input_ids"]]
+            for chunk, n in zip(page, lengths):
+                ftype = (chunk["metadata"] or {}).get("filetype") or "(none)"
+                for c in (by_type.setdefault(ftype, {"chunks": 0, "truncated": 0,
+                                                      "tokens": 0, "max": 0, "lost": 0}),
+                          total):
+                    c["chunks"] += 1
+                    c["tokens"] += n
+                    c["max"] = max(c["max"], n)
+                    if n > max_tokens:
+                        c["truncated"] += 1
+                        c["lost"] += n - max_tokens
+        report["projects"][pid] = {t: _summary(c) for t, c in sorted(by_type.items())}
+    report["total"] = _summary(total)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Report chunks truncated by the embedding model.")
+    parser.add_argument("--project-id", default=None)
+    parser.add_argument("--max-tokens", type=int, default=EMBED_MAX_TOKENS)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    result = truncation_report(args.project_id, max_tokens=args.max_tokens)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
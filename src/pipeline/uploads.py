@@ -0,0 +1,125 @@
+# uploads.py
+"""
+Staging of uploaded files for upsert-files.
+
+Every request gets its own directory, data/uploads/<project_id>/<uuid>/,
+so same-named files of different projects or requests never collide.
+Uploads are copied in UPLOAD_CHUNK_BYTES pieces and never read whole.
+.zip and .tar.gz/.tgz archives are extracted member by member into that
+directory. A tar archive is read as a stream. A zip is read through its
+central directory, so it needs a seekable file; FastAPI's spooled upload
+file is seekable. Members always land inside the directory: names with
+".." or a drive are skipped, as are links and special files.
+UPLOAD_MAX_BYTES caps the total bytes written, which also bounds zip
+bombs.
+"""
+import os
+import re
+import shutil
+import stat
+import tarfile
+import uuid
+import zipfile
+from typing import BinaryIO, List, Optional, Set
+
+UPLOAD_DIR = "data/uploads"
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1 << 20)))
+# Max bytes written per request, archives extracted (0: no limit)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 << 30)))
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "200000"))
+# Keep staged files after ingestion (default: delete the request directory)
+UPLOAD_KEEP_FILES = os.getenv("UPLOAD_KEEP_FILES", "0").lower() in {"1", "true", "yes"}
+
+
+class UploadError(ValueError):
+    """Rejected upload (e.g. an unreadable archive)."""
+
+
+class UploadTooLarge(UploadError):
+    """Upload over UPLOAD_MAX_BYTES or UPLOAD_MAX_FILES."""
+
+
+class Staging:
+    """One request's upload directory; counts bytes and files against the limits."""
+
+    def __init__(self, project_id: str, root: str = UPLOAD_DIR,
+                 max_bytes: int = UPLOAD_MAX_BYTES, max_files: int = UPLOAD_MAX_FILES):
+        project = re.sub(r"[^A-Za-z0-9_.-]", "_", project_id) or "default"
+        self.path = os.path.abspath(os.path.join(root, project, uuid.uuid4().hex))
+        os.makedirs(self.path)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.bytes = 0
+        self.files: List[str] = []
+        self._seen: Set[str] = set()
+
+    def target(self, name: str) -> Optional[str]:
+        """Absolute path for a relative member name, or None if it is unsafe."""
+        parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+        if not parts or ".." in parts or ":" in parts[0]:
+            return None
+        dest = os.path.join(self.path, *parts)
+        if os.path.commonpath([self.path, os.path.abspath(dest)]) != self.path:
+            return None
+        return dest
+
+    def write(self, name: str, src: BinaryIO) -> Optional[str]:
+        """Copy `src` to `name` in fixed-size chunks; returns the path (None if skipped)."""
+        dest = self.target(name)
+        if dest is None:
+            return None
+        if len(self.files) >= self.max_files:
+            raise UploadTooLarge(f"Upload has more than {self.max_files} files")
+        try:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(dest, "wb") as out:
+                while True:
+                    block = src.read(UPLOAD_CHUNK_BYTES)
+                    if not block:
+                        break
+                    self.bytes += len(block)
+                    if self.max_bytes and self.bytes > self.max_bytes:
+                        raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+                    out.write(block)
+        except OSError as e:
+            # e.g. members "a" and "a/b.py": one name is both file and directory
+            raise UploadError(f"Cannot write {name}: {e.strerror or e}") from e
+        if dest not in self._seen:
+            self._seen.add(dest)
+            self.files.append(dest)
+        return dest
+
+    def add(self, filename: str, src: BinaryIO) -> None:
+        """Stage one uploaded file; archives are extracted in place."""
+        lower = filename.lower()
+        try:
+            if lower.endswith((".tar.gz", ".tgz")):
+                self._extract_tar(src)
+            elif lower.endswith(".zip"):
+                self._extract_zip(src)
+            else:
+                self.write(os.path.basename(filename.replace("\\", "/")), src)
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError) as e:
+            raise UploadError(f"Cannot read archive {filename}: {e}") from e
+
+    def _extract_tar(self, src: BinaryIO) -> None:
+        # "r|gz": sequential read, no seeking and no index in memory
+        with tarfile.open(fileobj=src, mode="r|gz") as tar:
+            for member in tar:
+                if member.isfile():
+                    fileobj = tar.extractfile(member)
+                    if fileobj is not None:
+                        self.write(member.name, fileobj)
+                tar.members = []  # TarFile keeps every header otherwise
+
+    def _extract_zip(self, src: BinaryIO) -> None:
+        with zipfile.ZipFile(src) as zf:
+            for info in zf.infolist():
+                kind = stat.S_IFMT(info.external_attr >> 16)  # 0 if not recorded
+                if info.is_dir() or (kind and kind != stat.S_IFREG):
+                    continue  # directories, symlinks, devices
+                with zf.open(info) as fileobj:
+                    self.write(info.filename, fileobj)
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
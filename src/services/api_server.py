@@ -2,10 +2,15 @@
 from src.pipeline.embed_store import get_collection
 import os
 import json
+import time
+import functools
 import uuid
+import logging
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict, Any
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 from src.pipeline.embed_store import (
@@ -14,39 +19,48 @@ from src.pipeline.embed_store import (
     list_files_for_project,
     list_documents_for_project,
     get_chunks,
+    iter_chunks,
+    iter_pages,
 )
 from src.pipeline.ingest_repo import ingest_folder, ingest_repo, upsert_files
-from src.pipeline.retrieval import ask_question
+from src.pipeline.manifest import delete_manifest
+from src.pipeline.retrieval import (
+    BATCH_MAX_QUESTIONS,
+    NO_MATCHES_ANSWER,
+    ask_batch_async,
+    ask_question_async,
+    default_mode,
+    retrieve_async,
+    search_batch_async,
+    search_chunks_async,
+)
+from src.pipeline.answer_generation import (
+    embed_text, format_answer, llm_answer_stream_async)
+from src.pipeline.concurrency import run_blocking, stage_limit, shutdown as shutdown_executors
+from src.pipeline import (
+    answer_cache, embeddings, index_stats, lexical_index, metrics, reranker, resources,
+    semantic_cache, uploads,
+)
+from src.services.jobs import JobLimitError, JobManager
+from src.services.project_store import ProjectStore
+
+logger = logging.getLogger(__name__)
 
-PROJECTS_FILE = "data/projects.json"
 os.makedirs("data", exist_ok=True)
 
+_project_store: Optional[ProjectStore] = None
 
-def _load_projects() -> Dict[str, Any]:
-    if not os.path.exists(PROJECTS_FILE):
-        return {"projects": []}
-    try:
-        with open(PROJECTS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if "projects" not in data:
-                data = {"projects": []}
-            return data
-    except json.JSONDecodeError:
-        # Auto-recover from corrupt file
-        return {"projects": []}
 
-
-def _save_projects(data: Dict[str, Any]) -> None:
-    with open(PROJECTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+def get_project_store() -> ProjectStore:
+    """Create or return the process-wide project registry."""
+    global _project_store
+    if _project_store is None:
+        _project_store = ProjectStore()
+    return _project_store
 
 
 def _get_project(project_id: str) -> Optional[Dict[str, Any]]:
-    db = _load_projects()
-    for p in db["projects"]:
-        if p["project_id"] == project_id:
-            return p
-    return None
+    return get_project_store().get(project_id)
 
 
 class ProjectCreate(BaseModel):
@@ -69,12 +83,20 @@ class IngestFolderRequest(BaseModel):
     folder_path: str
     extensions: Optional[List[str]] = None
     ignore_git: Optional[bool] = True
+    parallel: bool = False
+    workers: Optional[int] = None
+    queue_size: Optional[int] = None
+    background: bool = False  # run as a job; poll /jobs/{job_id}
 
 
 class IngestRepoRequest(BaseModel):
     repo_url: str
     branch: Optional[str] = None
     dest_dir: str
+    parallel: bool = False
+    workers: Optional[int] = None
+    queue_size: Optional[int] = None
+    background: bool = False  # run as a job; poll /jobs/{job_id}
 
 
 class AskRequest(BaseModel):
@@ -82,13 +104,136 @@ class AskRequest(BaseModel):
     top_k: int = 5
     project_id: Optional[str] = None
     rel_path_filter: Optional[str] = None
+    use_cache: bool = True
+    semantic_cache: bool = False
+    semantic_threshold: Optional[float] = None
+    hybrid: Optional[bool] = None  # None: HYBRID_RETRIEVAL
+    rerank: Optional[bool] = None  # None: RERANK_ENABLED
+    mmr: Optional[bool] = None  # None: MMR_ENABLED
+
+
+class AskBatchRequest(BaseModel):
+    questions: List[str]
+    top_k: int = 5
+    project_id: Optional[str] = None
+    use_cache: bool = True
+    semantic_cache: bool = False
+    semantic_threshold: Optional[float] = None
+    hybrid: Optional[bool] = None
+    rerank: Optional[bool] = None
+    mmr: Optional[bool] = None
+    concurrency: Optional[int] = None  # LLM calls in flight; None: BATCH_LLM_CONCURRENCY
+
+
+class SearchBatchRequest(BaseModel):
+    queries: List[str]
+    project_id: str
+    top_k: int = 10
+    hybrid: Optional[bool] = None
+    rerank: Optional[bool] = None
+    mmr: Optional[bool] = None
 
 
 class ReembedRequest(BaseModel):
     strategy: str = "replace"  # "replace" or "append"
+    force: bool = False  # ignore the manifest and rebuild every vector
+    background: bool = False  # run as a job; poll /jobs/{job_id}
+
+
+# Set PRELOAD_MODELS=1 to load the embedding model, Chroma and the LLM
+# client at startup instead of on the first request that needs them.
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0").lower() in {"1", "true", "yes"}
+# Send each response's per-stage timings as a Server-Timing header.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1").lower() in {"1", "true", "yes"}
+
+
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """Create or return the process-wide background job manager."""
+    global _job_manager
+    if _job_manager is None:
+        jm = JobManager()
+        jm.register("ingest-folder", _run_ingest_folder)
+        jm.register("ingest-repo", _run_ingest_repo)
+        jm.register("reembed", _run_reembed)
+        _job_manager = jm
+    return _job_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRELOAD_MODELS:
+        resources.warmup()
+    # pick up jobs interrupted by a restart
+    get_job_manager().recover()
+    yield
+    get_job_manager().shutdown()
+    shutdown_executors()
+
+
+app = FastAPI(title="Codebase Assistant API", version="1.0", lifespan=lifespan)
+
+
+class TimingMiddleware:
+    """
+    Trace each request's pipeline stages (metrics.stage) into a
+    Server-Timing header and record its latency per route. Streamed
+    responses only report the stages that ran before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = {"code": 500}
+        with metrics.trace() as timings:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    if SERVER_TIMING:
+                        value = metrics.server_timing(timings, time.perf_counter() - t0)
+                        message = {**message, "headers": [
+                            *message.get("headers", []),
+                            (b"server-timing", value.encode("latin-1"))]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                route = getattr(scope.get("route"), "path", "unmatched")
+                metrics.observe("rag_http_request_seconds", time.perf_counter() - t0,
+                                route=route, method=scope["method"], status=status["code"])
+
 
+app.add_middleware(TimingMiddleware)
 
-app = FastAPI(title="Codebase Assistant API", version="1.0")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def api_metrics():
+    """Pipeline metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/cache/stats")
+def api_cache_stats():
+    return {"query_embeddings": embeddings.query_cache.stats(),
+            "answers": answer_cache.stats(),
+            "semantic_answers": semantic_cache.stats(),
+            "reranker": reranker.stats()}
+
+
+@app.post("/warmup")
+def api_warmup():
+    """Eagerly create all heavy resources; returns seconds spent on each."""
+    return {"status": "ok", "load_seconds": resources.warmup(),
+            "resources": resources.status()}
 
 # ---- Projects CRUD ----
 
@@ -106,18 +251,15 @@ def create_project(req: ProjectCreate):
         "branch": req.branch,
         "created_at": __import__("datetime").datetime.utcnow().isoformat()
     }
-    db = _load_projects()
-    db["projects"].append(proj)
-    _save_projects(db)
-    return proj
+    return get_project_store().create(proj)
 
 
 @app.get("/projects")
 def list_projects():
-    db = _load_projects()
+    all_stats = index_stats.all_project_stats()
     items = []
-    for p in db["projects"]:
-        stats = get_stats_for_project(p["project_id"])
+    for p in get_project_store().list():
+        stats = all_stats.get(p["project_id"], {})
         items.append({
             "project_id": p["project_id"],
             "project_name": p["project_name"],
@@ -125,7 +267,9 @@ def list_projects():
             "root_path": p.get("root_path"),
             "branch": p.get("branch"),
             "created_at": p["created_at"],
-            "chunk_count": stats["chunk_count"]
+            "chunk_count": stats.get("chunk_count", 0),
+            "file_count": stats.get("file_count", 0),
+            "doc_count": stats.get("doc_count", 0)
         })
     return items
 
@@ -145,77 +289,153 @@ def delete_project(project_id: str):
     if not p:
         raise HTTPException(404, "Project not found")
     deleted = delete_where({"project_id": project_id})
-    db = _load_projects()
-    db["projects"] = [x for x in db["projects"] if x["project_id"] != project_id]
-    _save_projects(db)
+    delete_manifest(project_id)
+    lexical_index.drop_project(project_id)
+    get_project_store().delete(project_id)
     return {"status": "deleted", "project_id": project_id,
             "deleted_chunks": deleted}
 
 # ---- Ingestion / Upsert ----
 
 
-@app.post("/projects/{project_id}/ingest-folder")
-def api_ingest_folder(project_id: str, req: IngestFolderRequest):
+def _run_ingest_folder(params: Dict[str, Any], progress=None, cancel=None) -> Dict[str, Any]:
+    project_id = params["project_id"]
     p = _get_project(project_id)
     if not p:
-        raise HTTPException(404, "Project not found")
-    if not os.path.exists(req.folder_path):
-        raise HTTPException(400, f"Folder not found: {req.folder_path}")
-    result = ingest_folder(
-        folder_path=req.folder_path,
+        raise ValueError(f"Project not found: {project_id}")
+    return ingest_folder(
+        folder_path=params["folder_path"],
         project_id=project_id,
         project_name=p["project_name"],
         repo_url=p.get("repo_url"),
         branch=p.get("branch"),
-        exts=req.extensions
+        exts=params.get("extensions"),
+        parallel=params.get("parallel", False),
+        workers=params.get("workers"),
+        queue_size=params.get("queue_size"),
+        progress=progress,
+        cancel=cancel,
     )
-    return result
 
 
-@app.post("/projects/{project_id}/ingest-repo")
-def api_ingest_repo(project_id: str, req: IngestRepoRequest):
+def _run_ingest_repo(params: Dict[str, Any], progress=None, cancel=None) -> Dict[str, Any]:
+    project_id = params["project_id"]
     p = _get_project(project_id)
     if not p:
-        raise HTTPException(404, "Project not found")
+        raise ValueError(f"Project not found: {project_id}")
     res = ingest_repo(
-        repo_url=req.repo_url,
-        dest_dir=req.dest_dir,
-        branch=req.branch,
+        repo_url=params["repo_url"],
+        dest_dir=params["dest_dir"],
+        branch=params.get("branch"),
         project_id=project_id,
-        project_name=p["project_name"]
+        project_name=p["project_name"],
+        parallel=params.get("parallel", False),
+        workers=params.get("workers"),
+        queue_size=params.get("queue_size"),
+        progress=progress,
+        cancel=cancel,
     )
     # store the root_path/repo_url in the project registry if missing
-    db = _load_projects()
-    for proj in db["projects"]:
-        if proj["project_id"] == project_id:
-            proj["repo_url"] = req.repo_url
-            proj["root_path"] = req.dest_dir
-            proj["branch"] = req.branch
-            break
-    _save_projects(db)
+    get_project_store().update(project_id,
+                               repo_url=params["repo_url"],
+                               root_path=params["dest_dir"],
+                               branch=params.get("branch"))
     return res
 
 
-@app.post("/projects/{project_id}/upsert-files")
-async def api_upsert_files(
-        project_id: str, files: List[UploadFile] = File(...)):
+def _run_reembed(params: Dict[str, Any], progress=None, cancel=None) -> Dict[str, Any]:
+    project_id = params["project_id"]
     p = _get_project(project_id)
     if not p:
-        raise HTTPException(404, "Project not found")
-    os.makedirs("data/uploads", exist_ok=True)
-    saved_paths = []
-    for f in files:
-        dest = os.path.join("data/uploads", f.filename)
-        with open(dest, "wb") as out:
-            out.write(await f.read())
-        saved_paths.append(dest)
-    res = upsert_files(
-        saved_paths,
+        raise ValueError(f"Project not found: {project_id}")
+    # replace: sync vectors with root_path (unchanged files are skipped,
+    # chunks of removed files deleted); append: never delete.
+    # force: delete old vectors first and re-embed everything.
+    root_path = p.get("root_path")
+    if not root_path or not os.path.isdir(root_path):
+        return {"status": "ok",
+                "message": "No root_path on record, nothing to re-embed. Use ingest-folder or ingest-repo."}
+    if params.get("force"):
+        delete_where({"project_id": project_id})
+        delete_manifest(project_id)
+    res = ingest_folder(
+        folder_path=root_path,
         project_id=project_id,
         project_name=p["project_name"],
         repo_url=p.get("repo_url"),
-        branch=p.get("branch"))
-    return res
+        branch=p.get("branch"),
+        prune=params.get("strategy", "replace") == "replace",
+        progress=progress,
+        cancel=cancel,
+    )
+    return {"status": "ok", **res}
+
+
+def _submit_job(project_id: str, kind: str, params: Dict[str, Any]):
+    try:
+        job = get_job_manager().submit(project_id, kind, params)
+    except JobLimitError as e:
+        raise HTTPException(429, str(e))
+    return JSONResponse(status_code=202, content=job)
+
+
+@app.post("/projects/{project_id}/ingest-folder")
+def api_ingest_folder(project_id: str, req: IngestFolderRequest):
+    p = _get_project(project_id)
+    if not p:
+        raise HTTPException(404, "Project not found")
+    if not os.path.exists(req.folder_path):
+        raise HTTPException(400, f"Folder not found: {req.folder_path}")
+    params = {"project_id": project_id,
+              **req.model_dump(exclude={"background", "ignore_git"})}
+    if req.background:
+        return _submit_job(project_id, "ingest-folder", params)
+    return _run_ingest_folder(params)
+
+
+@app.post("/projects/{project_id}/ingest-repo")
+def api_ingest_repo(project_id: str, req: IngestRepoRequest):
+    p = _get_project(project_id)
+    if not p:
+        raise HTTPException(404, "Project not found")
+    params = {"project_id": project_id, **req.model_dump(exclude={"background"})}
+    if req.background:
+        return _submit_job(project_id, "ingest-repo", params)
+    return _run_ingest_repo(params)
+
+
+@app.post("/projects/{project_id}/upsert-files")
+def api_upsert_files(
+        project_id: str, files: List[UploadFile] = File(...), parallel: bool = False):
+    """
+    Upload files (or .zip / .tar.gz archives of them) and upsert their
+    chunks. Files are staged per request in data/uploads/<project>/<uuid>/
+    (see src.pipeline.uploads); rel_paths are relative to that directory,
+    so re-uploading a file replaces its chunks.
+    """
+    p = _get_project(project_id)
+    if not p:
+        raise HTTPException(404, "Project not found")
+    staging = uploads.Staging(project_id)
+    try:
+        for f in files:
+            staging.add(f.filename or "upload", f.file)
+        res = upsert_files(
+            staging.files,
+            project_id=project_id,
+            project_name=p["project_name"],
+            repo_url=p.get("repo_url"),
+            branch=p.get("branch"),
+            rel_root=staging.path,
+            parallel=parallel)
+    except uploads.UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+    except uploads.UploadError as e:
+        raise HTTPException(400, str(e))
+    finally:
+        if not uploads.UPLOAD_KEEP_FILES:
+            staging.cleanup()
+    return {**res, "bytes_received": staging.bytes}
 
 
 @app.post("/projects/{project_id}/reembed")
@@ -223,101 +443,249 @@ def api_reembed_project(project_id: str, req: ReembedRequest):
     p = _get_project(project_id)
     if not p:
         raise HTTPException(404, "Project not found")
-    # replace: delete old vectors, then re-ingest folder if path exists
     if req.strategy not in {"replace", "append"}:
         raise HTTPException(400, "strategy must be 'replace' or 'append'")
-    if req.strategy == "replace":
-        delete_where({"project_id": project_id})
+    params = {"project_id": project_id, **req.model_dump(exclude={"background"})}
+    if req.background:
+        return _submit_job(project_id, "reembed", params)
+    return _run_reembed(params)
+
+# ---- Background jobs ----
+
+
+@app.get("/jobs")
+def api_list_jobs(project_id: Optional[str] = None, limit: int = 50):
+    return get_job_manager().list(project_id=project_id, limit=limit)
 
-    root_path = p.get("root_path")
-    if not root_path or not os.path.isdir(root_path):
-        return {"status": "ok",
-                "message": "No root_path on record, nothing to re-embed. Use ingest-folder or ingest-repo."}
-    res = ingest_folder(
-        folder_path=root_path,
-        project_id=project_id,
-        project_name=p["project_name"],
-        repo_url=p.get("repo_url"),
-        branch=p.get("branch")
-    )
-    return {"status": "ok", **res}
+
+@app.get("/jobs/{job_id}")
+def api_get_job(job_id: str):
+    job = get_job_manager().get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel")
+def api_cancel_job(job_id: str):
+    job = get_job_manager().cancel(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
 
 # ---- Browsing / Discovery ----
 
 
+BROWSE_PAGE_SIZE = int(os.getenv("BROWSE_PAGE_SIZE", "500"))
+NDJSON = "application/x-ndjson"
+
+
+def _browse(request: Request, fetch, limit: Optional[int], offset: int,
+            fmt: Optional[str], default_limit: int, pages=None):
+    """
+    Page through `fetch(limit=, offset=)`.
+    NDJSON (format=ndjson or Accept: application/x-ndjson) streams one
+    item per line, page by page (`pages` if given), up to `limit` items
+    (all if unset). Otherwise one JSON page is returned, with
+    X-Next-Offset when more items may follow.
+    """
+    if limit is not None:
+        limit = max(0, limit)  # SQLite reads a negative LIMIT as "no limit"
+    if fmt == "ndjson" or NDJSON in request.headers.get("accept", ""):
+        pages = pages or functools.partial(iter_pages, fetch)
+
+        def lines():
+            for page in pages(limit=limit, offset=offset, page_size=BROWSE_PAGE_SIZE):
+                yield "".join(json.dumps(item) + "\n" for item in page)
+        return StreamingResponse(lines(), media_type=NDJSON)
+    limit = default_limit if limit is None else limit
+    items = fetch(limit=limit, offset=offset)
+    headers = {"X-Next-Offset": str(offset + len(items))} if items and len(items) == limit else {}
+    return JSONResponse(items, headers=headers)
+
+
 @app.get("/projects/{project_id}/files")
-def api_list_files(project_id: str, pattern: Optional[str] = None):
+def api_list_files(request: Request, project_id: str, pattern: Optional[str] = None,
+                   limit: Optional[int] = None, offset: int = 0,
+                   format: Optional[str] = None):
     p = _get_project(project_id)
     if not p:
         raise HTTPException(404, "Project not found")
-    return list_files_for_project(project_id, pattern=pattern)
+    fetch = functools.partial(list_files_for_project, project_id, pattern=pattern)
+    return _browse(request, fetch, limit, offset, format, default_limit=1000)
 
 
 @app.get("/projects/{project_id}/documents")
-def api_list_documents(project_id: str):
+def api_list_documents(request: Request, project_id: str,
+                       limit: Optional[int] = None, offset: int = 0,
+                       format: Optional[str] = None):
     p = _get_project(project_id)
     if not p:
         raise HTTPException(404, "Project not found")
-    return list_documents_for_project(project_id)
+    fetch = functools.partial(list_documents_for_project, project_id)
+    return _browse(request, fetch, limit, offset, format, default_limit=1000)
 
 
 @app.get("/projects/{project_id}/chunks")
-def api_list_chunks(
-        project_id: str, rel_path: Optional[str] = None, limit: int = 200):
+def api_list_chunks(request: Request, project_id: str, rel_path: Optional[str] = None,
+                    limit: Optional[int] = None, offset: int = 0,
+                    after: Optional[str] = None, format: Optional[str] = None):
+    """Chunks in chunk_id order; pass the last id seen as `after` to page by cursor."""
     p = _get_project(project_id)
     if not p:
         raise HTTPException(404, "Project not found")
-    return get_chunks(project_id, rel_path=rel_path, limit=limit)
+    fetch = functools.partial(get_chunks, project_id, rel_path=rel_path, after=after)
+    pages = functools.partial(iter_chunks, project_id, rel_path=rel_path, after=after)
+    return _browse(request, fetch, limit, offset, format, default_limit=200, pages=pages)
 
 # ---- Ask / Search ----
 
 
 @app.post("/ask")
-def api_ask(req: AskRequest):
-    return ask_question(
+async def api_ask(req: AskRequest):
+    return await ask_question_async(
         question=req.question,
         top_k=req.top_k,
-        project_id=req.project_id
+        project_id=req.project_id,
+        use_cache=req.use_cache,
+        semantic=req.semantic_cache,
+        semantic_threshold=req.semantic_threshold,
+        hybrid=req.hybrid,
+        rerank=req.rerank,
+        mmr=req.mmr,
     )
 
 
+def _check_batch_size(n: int) -> None:
+    if n > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch.")
+
+
+@app.post("/ask/batch")
+async def api_ask_batch(req: AskBatchRequest):
+    """
+    Answer many questions in one request: one embedding call, one Chroma
+    query, concurrent LLM calls. Results are in request order; a failed
+    question carries an "error" instead of an "answer".
+    """
+    _check_batch_size(len(req.questions))
+    results = await ask_batch_async(
+        req.questions, req.project_id, top_k=req.top_k, use_cache=req.use_cache,
+        semantic=req.semantic_cache, semantic_threshold=req.semantic_threshold,
+        hybrid=req.hybrid, rerank=req.rerank, mmr=req.mmr,
+        concurrency=req.concurrency)
+    return {"count": len(results), "results": results}
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/ask/stream")
+async def api_ask_stream(req: AskRequest):
+    """
+    Server-Sent Events version of /ask. Emits one `matches` event, then a
+    `token` event per LLM delta, then `done` with timings (or `error`).
+    """
+    # the answer cache only holds answers of the default retrieval mode
+    use_cache = req.use_cache and default_mode(req.hybrid, req.rerank, req.mmr)
+
+    async def events():
+        t0 = time.perf_counter()
+        generation = await run_blocking(
+            "store", answer_cache.get_generation, req.project_id)
+        cached = (await run_blocking(
+            "store", answer_cache.lookup, req.project_id, req.question, req.top_k)
+            if use_cache else None)
+        if cached is not None:
+            yield _sse("matches", cached.get("matches", []))
+            yield _sse("token", {"text": cached.get("answer", "")})
+            yield _sse("done", {"cached": True, "ttft_ms": round(
+                (time.perf_counter() - t0) * 1000, 1)})
+            return
+
+        try:
+            _, matches = await retrieve_async(
+                req.question, req.project_id, req.top_k, req.hybrid, req.rerank, req.mmr)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        yield _sse("matches", matches)
+        if not matches:
+            yield _sse("token", {"text": NO_MATCHES_ANSWER})
+            yield _sse("done", {"cached": False, "ttft_ms": None})
+            return
+
+        parts = []
+        ttft_ms = None
+        try:
+            async with stage_limit("llm"):
+                async for delta in llm_answer_stream_async(req.question, matches):
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - t0) * 1000, 1)
+                        logger.info("ask/stream time-to-first-token %.1f ms", ttft_ms)
+                    parts.append(delta)
+                    yield _sse("token", {"text": delta})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        total_ms = round((time.perf_counter() - t0) * 1000, 1)
+        logger.info("ask/stream done in %.1f ms (ttft %s ms)", total_ms, ttft_ms)
+        if use_cache:
+            await run_blocking(
+                "store", answer_cache.store, req.project_id, req.question, req.top_k,
+                # same text /ask caches, so either endpoint can serve the entry
+                {"answer": format_answer("".join(parts)), "matches": matches},
+                generation=generation)
+        yield _sse("done", {"cached": False, "ttft_ms": ttft_ms, "total_ms": total_ms})
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _search_results(matches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "count": len(matches),
+        "results": [
+            {
+                "id": m["id"],
+                "rel_path": m["metadata"].get("rel_path"),
+                "chunk_idx": m["metadata"].get("chunk_idx"),
+                "preview": m["text"][:300],
+                "distance": m.get("distance"),
+                "score": m.get("score"),
+                "rerank_score": m.get("rerank_score"),
+            }
+            for m in matches
+        ]
+    }
+
+
 @app.get("/search")
-def api_search(q: str, project_id: str):
+async def api_search(q: str, project_id: str, top_k: int = 10,
+                     hybrid: Optional[bool] = None, rerank: Optional[bool] = None,
+                     mmr: Optional[bool] = None):
     """Lightweight retrieval-only search without LLM."""
     try:
-        from src.pipeline.embed_store import get_collection
-        from src.pipeline.answer_generation import embed_text
-
-        col = get_collection()
-        q_emb = embed_text(q)
-        where = {"project_id": project_id}
-
-        # Perform similarity search
-        results = col.query(
-            query_embeddings=[q_emb],
-            where=where,
-            n_results=10,
-            include=["documents", "metadatas", "distances"]
-        )
-
-        docs = results.get("documents", [[]])[0]
-        metas = results.get("metadatas", [[]])[0]
-        dists = results.get("distances", [[]])[0]
-
-        return {
-            "count": len(docs),
-            "results": [
-                {
-                    "rel_path": m.get("rel_path"),
-                    "chunk_idx": m.get("chunk_idx"),
-                    "preview": doc[:300],
-                    "distance": d
-                }
-                for doc, m, d in zip(docs, metas, dists)
-            ]
-        }
+        q_emb = await run_blocking("embed", embed_text, q)
+        return _search_results(await search_chunks_async(
+            q_emb, q, project_id, top_k, hybrid, rerank, mmr))
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         return {"error": str(e)}
+
+
+@app.post("/search/batch")
+async def api_search_batch(req: SearchBatchRequest):
+    """Retrieval-only search for many queries (one embedding call, one Chroma query)."""
+    _check_batch_size(len(req.queries))
+    found = await search_batch_async(
+        req.queries, req.project_id, req.top_k, req.hybrid, req.rerank, req.mmr)
+    results = [{"query": q, **(f if "error" in f else _search_results(f["matches"]))}
+               for q, f in zip(req.queries, found)]
+    return {"count": len(results), "results": results}
@@ -9,6 +9,7 @@ sys.path.append(
 from src.services import api_server
 import uvicorn
 import threading
+import time
 import json
 import requests
 import streamlit as st
@@ -53,6 +54,54 @@ def api_post(path, **kwargs):
         return {"error": resp.text, "status_code": resp.status_code}
 
 
+def start_job(job):
+    """Track a submitted background job; show_active_job renders it."""
+    if "job_id" not in job:
+        st.json(job)  # validation error or limit reached
+        return
+    st.session_state["active_job"] = job["job_id"]
+
+
+def show_active_job(poll_seconds=1.0):
+    """
+    Progress and a Cancel button for the tracked job. Called on every
+    rerun; while the job runs the script sleeps and reruns itself, so a
+    click on Cancel (which also reruns) is seen on the next pass.
+    """
+    job_id = st.session_state.get("active_job")
+    if not job_id:
+        return
+    if st.button("Cancel job", key=f"cancel_{job_id}"):
+        api_post(f"/jobs/{job_id}/cancel")
+    job = api_get(f"/jobs/{job_id}")
+    prog = job.get("progress", {})
+    total, done = prog.get("files_total"), prog.get("files_done", 0)
+    if job.get("status") in ("queued", "running"):
+        text = (f"{done}/{total or '?'} files, "
+                f"{prog.get('chunks_upserted', 0)} chunks embedded")
+        if job.get("eta_seconds") is not None:
+            text += f", ETA {job['eta_seconds']:.0f}s"
+        st.progress(min(1.0, done / total) if total else 0.0, text=text)
+        time.sleep(poll_seconds)
+        st.rerun()
+    st.session_state.pop("active_job", None)
+    st.progress(1.0, text=f"Job {job.get('status')}")
+    st.json(job)
+
+
+def api_stream(path, **kwargs):
+    """POST to an SSE endpoint and yield (event, data) pairs as they arrive."""
+    with requests.post(f"{API_BASE}{path}", stream=True, **kwargs) as resp:
+        event = "message"
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):].strip())
+
+
 # ---------------- Ask tab ----------------
 if menu == "Ask":
     st.header("🤖 Ask about your code")
@@ -79,20 +128,34 @@ if menu == "Ask":
                 if not question.strip():
                     st.warning("Please enter a question first.")
                 else:
-                    with st.spinner("Querying LLM..."):
-                        res = api_post("/ask", json={
-                            "question": question,
-                            "top_k": top_k,
-                            "project_id": project_id
-                        })
                     st.subheader("Answer")
-                    st.write(res.get("answer", "No answer"))
+                    answer_box = st.empty()
+                    answer_box.write("Querying LLM...")
+                    answer, matches, done = "", [], {}
+                    for event, data in api_stream("/ask/stream", json={
+                        "question": question,
+                        "top_k": top_k,
+                        "project_id": project_id
+                    }):
+                        if event == "matches":
+                            matches = data
+                        elif event == "token":
+                            answer += data.get("text", "")
+                            answer_box.markdown(answer + "▌")
+                        elif event == "error":
+                            st.error(data.get("detail", "Request failed"))
+                        elif event == "done":
+                            done = data
+                    answer_box.markdown(answer or "No answer")
+                    if done.get("ttft_ms") is not None:
+                        st.caption(
+                            f"First token after {done['ttft_ms']} ms"
+                            + (" (cached)" if done.get("cached") else ""))
                     with st.expander("Show matched chunks"):
-                        for m in res.get("matches", []):
+                        for m in matches:
+                            md = m["metadata"]
                             st.markdown(
-                                f"**{
-                                    m['metadata'].get('rel_path')} (chunk {
-                                    m['metadata'].get('chunk_idx')})**"
+                                f"**{md.get('rel_path')} (chunk {md.get('chunk_idx')})**"
                             )
                             st.code(m["text"], language="python")
         else:
@@ -203,9 +266,10 @@ elif menu == "Ingest / Upload":
             elif st.button("Ingest Folder"):
                 res = api_post(f"/projects/{project_id}/ingest-folder", json={
                     "folder_path": folder,
-                    "extensions": [e.strip() for e in exts.split(",") if e.strip()]
+                    "extensions": [e.strip() for e in exts.split(",") if e.strip()],
+                    "background": True
                 })
-                st.json(res)
+                start_job(res)
         elif mode == "Ingest Repo":
             repo = st.text_input("Repo URL")
             branch = st.text_input("Branch", "main")
@@ -218,9 +282,10 @@ elif menu == "Ingest / Upload":
                 res = api_post(f"/projects/{project_id}/ingest-repo", json={
                     "repo_url": repo,
                     "branch": branch,
-                    "dest_dir": dest
+                    "dest_dir": dest,
+                    "background": True
                 })
-                st.json(res)
+                start_job(res)
         elif mode == "Upload Files":
             files = st.file_uploader(
                 "Upload files", accept_multiple_files=True)
@@ -242,8 +307,10 @@ elif menu == "Ingest / Upload":
                 res = api_post(
                     f"/projects/{project_id}/reembed",
                     json={
-                        "strategy": strategy})
-                st.json(res)
+                        "strategy": strategy,
+                        "background": True})
+                start_job(res)
+        show_active_job()
 
 # ---------------- Browse tab ----------------
 elif menu == "Browse":
@@ -260,22 +327,25 @@ elif menu == "Browse":
         project_id = project_options[project_name]
 
         view = st.radio("View", ["Files", "Documents", "Chunks"])
+        page_size = 200 if view == "Chunks" else 1000
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+        paging = {"limit": page_size, "offset": (page - 1) * page_size}
         if view == "Files":
             pattern = st.text_input("Filename pattern (optional, e.g. *.py)")
             res = api_get(
                 f"/projects/{project_id}/files",
                 params={
-                    "pattern": pattern})
+                    "pattern": pattern, **paging})
             st.dataframe(res)
         elif view == "Documents":
-            res = api_get(f"/projects/{project_id}/documents")
+            res = api_get(f"/projects/{project_id}/documents", params=paging)
             st.dataframe(res)
         else:
             rel = st.text_input("Relative path (optional)")
             res = api_get(
                 f"/projects/{project_id}/chunks",
                 params={
-                    "rel_path": rel})
+                    "rel_path": rel, **paging})
             for c in res:
                 st.markdown(
                     f"**{c['metadata'].get('rel_path')}** (chunk {c['metadata'].get('chunk_idx')})")
@@ -0,0 +1,258 @@
+# jobs.py
+"""
+Background ingestion jobs.
+
+Long ingests (ingest-folder, ingest-repo, reembed) are submitted to a
+worker pool and tracked by job id instead of running inside the HTTP
+request. Job state (params, status, progress, result) lives in SQLite so
+it survives a restart; jobs that were queued or running when the server
+stopped are re-queued on startup (cheap, since ingest is incremental).
+Shutdown stops running jobs through the same event as cancel() but puts
+them back to "queued"; only an explicit cancel() ends a job as
+"cancelled".
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from src.pipeline.ingest_pipeline import IngestCancelled
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.sqlite3")
+JOBS_MAX_CONCURRENT = int(os.getenv("JOBS_MAX_CONCURRENT", "2"))
+JOBS_MAX_PER_PROJECT = int(os.getenv("JOBS_MAX_PER_PROJECT", "1"))
+# How often a running job's progress is written to SQLite
+JOBS_PROGRESS_SAVE_SECONDS = float(os.getenv("JOBS_PROGRESS_SAVE_SECONDS", "5"))
+
+ACTIVE = ("queued", "running")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+# runner(params, progress, cancel_event) -> result dict
+Runner = Callable[[Dict[str, Any], Callable[..., None], threading.Event], Dict[str, Any]]
+
+
+class JobLimitError(Exception):
+    """Raised when a project already has its maximum number of active jobs."""
+
+
+class JobManager:
+    def __init__(self, db_path: str = JOBS_DB_PATH,
+                 max_concurrent: int = JOBS_MAX_CONCURRENT,
+                 max_per_project: int = JOBS_MAX_PER_PROJECT):
+        self.max_per_project = max(1, int(max_per_project))
+        self._runners: Dict[str, Runner] = {}
+        self._cancel: Dict[str, threading.Event] = {}
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._cancelled: Set[str] = set()  # cancelled by cancel(), not by shutdown
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_concurrent)),
+                                        thread_name_prefix="ingest-job")
+        d = os.path.dirname(db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id      TEXT PRIMARY KEY,
+                project_id  TEXT NOT NULL,
+                kind        TEXT NOT NULL,
+                params      TEXT NOT NULL,
+                status      TEXT NOT NULL,
+                progress    TEXT NOT NULL DEFAULT '{}',
+                result      TEXT,
+                error       TEXT,
+                created_at  REAL NOT NULL,
+                started_at  REAL,
+                finished_at REAL
+            )""")
+        self._db.commit()
+
+    # ---- registration / recovery ----
+
+    def register(self, kind: str, runner: Runner) -> None:
+        self._runners[kind] = runner
+
+    def recover(self) -> List[str]:
+        """Re-queue jobs left queued/running by a previous process."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                ACTIVE).fetchall()
+            ids = [r["job_id"] for r in rows]
+            with self._db:
+                self._db.executemany(
+                    "UPDATE jobs SET status = 'queued', started_at = NULL WHERE job_id = ?",
+                    [(i,) for i in ids])
+        for job_id in ids:
+            self._enqueue(job_id)
+        return ids
+
+    # ---- public API ----
+
+    def submit(self, project_id: str, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if kind not in self._runners:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = f"job_{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            active = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE project_id = ? AND status IN (?, ?)",
+                (project_id, *ACTIVE)).fetchone()[0]
+            if active >= self.max_per_project:
+                raise JobLimitError(
+                    f"Project {project_id} already has {active} active job(s)")
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO jobs (job_id, project_id, kind, params, status, created_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?)",
+                    (job_id, project_id, kind, json.dumps(params), time.time()))
+        self._enqueue(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?",
+                                   (job_id,)).fetchone()
+            live = dict(self._progress.get(job_id, {}))
+        return self._to_dict(row, live) if row else None
+
+    def list(self, project_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            if project_id:
+                rows = self._db.execute(
+                    "SELECT * FROM jobs WHERE project_id = ? ORDER BY created_at DESC LIMIT ?",
+                    (project_id, limit)).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?",
+                    (limit,)).fetchall()
+            live = {r["job_id"]: dict(self._progress.get(r["job_id"], {})) for r in rows}
+        return [self._to_dict(r, live[r["job_id"]]) for r in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?",
+                                   (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] in FINISHED:
+                return self._to_dict(row, {})
+            if row["status"] == "queued":
+                self._set_status(job_id, "cancelled", finished_at=time.time())
+            self._cancelled.add(job_id)
+            self._cancel.setdefault(job_id, threading.Event()).set()
+        return self.get(job_id)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Stop the workers. Running jobs are interrupted and, like queued
+        ones, left "queued" for recover() in the next process.
+        """
+        self._stopping.set()
+        with self._lock:
+            events = list(self._cancel.values())
+        for ev in events:
+            ev.set()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    # ---- internals ----
+
+    def _enqueue(self, job_id: str) -> None:
+        with self._lock:
+            self._cancel.setdefault(job_id, threading.Event())
+        self._pool.submit(self._run, job_id)
+
+    def _set_status(self, job_id: str, status: str, **fields) -> None:
+        """Caller holds self._lock."""
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        sql = f"UPDATE jobs SET status = ?{', ' + cols if cols else ''} WHERE job_id = ?"
+        with self._db:
+            self._db.execute(sql, (status, *fields.values(), job_id))
+
+    def _run(self, job_id: str) -> None:
+        with self._lock:
+            cancel = self._cancel[job_id]
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?",
+                                   (job_id,)).fetchone()
+            if row is None or row["status"] != "queued" or self._stopping.is_set():
+                self._forget(job_id)
+                return
+            if cancel.is_set():
+                self._set_status(job_id, "cancelled", finished_at=time.time())
+                self._forget(job_id)
+                return
+            self._progress[job_id] = {}
+            self._set_status(job_id, "running", started_at=time.time())
+        runner = self._runners[row["kind"]]
+        params = json.loads(row["params"])
+        saved = [time.monotonic()]
+
+        def progress(**fields):
+            with self._lock:
+                self._progress[job_id].update(fields)
+                now = time.monotonic()
+                if now - saved[0] >= JOBS_PROGRESS_SAVE_SECONDS:
+                    saved[0] = now
+                    with self._db:
+                        self._db.execute("UPDATE jobs SET progress = ? WHERE job_id = ?",
+                                         (json.dumps(self._progress[job_id]), job_id))
+
+        status, result, error = "succeeded", None, None
+        try:
+            result = runner(params, progress, cancel)
+        except IngestCancelled:
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        with self._lock:
+            snapshot = self._progress.pop(job_id, {})
+            if status == "cancelled" and job_id not in self._cancelled:
+                # stopped by shutdown(): recover() picks it up again
+                self._set_status(job_id, "queued", started_at=None,
+                                 progress=json.dumps(snapshot))
+            else:
+                self._set_status(
+                    job_id, status, finished_at=time.time(),
+                    progress=json.dumps(snapshot),
+                    result=json.dumps(result) if result is not None else None,
+                    error=error)
+            self._forget(job_id)
+
+    def _forget(self, job_id: str) -> None:
+        """Caller holds self._lock."""
+        self._cancel.pop(job_id, None)
+        self._cancelled.discard(job_id)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row, live: Dict[str, Any]) -> Dict[str, Any]:
+        progress = live or json.loads(row["progress"] or "{}")
+        job = {
+            "job_id": row["job_id"],
+            "project_id": row["project_id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "params": json.loads(row["params"]),
+            "progress": progress,
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        started = row["started_at"]
+        if started:
+            end = row["finished_at"] or time.time()
+            elapsed = max(end - started, 1e-6)
+            done = progress.get("files_done", 0)
+            total = progress.get("files_total")
+            job["elapsed_seconds"] = round(elapsed, 2)
+            job["files_per_second"] = round(done / elapsed, 2)
+            job["chunks_per_second"] = round(progress.get("chunks_upserted", 0) / elapsed, 2)
+            if row["status"] == "running" and total and done:
+                job["eta_seconds"] = round((total - done) * elapsed / done, 1)
+        return job
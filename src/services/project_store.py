@@ -0,0 +1,110 @@
+# project_store.py
+"""
+Project registry backed by SQLite and held in memory.
+
+All projects are loaded once into a dict keyed by project_id, so lookups
+never touch disk. Writes go to SQLite first (one transaction each) and
+only then update the in-memory copy, all under one lock, so concurrent
+creates/updates can't lose each other. A legacy data/projects.json is
+imported on first start and renamed to projects.json.migrated.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+PROJECTS_DB_PATH = os.getenv("PROJECTS_DB_PATH", "data/projects.sqlite3")
+LEGACY_PROJECTS_FILE = "data/projects.json"
+
+FIELDS = ("project_id", "project_name", "repo_url", "root_path", "branch", "created_at")
+
+
+class ProjectStore:
+    def __init__(self, db_path: str = PROJECTS_DB_PATH,
+                 legacy_json: Optional[str] = LEGACY_PROJECTS_FILE):
+        self._lock = threading.Lock()
+        d = os.path.dirname(db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS projects (
+                project_id   TEXT PRIMARY KEY,
+                project_name TEXT NOT NULL,
+                repo_url     TEXT,
+                root_path    TEXT,
+                branch       TEXT,
+                created_at   TEXT NOT NULL
+            )""")
+        self._db.commit()
+        if legacy_json:
+            self._migrate_json(legacy_json)
+        rows = self._db.execute("SELECT * FROM projects ORDER BY rowid").fetchall()
+        self._projects: Dict[str, Dict[str, Any]] = {r["project_id"]: dict(r) for r in rows}
+
+    def _migrate_json(self, path: str) -> int:
+        """One-time import of the old projects.json registry."""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f).get("projects", [])
+        except (json.JSONDecodeError, AttributeError):
+            items = []
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR IGNORE INTO projects ({', '.join(FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(FIELDS))})",
+                [tuple(p.get(k) for k in FIELDS) for p in items
+                 if p.get("project_id") and p.get("project_name")])
+        os.replace(path, path + ".migrated")
+        return len(items)
+
+    # ---- reads (memory only) ----
+
+    def get(self, project_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            p = self._projects.get(project_id)
+            return dict(p) if p else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(p) for p in self._projects.values()]
+
+    # ---- writes (SQLite first, then memory) ----
+
+    def create(self, project: Dict[str, Any]) -> Dict[str, Any]:
+        row = {k: project.get(k) for k in FIELDS}
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    f"INSERT INTO projects ({', '.join(FIELDS)}) "
+                    f"VALUES ({', '.join('?' * len(FIELDS))})",
+                    tuple(row.values()))
+            self._projects[row["project_id"]] = row
+        return dict(row)
+
+    def update(self, project_id: str, **fields) -> Optional[Dict[str, Any]]:
+        fields = {k: v for k, v in fields.items() if k in FIELDS and k != "project_id"}
+        with self._lock:
+            p = self._projects.get(project_id)
+            if p is None:
+                return None
+            if fields:
+                with self._db:
+                    self._db.execute(
+                        f"UPDATE projects SET {', '.join(f'{k} = ?' for k in fields)} "
+                        "WHERE project_id = ?", (*fields.values(), project_id))
+                p.update(fields)
+            return dict(p)
+
+    def delete(self, project_id: str) -> bool:
+        with self._lock:
+            with self._db:
+                cur = self._db.execute("DELETE FROM projects WHERE project_id = ?",
+                                       (project_id,))
+            self._projects.pop(project_id, None)
+            return cur.rowcount > 0
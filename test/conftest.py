@@ -0,0 +1,44 @@
+import hashlib
+
+import pytest
+
+
+def fake_vectors(texts, batch_size=None):
+    """Deterministic 8-d vectors, so tests need no embedding model."""
+    out = []
+    for t in texts:
+        digest = hashlib.sha256(t.encode("utf-8")).digest()
+        out.append([b / 255.0 + 0.01 for b in digest[:8]])
+    return out
+
+
+@pytest.fixture
+def tmp_store(monkeypatch, tmp_path):
+    """
+    A scratch store under tmp_path (the working directory for the test):
+    Chroma, index_stats, lexical index, manifests and answer caches all
+    start empty, and embeddings come from fake_vectors.
+    """
+    pytest.importorskip("chromadb")
+    from src.pipeline import (
+        answer_cache, embed_store, index_stats, ingest_pipeline, lexical_index,
+        resources, semantic_cache,
+    )
+
+    monkeypatch.chdir(tmp_path)
+    # absolute: Chroma shares one client per path string across the process
+    monkeypatch.setattr(embed_store, "PERSIST_DIR", str(tmp_path / "data" / "chroma_store"))
+    for name in ("chroma_client", "chroma_collection"):
+        monkeypatch.delitem(resources._instances, name, raising=False)
+    # no tokenizer download: text files fall back to character chunks
+    monkeypatch.setitem(resources._instances, "tokenizer", None)
+    monkeypatch.setattr(index_stats, "_conn", None)
+    monkeypatch.setattr(answer_cache, "_conn", None)
+    monkeypatch.setattr(semantic_cache, "_conn", None)
+    monkeypatch.setattr(semantic_cache, "_indexes", {})
+    monkeypatch.setattr(lexical_index, "_conns", {})
+    monkeypatch.setattr(embed_store, "embed_texts", fake_vectors)
+    monkeypatch.setattr(ingest_pipeline, "embed_texts", fake_vectors)
+    yield tmp_path
+    for name in ("chroma_client", "chroma_collection"):
+        resources._instances.pop(name, None)
@@ -0,0 +1,63 @@
+import pytest
+
+from src.pipeline import answer_cache
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_PATH", str(tmp_path / "answers.sqlite3"))
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(answer_cache, "_conn", None)
+    monkeypatch.setattr(answer_cache, "_counters", {"hits": 0, "misses": 0})
+    return answer_cache
+
+
+def _response(answer):
+    return {"answer": answer, "matches": [{"id": "p1::a.py::0"}]}
+
+
+def test_hit_on_normalized_question_and_same_top_k(cache):
+    cache.store("p1", "how does  ingest\twork?", 5, _response("A"))
+    assert cache.lookup("p1", " how does ingest work? ", 5) == _response("A")
+    assert cache.lookup("p1", "how does ingest work?", 6) is None
+    assert cache.lookup("p1", "How does ingest work?", 5) is None
+    assert cache.stats() == {"enabled": True, "entries": 1, "hits": 1, "misses": 2}
+
+
+def test_bump_generation_invalidates_project_and_all_projects(cache):
+    cache.store("p1", "q", 5, _response("p1"))
+    cache.store("p2", "q", 5, _response("p2"))
+    cache.store(None, "q", 5, _response("all"))
+
+    cache.bump_generation(["p1"])
+    assert cache.lookup("p1", "q", 5) is None
+    assert cache.lookup(None, "q", 5) is None  # "*" moves with every write
+    assert cache.lookup("p2", "q", 5) == _response("p2")
+    assert cache.get_generation("p1") == 1 and cache.get_generation(None) == 1
+
+    # stale entries are dropped, fresh ones are served again
+    assert cache.stats()["entries"] == 1
+    cache.store("p1", "q", 5, _response("p1 v2"))
+    assert cache.lookup("p1", "q", 5) == _response("p1 v2")
+
+
+def test_answer_stored_with_an_old_generation_is_never_served(cache):
+    gen = cache.get_generation("p1")
+    cache.bump_generation(["p1"])  # an ingest landed while answering
+    cache.store("p1", "q", 5, _response("stale"), generation=gen)
+    assert cache.lookup("p1", "q", 5) is None
+
+
+def test_no_cross_project_hits(cache):
+    cache.store("p1", "q", 5, _response("p1"))
+    assert cache.lookup("p2", "q", 5) is None
+    assert cache.lookup(None, "q", 5) is None
+    cache.clear("p1")
+    assert cache.lookup("p1", "q", 5) is None
+
+
+def test_disabled_cache_stores_and_serves_nothing(cache, monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", False)
+    cache.store("p1", "q", 5, _response("A"))
+    assert cache.lookup("p1", "q", 5) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("openai")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+from benchmarks.fake_llm import TOKENS, start  # noqa: E402
+from src.pipeline import answer_cache, resources  # noqa: E402
+from src.services import api_server  # noqa: E402
+
+
+@pytest.fixture
+def fake_llm(monkeypatch, request):
+    server, url = start(tokens=getattr(request, "param", TOKENS))
+    monkeypatch.setitem(resources._factories, "llm_async_client",
+                        lambda: AsyncOpenAI(base_url=url, api_key="test"))
+    resources.reset("llm_async_client")
+    yield url
+    server.shutdown()
+    resources.reset("llm_async_client")
+
+
+def _events(text):
+    out = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_ask_stream_sends_matches_then_tokens(fake_llm, monkeypatch):
+    matches = [{"id": "p::a.py::0", "text": "def upsert_chunks(): ...",
+                "metadata": {"rel_path": "a.py", "chunk_idx": 0}, "distance": 0.1}]
+    async def fake_retrieve(q, project_id, top_k, hybrid=None, rerank=None, mmr=None):
+        return [0.0], matches
+
+    monkeypatch.setattr(api_server, "retrieve_async", fake_retrieve)
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", False)
+
+    client = TestClient(api_server.app)
+    resp = client.post("/ask/stream", json={"question": "where?", "project_id": "p"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(resp.text)
+    assert events[0] == ("matches", matches)
+    assert [d["text"] for e, d in events if e == "token"] == TOKENS
+    assert events[-1][0] == "done"
+    assert events[-1][1]["ttft_ms"] is not None
+
+
+# long enough that /ask wraps it
+LONG_ANSWER = [f"word{i} " for i in range(40)]
+
+
+@pytest.mark.parametrize("fake_llm", [LONG_ANSWER], indirect=True)
+def test_ask_stream_caches_the_same_text_as_ask(fake_llm, monkeypatch, tmp_path):
+    from src.pipeline.answer_generation import llm_answer_async
+
+    matches = [{"id": "p::a.py::0", "text": "def upsert_chunks(): ...",
+                "metadata": {"rel_path": "a.py", "chunk_idx": 0}, "distance": 0.1}]
+    async def fake_retrieve(q, project_id, top_k, hybrid=None, rerank=None, mmr=None):
+        return [0.0], matches
+
+    monkeypatch.setattr(api_server, "retrieve_async", fake_retrieve)
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_PATH", str(tmp_path / "answers.sqlite3"))
+    monkeypatch.setattr(answer_cache, "_conn", None)
+
+    client = TestClient(api_server.app)
+    client.post("/ask/stream", json={"question": "where?", "project_id": "p", "top_k": 5})
+    cached = answer_cache.lookup("p", "where?", 5)
+    assert "\n" in cached["answer"]
+    assert cached["answer"] == asyncio.run(llm_answer_async("where?", matches))
+
+    # the second request is served from the cache
+    events = _events(client.post(
+        "/ask/stream", json={"question": "where?", "project_id": "p", "top_k": 5}).text)
+    assert events[-1] == ("done", {"cached": True, "ttft_ms": events[-1][1]["ttft_ms"]})
+    assert [d["text"] for e, d in events if e == "token"] == [cached["answer"]]
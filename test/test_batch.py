@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from src.pipeline import answer_cache, retrieval  # noqa: E402
+from src.services import api_server  # noqa: E402
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    calls = {"embed": 0, "query": 0}
+
+    def embed_queries(texts):
+        calls["embed"] += 1
+        return [[float(len(t))] for t in texts]
+
+    def query_many(vectors, top_k=5, where=None, include=None):
+        calls["query"] += 1
+        return [[{"id": f"p::q{int(v[0])}.py::0", "text": "x",
+                  "metadata": {"rel_path": f"q{int(v[0])}.py"}, "distance": 0.1}]
+                for v in vectors]
+
+    async def llm_answer_async(question, matches):
+        if question == "boom":
+            raise RuntimeError("llm down")
+        return f"answer to {question}"
+
+    monkeypatch.setattr(retrieval, "embed_queries", embed_queries)
+    monkeypatch.setattr(retrieval, "query_many", query_many)
+    monkeypatch.setattr(retrieval, "llm_answer_async", llm_answer_async)
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", False)
+    return calls
+
+
+def test_ask_batch_one_embed_one_query_per_item_errors(fake_pipeline):
+    client = TestClient(api_server.app)
+    resp = client.post("/ask/batch", json={
+        "questions": ["a", "boom", "", "ccc"], "project_id": "p", "hybrid": False})
+    results = resp.json()["results"]
+
+    assert fake_pipeline == {"embed": 1, "query": 1}
+    assert [r["question"] for r in results] == ["a", "boom", "", "ccc"]
+    assert results[0]["answer"] == "answer to a"
+    assert results[0]["matches"][0]["id"] == "p::q1.py::0"
+    assert "llm down" in results[1]["error"]
+    assert results[2]["error"] == "empty question"
+    assert results[3]["matches"][0]["id"] == "p::q3.py::0"
+
+
+def test_search_batch_keeps_order(fake_pipeline):
+    client = TestClient(api_server.app)
+    resp = client.post("/search/batch", json={
+        "queries": ["bb", "a"], "project_id": "p", "hybrid": False})
+
+    assert [r["results"][0]["rel_path"] for r in resp.json()["results"]] == ["q2.py", "q1.py"]
+    assert fake_pipeline["query"] == 1
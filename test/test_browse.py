@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from src.pipeline import embed_store  # noqa: E402
+
+
+def _ids(n, project="p1", rel_path="a.py"):
+    return [f"{project}::{rel_path}::{i}" for i in range(n)]
+
+
+@pytest.fixture
+def chunks(tmp_store):
+    """7 chunks of a.py and 2 of b.py in project p1, plus one of p2."""
+    items = []
+    for project, rel_path, n in (("p1", "a.py", 7), ("p1", "b.py", 2), ("p2", "a.py", 1)):
+        items += [{"id": i, "text": f"text of {i}",
+                   "metadata": {"project_id": project, "rel_path": rel_path,
+                                "filetype": ".py", "doc_id": f"{project}/{rel_path}",
+                                "source": rel_path, "chunk_idx": k}}
+                  for k, i in enumerate(_ids(n, project, rel_path))]
+    embed_store.upsert_chunks(items)
+    return sorted(_ids(7) + _ids(2, rel_path="b.py"))
+
+
+def test_iter_pages_stops_on_a_short_page():
+    items = list(range(7))
+    calls = []
+
+    def fetch(limit, offset):
+        calls.append((limit, offset))
+        return items[offset:offset + limit]
+
+    assert list(embed_store.iter_pages(fetch, page_size=3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert calls == [(3, 0), (3, 3), (3, 6)]
+
+    calls.clear()  # exact multiple: one more (empty) fetch to find the end
+    assert sum(embed_store.iter_pages(fetch, offset=1, page_size=3), []) == [1, 2, 3, 4, 5, 6]
+    assert calls == [(3, 1), (3, 4), (3, 7)]
+
+    calls.clear()  # limit: never fetches past it
+    assert list(embed_store.iter_pages(fetch, limit=4, offset=2, page_size=3)) == [[2, 3, 4], [5]]
+    assert calls == [(3, 2), (1, 5)]
+    assert list(embed_store.iter_pages(fetch, limit=0)) == []
+
+
+def test_get_chunks_pages_by_offset_and_cursor(chunks):
+    page = embed_store.get_chunks("p1", limit=3)
+    assert [c["id"] for c in page] == chunks[:3]
+    assert page[0]["text"] == f"text of {chunks[0]}"
+    assert page[0]["metadata"]["rel_path"] == "a.py"
+
+    assert [c["id"] for c in embed_store.get_chunks("p1", limit=3, offset=2)] == chunks[2:5]
+    # the offset counts from the cursor
+    got = embed_store.get_chunks("p1", limit=3, offset=1, after=chunks[3])
+    assert [c["id"] for c in got] == chunks[5:8]
+    assert [c["id"] for c in embed_store.get_chunks("p1", rel_path="b.py")] == _ids(2, rel_path="b.py")
+    assert embed_store.get_chunks("p1", limit=0) == []
+    assert embed_store.get_chunks("p1", after=chunks[-1]) == []
+
+
+def test_iter_chunks_walks_every_chunk_once(chunks):
+    pages = list(embed_store.iter_chunks("p1", page_size=4))
+    assert [len(p) for p in pages] == [4, 4, 1]
+    assert [c["id"] for p in pages for c in p] == chunks
+
+    got = [c["id"] for p in embed_store.iter_chunks("p1", limit=5, offset=2, page_size=2)
+           for c in p]
+    assert got == chunks[2:7]
+    got = [c["id"] for p in embed_store.iter_chunks("p1", offset=1, after=chunks[4], page_size=2)
+           for c in p]
+    assert got == chunks[6:]
+
+
+@pytest.fixture
+def client(chunks, monkeypatch, tmp_path):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from src.services import api_server
+    from src.services.project_store import ProjectStore
+
+    store = ProjectStore(str(tmp_path / "projects.sqlite3"), legacy_json=None)
+    store.create({"project_id": "p1", "project_name": "P1", "root_path": str(tmp_path),
+                  "created_at": "2026-01-01T00:00:00"})
+    monkeypatch.setattr(api_server, "_project_store", store)
+    monkeypatch.setattr(api_server, "BROWSE_PAGE_SIZE", 3)
+    return TestClient(api_server.app)
+
+
+def _ndjson(resp):
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert resp.text.endswith("\n")
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+def test_browse_ndjson_streams_one_item_per_line(client, chunks):
+    rows = _ndjson(client.get("/projects/p1/chunks", params={"format": "ndjson"}))
+    assert [r["id"] for r in rows] == chunks
+    assert set(rows[0]) == {"id", "text", "metadata"}
+
+    resp = client.get("/projects/p1/chunks", params={"after": chunks[1], "limit": 4},
+                      headers={"Accept": "application/x-ndjson"})
+    assert [r["id"] for r in _ndjson(resp)] == chunks[2:6]
+
+    files = _ndjson(client.get("/projects/p1/files", params={"format": "ndjson", "offset": 1}))
+    assert files == [{"rel_path": "b.py", "filetype": ".py", "chunks": 2}]
+    assert client.get("/projects/p1/files", params={"format": "ndjson", "limit": 0}).text == ""
+
+
+def test_browse_json_pages_and_next_offset(client, chunks):
+    resp = client.get("/projects/p1/chunks", params={"limit": 4, "offset": 2})
+    assert [c["id"] for c in resp.json()] == chunks[2:6]
+    assert resp.headers["x-next-offset"] == "6"
+
+    resp = client.get("/projects/p1/chunks", params={"limit": 4, "offset": 6})
+    assert [c["id"] for c in resp.json()] == chunks[6:]
+    assert "x-next-offset" not in resp.headers
+
+    for limit in (0, -1):
+        resp = client.get("/projects/p1/files", params={"limit": limit})
+        assert resp.json() == [] and "x-next-offset" not in resp.headers
+    assert client.get("/projects/missing/chunks").status_code == 404
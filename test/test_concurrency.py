@@ -0,0 +1,41 @@
+import asyncio
+import gc
+import threading
+import time
+
+from src.pipeline import concurrency
+
+
+def test_stage_semaphores_are_per_loop_and_released_with_it():
+    async def use():
+        async with concurrency.stage_limit("llm"):
+            pass
+        return concurrency._semaphore("llm"), concurrency._semaphore("embed")
+
+    before = len(concurrency._semaphores)
+    first = asyncio.run(use())
+    second = asyncio.run(use())
+    assert first[0] is not first[1]
+    assert first[0] is not second[0]  # a new loop never reuses an old semaphore
+    gc.collect()
+    assert len(concurrency._semaphores) == before
+
+
+def test_run_blocking_respects_the_stage_limit(monkeypatch):
+    monkeypatch.setitem(concurrency.STAGE_LIMITS, "store", 2)
+    state = {"running": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+
+    async def main():
+        await asyncio.gather(*(concurrency.run_blocking("store", work) for _ in range(8)))
+
+    asyncio.run(main())
+    assert state["peak"] <= 2
@@ -0,0 +1,32 @@
+from src.pipeline import diversity
+
+
+def _match(i, rel_path, emb):
+    return {"id": str(i), "text": "x", "metadata": {"rel_path": rel_path}, "embedding": emb}
+
+
+def test_mmr_prefers_diverse_chunks():
+    # 0 and 1 are near-identical; 2 is less relevant but different
+    matches = [_match(0, "big.py", [1.0, 0.02]), _match(1, "big.py", [1.0, 0.0]),
+               _match(2, "caller.py", [0.0, 1.0])]
+    q = [1.0, 0.5]
+
+    assert [m["id"] for m in diversity.mmr(q, matches, 2, lambda_mult=1.0)] == ["0", "1"]
+    out = diversity.mmr(q, matches, 2, lambda_mult=0.5)
+    assert [m["id"] for m in out] == ["0", "2"]
+    assert all("embedding" not in m for m in out)
+
+
+def test_mmr_caps_chunks_per_file():
+    matches = [_match(i, "big.py", [1.0, 0.01 * i]) for i in range(4)] + \
+        [_match(9, "other.py", [0.0, 1.0])]
+    out = diversity.mmr([1.0, 0.0], matches, 3, lambda_mult=1.0, max_per_file=2)
+
+    assert [m["id"] for m in out] == ["0", "1", "9"]
+
+
+def test_mmr_fetches_missing_embeddings(monkeypatch):
+    monkeypatch.setattr(diversity, "get_embeddings", lambda ids: {"1": [0.0, 1.0]})
+    matches = [_match(0, "a.py", [1.0, 0.0]), {"id": "1", "text": "y", "metadata": {}}]
+
+    assert [m["id"] for m in diversity.mmr([0.0, 1.0], matches, 2)] == ["1", "0"]
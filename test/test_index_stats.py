@@ -0,0 +1,79 @@
+import pytest
+
+from src.pipeline import index_stats
+
+
+@pytest.fixture
+def stats(monkeypatch, tmp_path):
+    monkeypatch.setattr(index_stats, "INDEX_STATS_PATH", str(tmp_path / "stats.sqlite3"))
+    monkeypatch.setattr(index_stats, "_conn", None)
+    conn = index_stats._get_conn()
+    with conn:  # nothing to import from Chroma
+        conn.execute("INSERT INTO meta (key, value) VALUES ('built', '1')")
+    return index_stats
+
+
+def _chunks(rel_path, n, doc=None, project="p1", start=0):
+    ids = [f"{project}::{rel_path}::{i}" for i in range(start, start + n)]
+    mds = [{"project_id": project, "rel_path": rel_path, "filetype": ".py",
+            "doc_id": doc or f"doc-{rel_path}", "source": rel_path} for _ in ids]
+    return ids, mds
+
+
+def _counts(stats, project="p1"):
+    s = stats.get_project_stats(project)
+    files = {f["rel_path"]: f["chunks"] for f in stats.list_files(project)}
+    docs = {d["doc_id"]: d["chunk_count"] for d in stats.list_documents(project)}
+    return (s["chunk_count"], s["file_count"], s["doc_count"]), files, docs
+
+
+def test_counts_follow_upserts_moves_and_deletes(stats):
+    stats.record_upsert(*_chunks("a.py", 3))
+    stats.record_upsert(*_chunks("b.py", 2))
+    assert _counts(stats) == ((5, 2, 2), {"a.py": 3, "b.py": 2},
+                              {"doc-a.py": 3, "doc-b.py": 2})
+
+    # re-upserting the same ids counts nothing twice
+    stats.record_upsert(*_chunks("a.py", 3))
+    assert _counts(stats)[0] == (5, 2, 2)
+
+    # a chunk id whose metadata moved to another file and document
+    ids, _ = _chunks("b.py", 1, start=1)
+    stats.record_upsert(ids, [{"project_id": "p1", "rel_path": "c.py", "filetype": ".py",
+                               "doc_id": "doc-c.py", "source": "c.py"}])
+    assert _counts(stats) == ((5, 3, 3), {"a.py": 3, "b.py": 1, "c.py": 1},
+                              {"doc-a.py": 3, "doc-b.py": 1, "doc-c.py": 1})
+
+    # a file re-upserted with fewer chunks, the tail deleted
+    stats.record_upsert(*_chunks("a.py", 1))
+    stats.record_delete(stats.chunk_ids("p1", rel_path="a.py")[1:])
+    assert _counts(stats) == ((3, 3, 3), {"a.py": 1, "b.py": 1, "c.py": 1},
+                              {"doc-a.py": 1, "doc-b.py": 1, "doc-c.py": 1})
+
+    # deleting a file's last chunk drops the file and its document
+    stats.record_delete(["p1::b.py::0", "p1::missing::0"])
+    assert _counts(stats) == ((2, 2, 2), {"a.py": 1, "c.py": 1},
+                              {"doc-a.py": 1, "doc-c.py": 1})
+
+
+def test_projects_are_counted_separately(stats):
+    stats.record_upsert(*_chunks("a.py", 2, project="p1"))
+    stats.record_upsert(*_chunks("a.py", 4, project="p2"))
+    stats.record_delete(stats.chunk_ids("p2"))
+    assert _counts(stats, "p1")[0] == (2, 1, 1)
+    assert _counts(stats, "p2") == ((0, 0, 0), {}, {})
+    assert set(stats.all_project_stats()) == {"p1"}
+
+
+def test_reconcile_of_one_project_does_not_mark_the_table_built(tmp_store):
+    from src.pipeline import embed_store
+
+    ids, mds = _chunks("a.py", 2)
+    embed_store.get_collection().upsert(ids=ids, metadatas=mds, documents=["x", "y"],
+                                        embeddings=[[1.0, 0.0], [0.0, 1.0]])
+    conn = index_stats._get_conn()
+    assert index_stats.reconcile("p1") == {"p1": 2}
+    assert not index_stats._is_built(conn)
+
+    assert index_stats.reconcile() == {"p1": 2}
+    assert index_stats._is_built(conn)
@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from src.pipeline import embed_store, index_stats, ingest_repo, manifest  # noqa: E402
+
+
+def _functions(n):
+    return "\n\n".join(f"def f{i}(x):\n    return x + {i}\n" for i in range(n))
+
+
+def _ids(project_id):
+    return set(embed_store.get_collection().get(where={"project_id": project_id})["ids"])
+
+
+def _ingest(folder):
+    return ingest_repo.ingest_folder(str(folder), "p1", "P1")
+
+
+def test_incremental_ingest_skips_updates_and_prunes(tmp_store):
+    repo = tmp_store / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text(_functions(4))
+    (repo / "b.py").write_text(_functions(2))
+
+    res = _ingest(repo)
+    assert res["files_ingested"] == 2 and res["chunks_upserted"] == 6
+    assert len(_ids("p1")) == 6
+
+    # unchanged files are skipped and nothing is re-embedded
+    res = _ingest(repo)
+    assert res["files_skipped"] == 2 and res["files_updated"] == 0
+    assert res["chunks_upserted"] == 0
+
+    # a touched but identical file is skipped by hash
+    os.utime(repo / "b.py", (1, 1))
+    assert _ingest(repo)["files_skipped"] == 2
+
+    # a changed file is re-upserted, the other one skipped
+    (repo / "b.py").write_text(_functions(3))
+    res = _ingest(repo)
+    assert res["files_updated"] == 1 and res["files_skipped"] == 1
+    assert res["chunks_upserted"] == 3 and res["chunks_deleted"] == 0
+    assert len(_ids("p1")) == 7
+
+    # a shorter file leaves no chunks behind
+    (repo / "a.py").write_text(_functions(1))
+    res = _ingest(repo)
+    assert res["chunks_deleted"] == 3
+    assert {i for i in _ids("p1") if "a.py" in i} == {"p1::repo/a.py::0"}
+    assert index_stats.get_project_stats("p1")["chunk_count"] == 4
+
+    # a removed file is pruned from the store and the manifest
+    (repo / "b.py").unlink()
+    res = _ingest(repo)
+    assert res["files_deleted"] == 1 and res["chunks_deleted"] == 3
+    assert _ids("p1") == {"p1::repo/a.py::0"}
+    files = manifest.load_manifest("p1")["files"]
+    assert list(files) == [str(repo / "a.py")]
+    assert files[str(repo / "a.py")]["chunk_ids"] == ["p1::repo/a.py::0"]
+
+
+def test_prune_leaves_files_outside_the_folder(tmp_store):
+    (tmp_store / "one").mkdir()
+    (tmp_store / "two").mkdir()
+    (tmp_store / "one" / "a.py").write_text(_functions(1))
+    (tmp_store / "two" / "b.py").write_text(_functions(1))
+    _ingest(tmp_store / "one")
+    _ingest(tmp_store / "two")
+    assert _ingest(tmp_store / "one")["files_deleted"] == 0
+    assert _ids("p1") == {"p1::one/a.py::0", "p1::two/b.py::0"}
+
+
+def test_manifest_write_is_atomic(tmp_store, monkeypatch):
+    manifest.save_manifest("p1", {"files": {"/x.py": {"hash": "h"}}})
+    path = manifest.manifest_path("p1")
+    assert not os.path.exists(f"{path}.tmp")
+    assert manifest.load_manifest("p1")["files"] == {"/x.py": {"hash": "h"}}
+
+    # a failed write keeps the previous manifest intact
+    def broken_dump(obj, f):
+        f.write('{"files": ')
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(manifest.json, "dump", broken_dump)
+        with pytest.raises(OSError):
+            manifest.save_manifest("p1", {"files": {}})
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["files"] == {"/x.py": {"hash": "h"}}
+
+    # a corrupt manifest only forces a full re-ingest
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+    assert manifest.load_manifest("p1") == {"files": {}}
+
+
+def test_upsert_files_deletes_stale_chunks_in_one_batch(tmp_store, monkeypatch):
+    up = tmp_store / "upload"
+    up.mkdir()
+    (up / "a.py").write_text(_functions(5))
+    (up / "b.py").write_text(_functions(3))
+    files = [str(up / "a.py"), str(up / "b.py")]
+    res = ingest_repo.upsert_files(files, "p1", "P1", rel_root=str(up))
+    assert res["chunks_upserted"] == 8 and res["chunks_deleted"] == 0
+    ingest_repo.upsert_files([str(up / "a.py")], "p2", "P2", rel_root=str(up))
+
+    calls = []
+    real_delete_ids = ingest_repo.delete_ids
+    monkeypatch.setattr(ingest_repo, "delete_ids",
+                        lambda ids: calls.append(list(ids)) or real_delete_ids(ids))
+    (up / "a.py").write_text(_functions(2))
+    (up / "b.py").write_text(_functions(1))
+    res = ingest_repo.upsert_files(files, "p1", "P1", rel_root=str(up))
+
+    assert res["chunks_deleted"] == 5
+    assert len(calls) == 1
+    assert _ids("p1") == {"p1::a.py::0", "p1::a.py::1", "p1::b.py::0"}
+    assert len(_ids("p2")) == 5  # same rel_path in another project is untouched
+    assert index_stats.get_project_stats("p1")["chunk_count"] == 3
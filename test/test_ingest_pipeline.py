@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from src.pipeline import ingest_pipeline
+from src.pipeline.ingest_pipeline import IngestCancelled, run_pipeline
+
+
+@pytest.fixture
+def fake_stages(monkeypatch):
+    """Fake embedder and writer; returns the upserted chunk ids in order."""
+    written = []
+
+    def upsert(chunks, embeddings=None):
+        assert len(embeddings) == len(chunks)
+        written.extend(c["id"] for c in chunks)
+        return (len(chunks), len(chunks))
+
+    monkeypatch.setattr(ingest_pipeline, "embed_texts",
+                        lambda texts, batch_size=None: [[0.0]] * len(texts))
+    monkeypatch.setattr(ingest_pipeline, "upsert_chunks", upsert)
+    return written
+
+
+def _fake_parse(fp, **kwargs):
+    if fp == "bad.py":
+        raise ValueError("cannot parse bad.py")
+    n = 0 if fp == "empty.py" else 2
+    return [{"id": f"{fp}::{i}", "text": "x"} for i in range(n)]
+
+
+def test_files_processed_in_order(fake_stages, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "parse_file", _fake_parse)
+    seen = []
+    paths = ["a.py", "empty.py", "b.py", "c.py"]
+    counts = run_pipeline(paths, {}, workers=3, batch_size=3, use_processes=False,
+                          on_file=lambda fp, chunks: seen.append((fp, len(chunks))))
+
+    assert seen == [("a.py", 2), ("empty.py", 0), ("b.py", 2), ("c.py", 2)]
+    assert counts == {"files": 3, "chunks": 6}
+    assert fake_stages == ["a.py::0", "a.py::1", "b.py::0", "b.py::1", "c.py::0", "c.py::1"]
+
+
+def test_parse_error_propagates(fake_stages, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "parse_file", _fake_parse)
+    with pytest.raises(ValueError, match="bad.py"):
+        run_pipeline(["a.py", "bad.py", "c.py"], {}, workers=2, use_processes=False)
+
+
+def test_cancel_stops_the_walk(fake_stages, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "parse_file", _fake_parse)
+    cancel = threading.Event()
+
+    def paths():
+        yield "a.py"
+        cancel.set()
+        yield "b.py"
+
+    with pytest.raises(IngestCancelled):
+        run_pipeline(paths(), {}, use_processes=False, cancel=cancel)
+    assert "b.py::0" not in fake_stages
+
+
+def test_spawned_parse_workers(fake_stages, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "m.py").write_text("def f():\n    return 1\n")
+    counts = run_pipeline([str(tmp_path / "m.py")], {"project_id": "p"}, workers=1)
+
+    assert counts["files"] == 1
+    assert fake_stages and all(i.startswith("p::m.py::") for i in fake_stages)
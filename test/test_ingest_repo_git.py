@@ -0,0 +1,76 @@
+import os
+import subprocess
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+
+from src.pipeline import embed_store, ingest_repo, resources  # noqa: E402
+
+
+def _git(cwd, *args):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def fake_store(monkeypatch, tmp_path):
+    """In-memory stand-in for Chroma; manifests land in tmp_path."""
+    store = {}
+
+    def upsert(chunks, embeddings=None):
+        for c in chunks:
+            store[c["id"]] = c
+        return (len(chunks), len(chunks))
+
+    def delete_ids(ids):
+        ids = list(ids)
+        for i in ids:
+            store.pop(i, None)
+        return len(ids)
+
+    monkeypatch.setattr(embed_store, "upsert_chunks", upsert)
+    monkeypatch.setattr(ingest_repo, "delete_ids", delete_ids)
+    # no tokenizer download: text files fall back to character chunks
+    monkeypatch.setitem(resources._instances, "tokenizer", None)
+    monkeypatch.chdir(tmp_path)
+    return store
+
+
+def test_pull_only_reindexes_changed_paths(fake_store, tmp_path):
+    remote = tmp_path / "remote.git"
+    work = tmp_path / "work"
+    _git(tmp_path, "init", "-q", "--bare", str(remote))
+    _git(tmp_path, "clone", "-q", str(remote), str(work))
+    _git(work, "config", "user.email", "dev@example.com")
+    _git(work, "config", "user.name", "dev")
+    (work / "a.py").write_text("def a():\n    return 1\n")
+    (work / "b.txt").write_text("hello")
+    (work / "c.md").write_text("docs")
+    _git(work, "add", ".")
+    _git(work, "commit", "-qm", "one")
+    _git(work, "push", "-q", "origin", "HEAD")
+
+    dest = str(tmp_path / "checkouts" / "p")
+    first = ingest_repo.ingest_repo(str(remote), dest, None, "p", "P")
+    assert first["mode"] == "full"
+    assert first["files_ingested"] == 3
+
+    (work / "b.txt").write_text("changed")
+    _git(work, "mv", "c.md", "d.md")
+    _git(work, "rm", "-q", "a.py")
+    _git(work, "commit", "-qam", "two")
+    _git(work, "push", "-q", "origin", "HEAD")
+
+    second = ingest_repo.ingest_repo(str(remote), dest, None, "p", "P")
+    assert second["mode"] == "git-diff"
+    assert second["previous_commit"] == first["commit"]
+    assert second["files_updated"] == 2  # b.txt, d.md
+    assert second["files_deleted"] == 2  # a.py, c.md
+    paths = sorted(os.path.basename(c["metadata"]["rel_path"])
+                   for c in fake_store.values())
+    assert paths == ["b.txt", "d.md"]
+
+    third = ingest_repo.ingest_repo(str(remote), dest, None, "p", "P")
+    assert third["files_updated"] == 0
+    assert third["commit"] == second["commit"]
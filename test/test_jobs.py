@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from src.pipeline.ingest_pipeline import IngestCancelled
+from src.services import jobs
+from src.services.jobs import JobLimitError, JobManager
+
+
+def _wait(jm, job_id, statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jm.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"{job_id} still {jm.get(job_id)['status']}")
+
+
+class Blocking:
+    """Runner that reports progress, then waits for `release` or the cancel event."""
+
+    def __init__(self):
+        self.started = threading.Semaphore(0)
+        self.release = threading.Event()
+        self.runs = 0
+
+    def __call__(self, params, progress, cancel):
+        self.runs += 1
+        progress(files_total=10, files_done=3)
+        self.started.release()
+        while not self.release.is_set():
+            if cancel.is_set():
+                raise IngestCancelled()
+            time.sleep(0.005)
+        return {"files": params["n"]}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def test_submit_runs_the_job_and_keeps_its_result(db):
+    jm = JobManager(db)
+    jm.register("ingest", lambda params, progress, cancel: {"files": params["n"]})
+    job = jm.submit("p1", "ingest", {"n": 3})
+    assert job["status"] in ("queued", "running", "succeeded")
+    done = _wait(jm, job["job_id"], ("succeeded",))
+    assert done["result"] == {"files": 3} and done["finished_at"]
+    with pytest.raises(ValueError):
+        jm.submit("p1", "unknown", {})
+    jm.shutdown(wait=True)
+
+
+def test_limits_per_project_and_concurrency(db):
+    runner = Blocking()
+    jm = JobManager(db, max_concurrent=1, max_per_project=1)
+    jm.register("ingest", runner)
+    a = jm.submit("p1", "ingest", {"n": 1})["job_id"]
+    with pytest.raises(JobLimitError):
+        jm.submit("p1", "ingest", {"n": 2})
+    b = jm.submit("p2", "ingest", {"n": 2})["job_id"]
+
+    assert runner.started.acquire(timeout=5)
+    _wait(jm, a, ("running",))
+    time.sleep(0.05)
+    assert jm.get(b)["status"] == "queued"  # one worker only
+    runner.release.set()
+    _wait(jm, b, ("succeeded",))
+    # a finished job no longer counts against the project
+    jm.submit("p1", "ingest", {"n": 3})
+    jm.shutdown(wait=True)
+
+
+def test_cancel_queued_and_running_jobs(db):
+    runner = Blocking()
+    jm = JobManager(db, max_concurrent=1, max_per_project=5)
+    jm.register("ingest", runner)
+    running = jm.submit("p1", "ingest", {"n": 1})["job_id"]
+    queued = jm.submit("p1", "ingest", {"n": 2})["job_id"]
+    assert runner.started.acquire(timeout=5)
+
+    assert jm.cancel(queued)["status"] == "cancelled"
+    jm.cancel(running)
+    job = _wait(jm, running, ("cancelled",))
+    assert job["progress"] == {"files_total": 10, "files_done": 3}
+    time.sleep(0.05)
+    assert runner.runs == 1  # the queued job never started
+    assert jm.cancel("job_missing") is None
+    jm.shutdown(wait=True)
+
+
+def test_shutdown_leaves_jobs_for_recover(db):
+    runner = Blocking()
+    jm = JobManager(db, max_concurrent=1, max_per_project=5)
+    jm.register("ingest", runner)
+    running = jm.submit("p1", "ingest", {"n": 1})["job_id"]
+    queued = jm.submit("p1", "ingest", {"n": 2})["job_id"]
+    assert runner.started.acquire(timeout=5)
+    jm.shutdown(wait=True)
+
+    # interrupted, not cancelled: both are picked up by the next process
+    jm2 = JobManager(db, max_concurrent=1, max_per_project=5)
+    assert jm2.get(running)["status"] == "queued"
+    assert jm2.get(running)["progress"] == {"files_total": 10, "files_done": 3}
+    assert jm2.get(queued)["status"] == "queued"
+    runner.release.set()
+    jm2.register("ingest", runner)
+    assert jm2.recover() == [running, queued]
+    assert _wait(jm2, running, ("succeeded",))["result"] == {"files": 1}
+    assert _wait(jm2, queued, ("succeeded",))["result"] == {"files": 2}
+    jm2.shutdown(wait=True)
+
+
+def test_progress_is_saved_while_running(db, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_PROGRESS_SAVE_SECONDS", 0.0)
+    runner = Blocking()
+    jm = JobManager(db)
+    jm.register("ingest", runner)
+    job_id = jm.submit("p1", "ingest", {"n": 1})["job_id"]
+    assert runner.started.acquire(timeout=5)
+
+    # another process (or a crash) only sees what is in SQLite
+    row = JobManager(db).get(job_id)
+    assert row["status"] == "running"
+    assert row["progress"] == {"files_total": 10, "files_done": 3}
+    runner.release.set()
+    _wait(jm, job_id, ("succeeded",))
+    jm.shutdown(wait=True)
@@ -0,0 +1,38 @@
+import pytest
+
+from src.pipeline import lexical_index
+from src.pipeline.retrieval import rrf_fuse
+
+
+@pytest.fixture
+def index_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(lexical_index, "_conns", {})
+    return tmp_path
+
+
+def test_code_tokens_split_snake_and_camel_case():
+    assert list(lexical_index.code_tokens("upsert_chunks(ChunkBatcher)")) == [
+        "upsert_chunks", "upsert", "chunks", "chunkbatcher", "chunk", "batcher"]
+
+
+def test_search_follows_upserts_and_deletes(index_dir):
+    ids = ["p1::a.py::0", "p1::b.py::0", "p2::c.py::0"]
+    texts = ["def upsert_chunks(chunks): ...",
+             "class ChunkBatcher:\n    def add(self): upsertChunks()",
+             "def upsert_chunks(): pass"]
+    lexical_index.record_upsert(ids, texts, [{}, {}, {}])
+
+    hits = [cid for cid, _ in lexical_index.search("where is upsert_chunks called", "p1")]
+    assert hits == ["p1::a.py::0", "p1::b.py::0"]
+    assert {cid for cid, _ in lexical_index.search("upsert_chunks")} == set(ids)
+
+    lexical_index.record_upsert(["p1::a.py::0"], ["nothing relevant"], [{}])
+    lexical_index.record_delete(["p1::b.py::0"])
+    assert lexical_index.search("upsert_chunks", "p1") == []
+
+
+def test_rrf_prefers_ids_ranked_well_by_both():
+    fused = rrf_fuse([["a", "b", "c"], ["c", "b", "d"]], k=60)
+    assert {cid for cid, _ in fused[:2]} == {"b", "c"}
+    assert [cid for cid, _ in fused[2:]] == ["a", "d"]
@@ -0,0 +1,17 @@
+from src.pipeline import metrics
+
+
+def test_stage_feeds_histogram_and_request_trace(monkeypatch):
+    monkeypatch.setattr(metrics, "_values", {})
+    with metrics.trace() as timings:
+        with metrics.stage("embed"):
+            pass
+    metrics.inc("rag_llm_tokens_total", 12, kind="prompt")
+
+    assert set(timings) == {"embed"}
+    assert metrics.server_timing({"embed": 0.0125}, total=0.02) == "embed;dur=12.5, total;dur=20.0"
+    text = metrics.render()
+    assert '# TYPE rag_stage_seconds histogram' in text
+    assert 'rag_stage_seconds_bucket{stage="embed",le="+Inf"} 1' in text
+    assert 'rag_stage_seconds_count{stage="embed"} 1' in text
+    assert 'rag_llm_tokens_total{kind="prompt"} 12' in text
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src.pipeline.embeddings import OnnxEmbedder
+
+
+def _embedder():
+    """Word-level tokenizer + an ONNX graph that only looks up token vectors."""
+    onnx = pytest.importorskip("onnx")
+    ort = pytest.importorskip("onnxruntime")
+    tokenizers = pytest.importorskip("tokenizers")
+    from onnx import TensorProto, helper, numpy_helper
+
+    vocab = {"[PAD]": 0, "[UNK]": 1, "a": 2, "b": 3, "c": 4}
+    tok = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="[UNK]"))
+    tok.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+
+    table = np.eye(5, dtype=np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "lookup",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["b", "s"]),
+         helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["b", "s"])],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["b", "s", 5])],
+        initializer=[numpy_helper.from_array(table, "table")])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    session = ort.InferenceSession(model.SerializeToString(),
+                                   providers=["CPUExecutionProvider"])
+    return OnnxEmbedder(session, tok, max_tokens=3)
+
+
+def test_mean_pooling_ignores_padding_and_keeps_input_order():
+    vectors = _embedder().encode(["a", "b b c", "c a"], batch_size=2,
+                                 normalize_embeddings=False)
+
+    np.testing.assert_allclose(vectors[0], [0, 0, 1, 0, 0])
+    np.testing.assert_allclose(vectors[1], [0, 0, 0, 2 / 3, 1 / 3], rtol=1e-6)
+    np.testing.assert_allclose(vectors[2], [0, 0, 0.5, 0, 0.5])
+
+
+def test_truncates_to_max_tokens_and_normalizes():
+    vectors = _embedder().encode(["a a a b b b"], normalize_embeddings=True)
+    np.testing.assert_allclose(vectors[0], [0, 0, 1, 0, 0])
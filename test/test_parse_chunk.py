@@ -0,0 +1,86 @@
+import textwrap
+
+import pytest
+
+from src.pipeline.parse_chunk import chunk_python, chunk_text, chunk_tokens, window_lines
+
+SOURCE = textwrap.dedent('''\
+    import os
+
+    LIMIT = 3
+
+
+    @decorator
+    def top(x):
+        return x + 1
+
+
+    class Store:
+        """A store."""
+        kind = "memory"
+
+        def get(self, key):
+            return key
+
+        async def put(self, key, value):
+            pass
+''')
+
+
+def test_chunk_python_one_chunk_per_symbol():
+    chunks = chunk_python(SOURCE)
+    by_symbol = {c["symbol"]: c for c in chunks}
+
+    assert [c["symbol_type"] for c in chunks] == [
+        "module", "FunctionDef", "ClassDef", "FunctionDef", "AsyncFunctionDef"]
+    top = by_symbol["top"]
+    assert top["start_line"] == 6 and top["end_line"] == 8
+    assert top["text"].startswith("@decorator")
+    assert by_symbol["Store"]["end_line"] == 13  # header, docstring, attributes
+    assert by_symbol["Store.get"]["parent_class"] == "Store"
+    assert by_symbol["Store.put"]["text"].lstrip().startswith("async def put")
+
+
+def test_oversized_symbol_is_windowed():
+    body = "\n".join(f"    x{i} = {i}" for i in range(200))
+    chunks = chunk_python(f"def big():\n{body}\n", max_length=300)
+
+    assert len(chunks) > 1
+    assert all(c["symbol"] == "big" and len(c["text"]) <= 300 for c in chunks)
+    assert chunks[0]["start_line"] == 1 and chunks[-1]["end_line"] == 201
+    # windows tile the function without gaps
+    for a, b in zip(chunks, chunks[1:]):
+        assert b["start_line"] == a["end_line"] + 1
+
+
+def test_unparseable_source_falls_back_to_windows():
+    chunks = chunk_python("def broken(:\n    pass\n", max_length=100)
+    assert [c["symbol_type"] for c in chunks] == ["window"]
+
+
+def test_window_lines_slices_long_lines():
+    assert list(window_lines(["a" * 5, "b" * 12], 8)) == [
+        ("aaaaa", 1, 1), ("bbbbbbbb", 2, 2), ("bbbb", 2, 2)]
+
+
+def test_chunk_text_keeps_sentence_packing():
+    assert chunk_text("one. two. three", max_length=10) == ["one. two.", "three."]
+
+
+def _word_tokenizer():
+    """Tiny offline WordPiece tokenizer: one token per known word."""
+    tokenizers = pytest.importorskip("tokenizers")
+    transformers = pytest.importorskip("transformers")
+    vocab = {"[UNK]": 0, **{f"w{i}": i + 1 for i in range(100)}}
+    tok = tokenizers.Tokenizer(tokenizers.models.WordPiece(vocab, unk_token="[UNK]"))
+    tok.pre_tokenizer = tokenizers.pre_tokenizers.BertPreTokenizer()
+    return transformers.PreTrainedTokenizerFast(tokenizer_object=tok, unk_token="[UNK]")
+
+
+def test_chunk_tokens_windows_with_overlap():
+    text = "\n".join(" ".join(f"w{i}" for i in range(j, j + 10)) for j in range(0, 100, 10))
+    chunks = chunk_tokens(text, max_tokens=30, overlap=5, tokenizer=_word_tokenizer())
+
+    assert [c["token_count"] for c in chunks] == [30, 30, 30, 25]
+    assert chunks[0]["text"].split()[-5:] == chunks[1]["text"].split()[:5]
+    assert chunks[0]["text"].startswith("w0 ") and chunks[-1]["text"].endswith("w99")
@@ -0,0 +1,76 @@
+import json
+import sqlite3
+
+import pytest
+
+from src.services.project_store import ProjectStore
+
+
+def _project(pid, name="Demo", **extra):
+    return {"project_id": pid, "project_name": name, "repo_url": None,
+            "root_path": f"/src/{pid}", "branch": None,
+            "created_at": "2026-01-01T00:00:00", **extra}
+
+
+def test_crud_round_trip_and_reopen(tmp_path):
+    db = str(tmp_path / "projects.sqlite3")
+    store = ProjectStore(db, legacy_json=None)
+    assert store.list() == []
+
+    created = store.create(_project("p1"))
+    store.create(_project("p2", "Other"))
+    assert created == _project("p1")
+    assert store.get("p1") == _project("p1")
+    assert store.get("missing") is None
+
+    updated = store.update("p1", branch="main", bogus=1)
+    assert updated["branch"] == "main" and updated["project_id"] == "p1"
+    assert store.update("missing", branch="main") is None
+
+    # returned dicts are copies
+    store.get("p1")["project_name"] = "changed"
+    assert store.get("p1")["project_name"] == "Demo"
+
+    with pytest.raises(sqlite3.IntegrityError):
+        store.create(_project("p1"))
+
+    assert store.delete("p2") is True
+    assert store.delete("p2") is False
+
+    reopened = ProjectStore(db, legacy_json=None)
+    assert reopened.list() == [_project("p1", branch="main")]
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    db = str(tmp_path / "projects.sqlite3")
+    legacy = tmp_path / "projects.json"
+    legacy.write_text(json.dumps({"projects": [
+        _project("p1"),
+        _project("p2", "Second"),
+        {"project_id": "broken"},  # no name: skipped
+    ]}))
+
+    store = ProjectStore(db, legacy_json=str(legacy))
+    assert [p["project_id"] for p in store.list()] == ["p1", "p2"]
+    assert not legacy.exists()
+    assert (tmp_path / "projects.json.migrated").exists()
+
+    # second start: nothing to import, existing rows untouched
+    store.update("p1", project_name="Renamed")
+    again = ProjectStore(db, legacy_json=str(legacy))
+    assert [p["project_id"] for p in again.list()] == ["p1", "p2"]
+    assert again.get("p1")["project_name"] == "Renamed"
+
+    # a stray legacy file reappearing never overwrites newer rows
+    legacy.write_text(json.dumps({"projects": [_project("p1"), _project("p3")]}))
+    third = ProjectStore(db, legacy_json=str(legacy))
+    assert third.get("p1")["project_name"] == "Renamed"
+    assert third.get("p3") == _project("p3")
+
+
+def test_corrupt_legacy_json_is_set_aside(tmp_path):
+    legacy = tmp_path / "projects.json"
+    legacy.write_text("{not json")
+    store = ProjectStore(str(tmp_path / "projects.sqlite3"), legacy_json=str(legacy))
+    assert store.list() == []
+    assert (tmp_path / "projects.json.migrated").read_text() == "{not json"
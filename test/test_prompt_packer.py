@@ -0,0 +1,71 @@
+import pytest
+
+from src.pipeline import prompt_packer, resources
+
+
+@pytest.fixture(autouse=True)
+def char_tokens(monkeypatch):
+    # chars / 4 estimate, no tiktoken download
+    monkeypatch.setitem(resources._instances, "prompt_tokenizer", None)
+
+
+def _m(path, idx, text, **md):
+    return {"id": f"p::{path}::{idx}", "text": text,
+            "metadata": {"rel_path": path, "chunk_idx": idx, **md}}
+
+
+def test_adjacent_chunks_merge_without_repeating_the_overlap():
+    matches = [
+        _m("a.md", 1, "gamma delta epsilon zeta eta theta"),
+        _m("b.py", 0, "def other(): pass"),
+        _m("a.md", 0, "alpha beta gamma delta epsilon zeta"),
+    ]
+    blocks, stats = prompt_packer.pack(matches, budget=1000)
+
+    assert [b["metadata"]["rel_path"] for b in blocks] == ["a.md", "b.py"]  # rank of best member
+    assert blocks[0]["text"] == "alpha beta gamma delta epsilon zeta eta theta"
+    assert blocks[0]["metadata"]["chunk_idx"] == "0-1"
+    assert stats["merged"] == 1
+
+
+def test_line_ranges_are_joined_on_new_lines_only():
+    a = _m("s.py", 0, "l1\nl2\nl3", start_line=1, end_line=3, symbol="f")
+    b = _m("s.py", 1, "l3\nl4", start_line=3, end_line=4, symbol="g")
+    block = prompt_packer.pack([a, b], budget=1000)[0][0]
+
+    assert block["text"] == "l1\nl2\nl3\nl4"
+    assert block["metadata"]["end_line"] == 4
+    assert block["metadata"]["symbol"] == "f, g"
+
+
+def test_near_duplicates_dropped_and_budget_enforced():
+    body = " ".join(f"word{i}" for i in range(200))
+    matches = [_m("x.py", 0, body), _m("copy/x.py", 0, body + " extra"),
+               _m("y.py", 5, "\n".join(f"line {i} " * 4 for i in range(100)))]
+    blocks, stats = prompt_packer.pack(matches, budget=500)
+
+    assert stats["duplicates_dropped"] == 1
+    assert [b["metadata"]["rel_path"] for b in blocks] == ["x.py", "y.py"]
+    assert stats["blocks_truncated"] == 1
+    assert stats["tokens_packed"] <= 500 < stats["tokens_unpacked"]
+    assert stats["tokens_saved"] == stats["tokens_unpacked"] - stats["tokens_packed"]
+
+
+def test_gapped_symbols_keep_their_line_ranges():
+    from src.pipeline.answer_generation import _context_entry
+
+    a = _m("s.py", 0, "def f():\n    pass", start_line=1, end_line=2, symbol="f")
+    b = _m("s.py", 1, "def g():\n    pass", start_line=10, end_line=11, symbol="g")
+    block = prompt_packer.pack([a, b], budget=1000)[0][0]
+
+    assert block["metadata"]["line_ranges"] == [[1, 2], [10, 11]]
+    assert "(f, g, lines 1-2, 10-11)" in _context_entry(block)
+
+
+def test_matches_without_ids_are_not_collapsed():
+    matches = [{"text": "alpha", "metadata": {"rel_path": "a.py"}},
+               {"text": "beta", "metadata": {"rel_path": "b.py"}}]
+    blocks, stats = prompt_packer.pack(matches, budget=1000)
+
+    assert [b["text"] for b in blocks] == ["alpha", "beta"]
+    assert stats["merged"] == 0
@@ -0,0 +1,41 @@
+import pytest
+
+from src.pipeline import reranker, resources
+
+
+class _LengthScorer:
+    """Fake cross-encoder: longer chunk text scores higher."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls += 1
+        return [float(len(text)) for _, text in pairs]
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    model = _LengthScorer()
+    monkeypatch.setitem(resources._instances, "reranker", model)
+    monkeypatch.setattr(reranker, "_ms_per_pair", None)
+    return model
+
+
+def test_rerank_orders_by_score_and_keeps_top_k(scorer):
+    pool = [{"id": str(i), "text": "x" * n} for i, n in enumerate([1, 5, 3, 4])]
+    out = reranker.rerank("q", pool, top_k=2, budget_ms=0)
+
+    assert [m["id"] for m in out] == ["1", "3"]
+    assert out[0]["rerank_score"] == 5.0
+    assert reranker.estimate_ms(10) is not None
+
+
+def test_rerank_skipped_when_over_budget(scorer, monkeypatch):
+    monkeypatch.setattr(reranker, "_ms_per_pair", 50.0)
+    pool = [{"id": str(i), "text": "x" * i} for i in range(4)]
+    out = reranker.rerank("q", pool, top_k=2, budget_ms=100)
+
+    assert [m["id"] for m in out] == ["0", "1"]  # retrieval order kept
+    assert scorer.calls == 0
+    assert reranker._ms_per_pair < 50.0  # decays so reranking is retried later
@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+from src.pipeline import answer_cache, semantic_cache
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_PATH", str(tmp_path / "answers.sqlite3"))
+    monkeypatch.setattr(answer_cache, "_conn", None)
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_PATH", str(tmp_path / "semantic.sqlite3"))
+    monkeypatch.setattr(semantic_cache, "_conn", None)
+    monkeypatch.setattr(semantic_cache, "_indexes", {})
+    monkeypatch.setattr(semantic_cache, "_stats", {
+        "lookups": 0, "hits": 0, "rejected_overlap": 0, "hit_similarity_sum": 0.0,
+        "similarity_histogram": {str(b): 0 for b in semantic_cache._BUCKETS}})
+    return semantic_cache
+
+
+def _unit(angle):
+    """2-d unit vector; cosine between two of them is cos(difference)."""
+    return [math.cos(angle), math.sin(angle)]
+
+
+def _response(answer, ids=("a", "b")):
+    return {"answer": answer, "matches": [{"id": i} for i in ids]}
+
+
+def test_similarity_threshold(cache):
+    cache.store("p1", "what is x", _unit(0.0), _response("X"), generation=0)
+
+    hit = cache.lookup("p1", _unit(0.1), ["a", "b"], threshold=0.99)  # cos 0.995
+    assert hit is not None
+    response, sim = hit
+    assert response == _response("X") and sim == pytest.approx(math.cos(0.1), abs=1e-6)
+
+    assert cache.lookup("p1", _unit(0.3), ["a", "b"], threshold=0.99) is None  # cos 0.955
+    assert cache.lookup("p2", _unit(0.0), ["a", "b"], threshold=0.99) is None
+    stats = cache.stats()
+    assert stats["lookups"] == 3 and stats["hits"] == 1
+
+
+def test_low_chunk_overlap_is_rejected(cache):
+    cache.store("p1", "q", _unit(0.0), _response("X", ids=("a", "b", "c")), generation=0)
+    # Jaccard {a,b,c} vs {a,d,e} = 1/5
+    assert cache.lookup("p1", _unit(0.0), ["a", "d", "e"], threshold=0.9,
+                        min_overlap=0.5) is None
+    assert cache.stats()["rejected_overlap"] == 1
+    # {a,b,c} vs {a,b,c,d} = 3/4
+    assert cache.lookup("p1", _unit(0.0), ["a", "b", "c", "d"], threshold=0.9,
+                        min_overlap=0.5) is not None
+
+
+def test_entries_expire_with_the_index_generation(cache):
+    cache.store("p1", "q", _unit(0.0), _response("X"), generation=0)
+    answer_cache.bump_generation(["p1"])
+    assert cache.lookup("p1", _unit(0.0), ["a", "b"], threshold=0.9) is None
+    # an answer built before the bump is not stored
+    cache.store("p1", "q", _unit(0.0), _response("X"), generation=0)
+    assert cache.stats()["entries"]["p1"] == 0
+
+
+def test_per_project_cap_evicts_oldest(cache, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_MAX_ENTRIES", 3)
+    angles = [0.0, 0.5, 1.0, 1.5]
+    for n, angle in enumerate(angles):
+        cache.store("p1", f"q{n}", _unit(angle), _response(f"A{n}"), generation=0)
+    cache.store("p2", "other", _unit(0.0), _response("P2"), generation=0)
+
+    assert cache.stats()["entries"] == {"p1": 3, "p2": 1}
+    assert cache.lookup("p1", _unit(0.0), ["a", "b"], threshold=0.99) is None  # q0 evicted
+    assert cache.lookup("p1", _unit(1.5), ["a", "b"], threshold=0.99)[0]["answer"] == "A3"
+
+    # the eviction is persisted, not only applied in memory
+    monkeypatch.setattr(semantic_cache, "_indexes", {})
+    assert cache.lookup("p1", _unit(0.0), ["a", "b"], threshold=0.99) is None
+    assert cache.stats()["entries"]["p1"] == 3
@@ -0,0 +1,53 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from src.pipeline import uploads
+
+
+def _tar_gz(members):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo("link.py")
+        link.type, link.linkname = tarfile.SYMTYPE, "/etc/passwd"
+        tar.addfile(link)
+    buf.seek(0)
+    return buf
+
+
+def test_archives_extract_inside_request_dir(tmp_path):
+    staging = uploads.Staging("proj/1", root=str(tmp_path))
+    staging.add("src.tar.gz", _tar_gz({"pkg/a.py": b"x = 1\n", "../evil.py": b"!"}))
+    zbuf = io.BytesIO()
+    with zipfile.ZipFile(zbuf, "w") as zf:
+        zf.writestr("docs/readme.md", "# hi")
+        zf.writestr("../../escape.md", "!")
+    zbuf.seek(0)
+    staging.add("docs.zip", zbuf)
+    staging.add("notes.txt", io.BytesIO(b"plain"))
+
+    rel = sorted(p[len(staging.path) + 1:] for p in staging.files)
+    assert rel == ["docs/readme.md", "notes.txt", "pkg/a.py"]
+    assert staging.path.startswith(str(tmp_path / "proj_1"))
+    staging.cleanup()
+    assert not (tmp_path / "proj_1" / staging.path.rsplit("/", 1)[-1]).exists()
+
+
+def test_size_limit_and_bad_archive(tmp_path):
+    staging = uploads.Staging("p", root=str(tmp_path), max_bytes=10)
+    with pytest.raises(uploads.UploadTooLarge):
+        staging.add("big.py", io.BytesIO(b"x" * 11))
+    with pytest.raises(uploads.UploadError):
+        staging.add("broken.zip", io.BytesIO(b"not a zip"))
+
+
+def test_file_and_directory_clash_is_an_upload_error(tmp_path):
+    staging = uploads.Staging("p", root=str(tmp_path))
+    with pytest.raises(uploads.UploadError, match="Cannot write"):
+        staging.add("src.tar.gz", _tar_gz({"a": b"x", "a/b.py": b"y"}))